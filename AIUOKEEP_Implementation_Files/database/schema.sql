@@ -20,5 +20,9 @@ CREATE TABLE ledger (
     id INTEGER PRIMARY KEY,
     timestamp TEXT NOT NULL,
     result TEXT NOT NULL,
-    payload TEXT NOT NULL
+    payload TEXT NOT NULL,
+    chain_hash TEXT
 );
+
+CREATE INDEX ledger_timestamp_idx ON ledger (timestamp);
+CREATE INDEX ledger_result_timestamp_idx ON ledger (result, timestamp);
@@ -0,0 +1,27 @@
+"""Audit ledger utilities complementing the Stream H PowerShell scripts."""
+
+from .ledger_rollups import RollupEngine
+from .ledger_store import LedgerError, LedgerRecord, LedgerStore
+from .merkle_snapshot import (
+    DriftReport,
+    Snapshot,
+    SnapshotError,
+    diff_snapshots,
+    load_snapshot,
+    save_snapshot,
+    scan_tree,
+)
+
+__all__ = [
+    "DriftReport",
+    "LedgerError",
+    "LedgerRecord",
+    "LedgerStore",
+    "RollupEngine",
+    "Snapshot",
+    "SnapshotError",
+    "diff_snapshots",
+    "load_snapshot",
+    "save_snapshot",
+    "scan_tree",
+]
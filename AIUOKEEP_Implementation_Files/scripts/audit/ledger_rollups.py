@@ -0,0 +1,431 @@
+"""Incrementally maintained rollups over the SQLite run ledger.
+
+``Export-WeeklyReport.ps1`` re-reads the whole ledger for every report, so its
+cost grows with history. This module keeps per-hour and per-day aggregates of
+run outcomes and per-check statuses next to the ``ledger`` table managed by
+:mod:`scripts.audit.ledger_store`. Each :meth:`RollupEngine.refresh` folds in
+only the entries appended since the previous refresh, and reports are answered
+from at most one row per day plus the hourly rows of the two partial days at
+the window edges, independent of how much history the ledger holds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from .ledger_store import LedgerError, LedgerStore, normalise_timestamp, validate_entry
+
+
+GRANULARITIES = ("hour", "day")
+REPORT_PERIODS = {"weekly": 7, "monthly": 30}
+
+_ROLLUP_DDL = """
+CREATE TABLE IF NOT EXISTS ledger_rollup (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket)
+);
+CREATE TABLE IF NOT EXISTS ledger_rollup_checks (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    duration_total REAL NOT NULL,
+    duration_count INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, name, status)
+);
+CREATE TABLE IF NOT EXISTS ledger_rollup_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_WATERMARK_KEY = "last_ledger_id"
+
+
+@dataclass
+class _CheckTally:
+    count: int = 0
+    duration_total: float = 0.0
+    duration_count: int = 0
+
+
+@dataclass
+class _RunTally:
+    runs: int = 0
+    passed: int = 0
+    failed: int = 0
+    checks: dict[tuple[str, str], _CheckTally] = field(
+        default_factory=lambda: defaultdict(_CheckTally)
+    )
+
+
+@dataclass(frozen=True)
+class RefreshResult:
+    """Outcome of folding newly appended ledger rows into the rollups."""
+
+    processed: int
+    rejected: int
+    last_id: int
+
+
+def _buckets(timestamp: str) -> dict[str, str]:
+    # Normalised timestamps are fixed-width, so buckets are plain prefixes.
+    return {"hour": timestamp[:13], "day": timestamp[:10]}
+
+
+def _parse_utc(value: str | datetime) -> datetime:
+    text = normalise_timestamp(value)
+    return datetime.strptime(text[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def _percent(part: int, total: int) -> float:
+    return round(part / total * 100, 2) if total else 0
+
+
+class RollupEngine:
+    """Maintains hourly and daily aggregates for a :class:`LedgerStore`."""
+
+    def __init__(self, store: LedgerStore) -> None:
+        self.store = store
+        self._conn = store.connection
+        self._conn.executescript(_ROLLUP_DDL)
+        self._conn.commit()
+
+    @property
+    def watermark(self) -> int:
+        """Id of the last ledger row folded into the rollups."""
+
+        row = self._conn.execute(
+            "SELECT value FROM ledger_rollup_state WHERE key = ?", (_WATERMARK_KEY,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def append(self, entries: Iterable[Mapping[str, Any]]) -> RefreshResult:
+        """Append *entries* to the ledger and fold them into the rollups."""
+
+        self.store.append_many(entries)
+        return self.refresh()
+
+    def refresh(self, *, batch_size: int = 5000) -> RefreshResult:
+        """Fold every ledger row newer than the watermark into the rollups."""
+
+        last_id = self.watermark
+        processed = rejected = 0
+        while True:
+            page = self.store.page(batch_size, after_id=last_id)
+            if not page.records:
+                break
+
+            tallies: dict[tuple[str, str], _RunTally] = defaultdict(_RunTally)
+            for record in page.records:
+                try:
+                    validate_entry(record.entry)
+                except LedgerError:
+                    rejected += 1
+                    continue
+                self._tally(tallies, record.timestamp, record.entry)
+                processed += 1
+
+            last_id = page.records[-1].id
+            self._write(tallies, last_id)
+            if page.next_after_id is None:
+                break
+
+        return RefreshResult(processed=processed, rejected=rejected, last_id=last_id)
+
+    def rebuild(self) -> RefreshResult:
+        """Discard all rollups and recompute them from the full ledger."""
+
+        with self._conn:
+            self._conn.execute("DELETE FROM ledger_rollup")
+            self._conn.execute("DELETE FROM ledger_rollup_checks")
+            self._conn.execute("DELETE FROM ledger_rollup_state")
+        return self.refresh()
+
+    @staticmethod
+    def _tally(
+        tallies: dict[tuple[str, str], _RunTally], timestamp: str, entry: Mapping[str, Any]
+    ) -> None:
+        result = entry["result"]
+        for granularity, bucket in _buckets(timestamp).items():
+            tally = tallies[(granularity, bucket)]
+            tally.runs += 1
+            tally.passed += result == "pass"
+            tally.failed += result == "fail"
+            for check in entry["checks"]:
+                name = check["name"].strip()
+                if not name:
+                    continue
+                check_tally = tally.checks[(name, check["status"].lower())]
+                check_tally.count += 1
+                duration = check.get("durationMs")
+                if isinstance(duration, (int, float)) and not isinstance(duration, bool):
+                    if duration >= 0:
+                        check_tally.duration_total += float(duration)
+                        check_tally.duration_count += 1
+
+    def _write(self, tallies: Mapping[tuple[str, str], _RunTally], last_id: int) -> None:
+        run_rows = []
+        check_rows = []
+        for (granularity, bucket), tally in tallies.items():
+            run_rows.append((granularity, bucket, tally.runs, tally.passed, tally.failed))
+            for (name, status), check in tally.checks.items():
+                check_rows.append(
+                    (
+                        granularity,
+                        bucket,
+                        name,
+                        status,
+                        check.count,
+                        check.duration_total,
+                        check.duration_count,
+                    )
+                )
+
+        # Rollup deltas and the watermark move in one transaction so a crash
+        # can never double-count or skip entries.
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO ledger_rollup (granularity, bucket, runs, passed, failed) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (granularity, bucket) DO UPDATE SET "
+                "runs = runs + excluded.runs, passed = passed + excluded.passed, "
+                "failed = failed + excluded.failed",
+                run_rows,
+            )
+            self._conn.executemany(
+                "INSERT INTO ledger_rollup_checks (granularity, bucket, name, status, count, "
+                "duration_total, duration_count) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, bucket, name, status) DO UPDATE SET "
+                "count = count + excluded.count, "
+                "duration_total = duration_total + excluded.duration_total, "
+                "duration_count = duration_count + excluded.duration_count",
+                check_rows,
+            )
+            self._conn.execute(
+                "INSERT INTO ledger_rollup_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (_WATERMARK_KEY, last_id),
+            )
+
+    # -- reporting ----------------------------------------------------------
+
+    @staticmethod
+    def _segments(start: datetime, end: datetime) -> list[tuple[str, str, str]]:
+        """Split ``[start, end)`` into (granularity, first, stop) bucket ranges."""
+
+        first_day = start.replace(hour=0)
+        if first_day < start:
+            first_day += timedelta(days=1)
+        last_day = end.replace(hour=0)
+
+        def hours(lower: datetime, upper: datetime) -> tuple[str, str, str]:
+            return ("hour", lower.strftime("%Y-%m-%dT%H"), upper.strftime("%Y-%m-%dT%H"))
+
+        if first_day >= last_day:
+            return [hours(start, end)]
+        return [
+            hours(start, first_day),
+            ("day", first_day.strftime("%Y-%m-%d"), last_day.strftime("%Y-%m-%d")),
+            hours(last_day, end),
+        ]
+
+    def _rows(
+        self, table: str, columns: str, segments: Sequence[tuple[str, str, str]]
+    ) -> list[Any]:
+        rows: list[Any] = []
+        for granularity, first, stop in segments:
+            if first >= stop:
+                continue
+            rows.extend(
+                self._conn.execute(
+                    f"SELECT bucket, {columns} FROM {table} "  # noqa: S608 - fixed identifiers
+                    "WHERE granularity = ? AND bucket >= ? AND bucket < ?",
+                    (granularity, first, stop),
+                )
+            )
+        return rows
+
+    def report(
+        self,
+        window_end: str | datetime | None = None,
+        *,
+        rolling_days: int = 7,
+        window_start: str | datetime | None = None,
+    ) -> dict[str, Any]:
+        """Build an ``Export-WeeklyReport.ps1``-shaped report from the rollups.
+
+        The window is widened to whole hours. Percentile durations and
+        signature health need the raw entries and are therefore not included;
+        ``recentFailures`` is read through the ledger's result index.
+        """
+
+        end = _parse_utc(window_end) if window_end is not None else datetime.now(timezone.utc)
+        if end.minute or end.second or end.microsecond:
+            end = end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        start = (
+            _parse_utc(window_start)
+            if window_start is not None
+            else end - timedelta(days=rolling_days)
+        ).replace(minute=0, second=0, microsecond=0)
+        if start >= end:
+            raise LedgerError("WindowStart must be earlier than WindowEnd.")
+
+        segments = self._segments(start, end)
+
+        daily: dict[str, list[int]] = defaultdict(lambda: [0, 0, 0])
+        for bucket, runs, passed, failed in self._rows(
+            "ledger_rollup", "runs, passed, failed", segments
+        ):
+            day = daily[bucket[:10]]
+            day[0] += runs
+            day[1] += passed
+            day[2] += failed
+
+        checks: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for bucket, name, status, count, duration_total, duration_count in self._rows(
+            "ledger_rollup_checks",
+            "name, status, count, duration_total, duration_count",
+            segments,
+        ):
+            aggregate = checks[name]
+            aggregate["total"] += count
+            aggregate[status] += count
+            aggregate["duration_total"] += duration_total
+            aggregate["duration_count"] += duration_count
+
+        total_runs = sum(day[0] for day in daily.values())
+        total_passed = sum(day[1] for day in daily.values())
+        total_failed = sum(day[2] for day in daily.values())
+
+        recent_failures = []
+        for row in self._conn.execute(
+            "SELECT timestamp, payload FROM ledger WHERE result = 'fail' "
+            "AND timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 5",
+            (normalise_timestamp(start), normalise_timestamp(end)),
+        ):
+            entry = json.loads(row[1])
+            metadata = entry.get("metadata") or {}
+            recent_failures.append(
+                {
+                    "timestampUtc": row[0],
+                    "runId": metadata.get("runId"),
+                    "failingChecks": [
+                        check.get("name")
+                        for check in entry.get("checks", [])
+                        if check.get("status") == "fail"
+                    ],
+                }
+            )
+
+        return {
+            "generatedAtUtc": normalise_timestamp(datetime.now(timezone.utc)),
+            "window": {
+                "startUtc": normalise_timestamp(start),
+                "endUtc": normalise_timestamp(end),
+                "days": round((end - start).total_seconds() / 86400, 2),
+            },
+            "totals": {
+                "runs": total_runs,
+                "passed": total_passed,
+                "failed": total_failed,
+                "passRatePct": _percent(total_passed, total_runs),
+            },
+            "checks": [
+                {
+                    "name": name,
+                    "totalRuns": int(data["total"]),
+                    "passed": int(data["pass"]),
+                    "failed": int(data["fail"]),
+                    "skipped": int(data["skipped"]),
+                    "passRatePercent": _percent(int(data["pass"]), int(data["total"])),
+                    "averageDurationMs": (
+                        round(data["duration_total"] / data["duration_count"], 2)
+                        if data["duration_count"]
+                        else 0
+                    ),
+                }
+                for name, data in sorted(checks.items())
+            ],
+            "daily": [
+                {
+                    "dateUtc": day,
+                    "totalRuns": runs,
+                    "passed": passed,
+                    "failed": failed,
+                    "passRatePercent": _percent(passed, runs),
+                }
+                for day, (runs, passed, failed) in sorted(daily.items())
+            ],
+            "recentFailures": recent_failures,
+        }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Maintain and query run ledger rollups.")
+    parser.add_argument("--database", type=Path, required=True, help="Path to the SQLite ledger.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("refresh", help="Fold newly appended entries into the rollups.")
+    commands.add_parser("rebuild", help="Recompute all rollups from the full ledger.")
+
+    report_cmd = commands.add_parser("report", help="Write a report answered from rollups.")
+    report_cmd.add_argument("--output", type=Path, required=True)
+    report_cmd.add_argument("--period", choices=sorted(REPORT_PERIODS), default="weekly")
+    report_cmd.add_argument("--rolling-days", type=int, help="Overrides --period.")
+    report_cmd.add_argument("--window-start")
+    report_cmd.add_argument("--window-end")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        with LedgerStore(args.database) as store:
+            engine = RollupEngine(store)
+            if args.command == "refresh":
+                outcome = engine.refresh()
+            elif args.command == "rebuild":
+                outcome = engine.rebuild()
+            else:
+                engine.refresh()
+                report = engine.report(
+                    args.window_end,
+                    rolling_days=args.rolling_days or REPORT_PERIODS[args.period],
+                    window_start=args.window_start,
+                )
+                args.output.parent.mkdir(parents=True, exist_ok=True)
+                args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+                return 0
+            print(
+                json.dumps(
+                    {
+                        "processed": outcome.processed,
+                        "rejected": outcome.rejected,
+                        "lastId": outcome.last_id,
+                    }
+                )
+            )
+    except LedgerError as exc:
+        print(f"Ledger rollup failed: {exc}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    sys.exit(main())
@@ -0,0 +1,661 @@
+"""SQLite-backed storage for the validation run ledger.
+
+The PowerShell audit scripts append ledger entries to a JSON Lines file and
+re-read the whole file whenever entries are queried or their HMAC signatures
+are verified. This module stores the same entries in the ``ledger`` table
+defined by ``database/schema.sql`` so that time-range and result queries are
+answered from indexes, writes are batched inside WAL-mode transactions, and
+signatures are verified in bulk on a thread pool.
+
+Signatures follow the exact payload layout produced by
+``New-RunLedgerEntry.ps1`` so that entries signed by the PowerShell tooling
+verify here and vice versa. Optionally each row also carries a SHA-256 hash
+chained over its predecessor, which allows a time range to be verified by
+anchoring on the row just before it instead of replaying the full ledger.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import re
+import sqlite3
+import sys
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+
+SIGNATURE_PREFIX = "hmacsha256:"
+MIN_SIGNING_KEY_LENGTH = 32
+ALLOWED_RESULTS = ("pass", "fail")
+
+# Mirrors the ``ledger`` table and indexes in database/schema.sql. The
+# statements are idempotent so opening an existing database is a no-op.
+_LEDGER_DDL = """
+CREATE TABLE IF NOT EXISTS ledger (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    result TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    chain_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS ledger_timestamp_idx ON ledger (timestamp);
+CREATE INDEX IF NOT EXISTS ledger_result_timestamp_idx ON ledger (result, timestamp);
+"""
+
+_TIMESTAMP_PATTERN = re.compile(
+    r"^(?P<base>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})"
+    r"(?:\.(?P<fraction>\d+))?"
+    r"(?P<zone>Z|[+-]\d{2}:\d{2})?$"
+)
+
+
+class LedgerError(RuntimeError):
+    """Raised when ledger entries cannot be stored, read, or verified."""
+
+
+@dataclass(frozen=True)
+class LedgerRecord:
+    """A ledger entry as stored in the database."""
+
+    id: int
+    timestamp: str
+    result: str
+    entry: Mapping[str, Any]
+    chain_hash: str | None = None
+
+
+@dataclass(frozen=True)
+class LedgerPage:
+    """One page of a keyset-paginated ledger query."""
+
+    records: Sequence[LedgerRecord]
+    next_after_id: int | None
+
+
+@dataclass(frozen=True)
+class SignatureCheck:
+    """Signature verification outcome for one ledger row.
+
+    ``status`` uses the same vocabulary as ``Get-RunLedger.ps1``: ``valid``,
+    ``invalid``, ``missing``, or ``unsupported-algorithm``.
+    """
+
+    id: int
+    timestamp: str
+    status: str
+
+
+def normalise_timestamp(value: str | datetime) -> str:
+    """Return *value* as a UTC round-trip timestamp.
+
+    The format matches .NET's ``DateTime.ToString('o')`` for UTC values
+    (seven fractional digits and a ``Z`` suffix), which is what the PowerShell
+    scripts sign and what keeps lexical ordering in SQLite chronological.
+    """
+
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = value.astimezone(timezone.utc)
+        return value.strftime("%Y-%m-%dT%H:%M:%S") + f".{value.microsecond:06d}0Z"
+
+    match = _TIMESTAMP_PATTERN.match(value.strip())
+    if match is None:
+        raise LedgerError(f"Invalid ledger timestamp: {value!r}")
+
+    fraction = (match.group("fraction") or "").ljust(7, "0")[:7]
+    zone = match.group("zone") or "Z"
+    try:
+        base = datetime.strptime(match.group("base"), "%Y-%m-%dT%H:%M:%S")
+    except ValueError as exc:
+        raise LedgerError(f"Invalid ledger timestamp: {value!r}") from exc
+
+    if zone != "Z":
+        sign = 1 if zone[0] == "+" else -1
+        offset = timedelta(hours=int(zone[1:3]), minutes=int(zone[4:6]))
+        base -= sign * offset
+
+    return base.strftime("%Y-%m-%dT%H:%M:%S") + f".{fraction}Z"
+
+
+def validate_entry(entry: Any) -> Mapping[str, Any]:
+    """Check *entry* against the structure required by ``ledger.schema.json``.
+
+    Like the ChangePlan validator, the checks mirror the JSON Schema without
+    requiring a schema engine at runtime.
+    """
+
+    if not isinstance(entry, Mapping):
+        raise LedgerError("Ledger entry must be a JSON object.")
+
+    missing = [key for key in ("timestamp", "result", "checks") if key not in entry]
+    if missing:
+        raise LedgerError(
+            f"Ledger entry is missing required key(s) {', '.join(missing)}."
+        )
+
+    if not isinstance(entry["timestamp"], str):
+        raise LedgerError("Ledger entry timestamp must be a string.")
+    normalise_timestamp(entry["timestamp"])
+
+    if entry["result"] not in ALLOWED_RESULTS:
+        raise LedgerError(
+            f"Ledger entry result must be one of {', '.join(ALLOWED_RESULTS)}."
+        )
+
+    checks = entry["checks"]
+    if not isinstance(checks, list):
+        raise LedgerError("Ledger entry checks must be an array.")
+    for index, check in enumerate(checks):
+        if not isinstance(check, Mapping):
+            raise LedgerError(f"Check at index {index} must be an object.")
+        for key in ("name", "status"):
+            if not isinstance(check.get(key), str):
+                raise LedgerError(
+                    f"Check at index {index} must have a string '{key}'."
+                )
+
+    return entry
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _format_scalar(value: Any) -> str:
+    # PowerShell renders integral doubles without a decimal part ("1423" not
+    # "1423.0"), so do the same when rebuilding the signed payload.
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def signature_payload(entry: Mapping[str, Any]) -> str:
+    """Build the string that ``New-RunLedgerEntry.ps1`` signs for *entry*."""
+
+    # Sort-Object compares names case-insensitively, so casefold to match it.
+    checks = sorted(entry.get("checks", []), key=lambda item: str(item.get("name")).casefold())
+    check_parts = []
+    for check in checks:
+        check_parts.append(
+            "|".join(
+                (
+                    _format_scalar(check.get("name", "")),
+                    _format_scalar(check.get("status", "")),
+                    _format_scalar(check["durationMs"]) if "durationMs" in check else "",
+                    _format_scalar(check["tool"]) if "tool" in check else "",
+                    _canonical_json(check["details"]) if "details" in check else "",
+                )
+            )
+        )
+
+    metadata = entry.get("metadata")
+    metadata_hash = _canonical_json(metadata) if metadata is not None else ""
+
+    return "|".join(
+        (
+            normalise_timestamp(str(entry["timestamp"])),
+            str(entry["result"]),
+            ";".join(check_parts),
+            metadata_hash,
+        )
+    )
+
+
+def compute_signature(entry: Mapping[str, Any], key: bytes) -> str:
+    """Return the ``hmacsha256:`` signature value for *entry*."""
+
+    digest = hmac.new(key, signature_payload(entry).encode("utf-8"), hashlib.sha256).digest()
+    return SIGNATURE_PREFIX + base64.b64encode(digest).decode("ascii")
+
+
+def check_signature(entry: Mapping[str, Any], key: bytes) -> str:
+    """Return the signature status of *entry* using the Get-RunLedger vocabulary."""
+
+    signature = entry.get("signature")
+    if signature is None:
+        return "missing"
+    signature = str(signature)
+    if not signature.lower().startswith(SIGNATURE_PREFIX):
+        return "unsupported-algorithm"
+
+    expected = compute_signature(entry, key)[len(SIGNATURE_PREFIX) :]
+    actual = signature[len(SIGNATURE_PREFIX) :]
+    return "valid" if hmac.compare_digest(expected, actual) else "invalid"
+
+
+def load_signing_key(path: Path) -> bytes:
+    """Read a signing key with the same rules as the PowerShell audit scripts."""
+
+    try:
+        raw = path.read_text(encoding="utf-8")
+    except OSError as exc:
+        raise LedgerError(f"Unable to read signing key from '{path}': {exc}") from exc
+
+    trimmed = raw.strip()
+    if not trimmed:
+        raise LedgerError("Signing key cannot be empty.")
+    if len(trimmed) < MIN_SIGNING_KEY_LENGTH:
+        raise LedgerError(
+            "Signing key must be at least 32 characters long for adequate entropy."
+        )
+    return trimmed.encode("utf-8")
+
+
+def _chain_hash(previous: str, payload: str) -> str:
+    return hashlib.sha256(f"{previous}\n{payload}".encode()).hexdigest()
+
+
+class LedgerStore:
+    """Ledger entries persisted in SQLite with batched, indexed access.
+
+    Entries passed to :meth:`append` are buffered and written in a single
+    transaction once ``batch_size`` entries are pending, when :meth:`flush` is
+    called, or when the store is closed. Use the store as a context manager to
+    guarantee the final flush.
+    """
+
+    def __init__(self, path: Path, *, batch_size: int = 500, chain: bool = False) -> None:
+        if batch_size < 1:
+            raise LedgerError("batch_size must be at least 1.")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.chain = chain
+        self._pending: list[tuple[str, str, str]] = []
+
+        if str(path) != ":memory:":
+            path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._conn = sqlite3.connect(str(path))
+        except sqlite3.Error as exc:
+            raise LedgerError(f"Unable to open ledger database {path}: {exc}") from exc
+
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+        self._last_chain_hash = self._load_last_chain_hash()
+
+    def __enter__(self) -> LedgerStore:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _ensure_schema(self) -> None:
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ledger)")}
+        if columns and "chain_hash" not in columns:
+            # Databases created from an older schema.sql lack the chain column.
+            self._conn.execute("ALTER TABLE ledger ADD COLUMN chain_hash TEXT")
+        self._conn.executescript(_LEDGER_DDL)
+        self._conn.commit()
+
+    def _load_last_chain_hash(self) -> str:
+        row = self._conn.execute(
+            "SELECT chain_hash FROM ledger WHERE chain_hash IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        return str(row[0]) if row else ""
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The underlying SQLite connection, for companion tables such as rollups."""
+
+        return self._conn
+
+    def close(self) -> None:
+        """Flush pending entries and close the database connection."""
+
+        self.flush()
+        self._conn.close()
+
+    # -- writes -------------------------------------------------------------
+
+    def append(self, entry: Mapping[str, Any]) -> None:
+        """Queue *entry* for insertion, flushing once a batch is full."""
+
+        validate_entry(entry)
+        payload = json.dumps(entry, separators=(",", ":"), ensure_ascii=False)
+        self._pending.append(
+            (normalise_timestamp(str(entry["timestamp"])), str(entry["result"]), payload)
+        )
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def append_many(self, entries: Iterable[Mapping[str, Any]]) -> int:
+        """Queue every entry in *entries* and flush; return the count written."""
+
+        count = 0
+        for entry in entries:
+            self.append(entry)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self) -> None:
+        """Write all pending entries in a single transaction."""
+
+        if not self._pending:
+            return
+
+        rows = []
+        previous = self._last_chain_hash
+        for timestamp, result, payload in self._pending:
+            chain_hash = None
+            if self.chain:
+                chain_hash = previous = _chain_hash(previous, payload)
+            rows.append((timestamp, result, payload, chain_hash))
+
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO ledger (timestamp, result, payload, chain_hash) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as exc:
+            raise LedgerError(f"Failed to write ledger entries: {exc}") from exc
+
+        self._last_chain_hash = previous
+        self._pending.clear()
+
+    # -- reads --------------------------------------------------------------
+
+    def count(self) -> int:
+        """Return the number of stored entries (pending entries are flushed)."""
+
+        self.flush()
+        return int(self._conn.execute("SELECT COUNT(*) FROM ledger").fetchone()[0])
+
+    @staticmethod
+    def _where(
+        start: str | datetime | None,
+        end: str | datetime | None,
+        result: str | None,
+        after_id: int | None = None,
+    ) -> tuple[str, list[Any]]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(normalise_timestamp(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(normalise_timestamp(end))
+        if result is not None:
+            clauses.append("result = ?")
+            params.append(result)
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    @staticmethod
+    def _record(row: Sequence[Any]) -> LedgerRecord:
+        return LedgerRecord(
+            id=int(row[0]),
+            timestamp=str(row[1]),
+            result=str(row[2]),
+            entry=json.loads(row[3]),
+            chain_hash=row[4],
+        )
+
+    def query(
+        self,
+        start: str | datetime | None = None,
+        end: str | datetime | None = None,
+        *,
+        result: str | None = None,
+        limit: int | None = None,
+    ) -> Iterator[LedgerRecord]:
+        """Yield entries with ``start <= timestamp < end`` in chronological order."""
+
+        self.flush()
+        where, params = self._where(start, end, result)
+        sql = (
+            "SELECT id, timestamp, result, payload, chain_hash "
+            f"FROM ledger{where} ORDER BY timestamp, id"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for row in self._conn.execute(sql, params):
+            yield self._record(row)
+
+    def page(
+        self,
+        page_size: int,
+        *,
+        after_id: int | None = None,
+        start: str | datetime | None = None,
+        end: str | datetime | None = None,
+        result: str | None = None,
+    ) -> LedgerPage:
+        """Return up to *page_size* entries with ids greater than *after_id*.
+
+        Pagination is keyset-based on the row id, so fetching page N costs the
+        same as fetching the first page.
+        """
+
+        if page_size < 1:
+            raise LedgerError("page_size must be at least 1.")
+
+        self.flush()
+        where, params = self._where(start, end, result, after_id)
+        rows = self._conn.execute(
+            f"SELECT id, timestamp, result, payload, chain_hash FROM ledger{where} "
+            "ORDER BY id LIMIT ?",
+            [*params, page_size + 1],
+        ).fetchall()
+        records = [self._record(row) for row in rows[:page_size]]
+        next_after = records[-1].id if len(rows) > page_size else None
+        return LedgerPage(records=records, next_after_id=next_after)
+
+    # -- JSONL interchange --------------------------------------------------
+
+    def import_jsonl(self, path: Path) -> int:
+        """Append every entry from a JSONL ledger file; return the count."""
+
+        try:
+            handle = path.open("r", encoding="utf-8-sig")
+        except OSError as exc:
+            raise LedgerError(f"Ledger not found: {path}") from exc
+
+        def entries() -> Iterator[Mapping[str, Any]]:
+            with handle:
+                for line_number, line in enumerate(handle, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError as exc:
+                        raise LedgerError(
+                            f"Ledger entry on line {line_number} is not valid JSON: {exc}"
+                        ) from exc
+                    try:
+                        yield validate_entry(entry)
+                    except LedgerError as exc:
+                        raise LedgerError(
+                            f"Ledger entry on line {line_number} failed schema validation: {exc}"
+                        ) from exc
+
+        return self.append_many(entries())
+
+    def export_jsonl(
+        self,
+        path: Path,
+        start: str | datetime | None = None,
+        end: str | datetime | None = None,
+    ) -> int:
+        """Write entries in the window to a JSONL file; return the count."""
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        count = 0
+        with path.open("w", encoding="utf-8", newline="\n") as handle:
+            for record in self.query(start, end):
+                handle.write(json.dumps(record.entry, separators=(",", ":"), ensure_ascii=False))
+                handle.write("\n")
+                count += 1
+        return count
+
+    # -- integrity ----------------------------------------------------------
+
+    def verify_signatures(
+        self,
+        key: bytes,
+        start: str | datetime | None = None,
+        end: str | datetime | None = None,
+        *,
+        workers: int | None = None,
+        chunk_size: int = 256,
+    ) -> list[SignatureCheck]:
+        """Verify the HMAC signature of every entry in the window.
+
+        Rows are decoded and checked in chunks on a thread pool; results are
+        returned in chronological order.
+        """
+
+        self.flush()
+        where, params = self._where(start, end, None)
+        rows = self._conn.execute(
+            f"SELECT id, timestamp, payload FROM ledger{where} ORDER BY timestamp, id",
+            params,
+        ).fetchall()
+
+        def verify_chunk(chunk: Sequence[tuple[int, str, str]]) -> list[SignatureCheck]:
+            return [
+                SignatureCheck(
+                    id=row_id,
+                    timestamp=timestamp,
+                    status=check_signature(json.loads(payload), key),
+                )
+                for row_id, timestamp, payload in chunk
+            ]
+
+        chunks = [rows[index : index + chunk_size] for index in range(0, len(rows), chunk_size)]
+        results: list[SignatureCheck] = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for checked in executor.map(verify_chunk, chunks):
+                results.extend(checked)
+        return results
+
+    def verify_chain(self, start_id: int | None = None, end_id: int | None = None) -> list[int]:
+        """Return ids in ``[start_id, end_id]`` whose chain hash does not match.
+
+        Verification anchors on the stored hash of the last chained row before
+        *start_id*, so only the requested range is read. Rows written without
+        chaining (``chain_hash`` is NULL) are not part of the chain and are
+        skipped, matching how :meth:`append` links each chained row to the
+        previous chained one.
+        """
+
+        self.flush()
+        start_id = start_id or 1
+        anchor = self._conn.execute(
+            "SELECT chain_hash FROM ledger WHERE id < ? AND chain_hash IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (start_id,),
+        ).fetchone()
+        previous = str(anchor[0]) if anchor and anchor[0] else ""
+
+        sql = "SELECT id, payload, chain_hash FROM ledger WHERE id >= ? AND chain_hash IS NOT NULL"
+        params: list[Any] = [start_id]
+        if end_id is not None:
+            sql += " AND id <= ?"
+            params.append(end_id)
+
+        broken: list[int] = []
+        for row_id, payload, stored in self._conn.execute(sql + " ORDER BY id", params):
+            expected = _chain_hash(previous, payload)
+            if stored != expected:
+                broken.append(int(row_id))
+            # Continue from the stored value so one tampered row is reported once
+            # rather than invalidating every later row.
+            previous = stored
+        return broken
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Manage the SQLite run ledger store.")
+    parser.add_argument("--database", type=Path, required=True, help="Path to the SQLite ledger.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_cmd = commands.add_parser("import", help="Import a JSONL ledger file.")
+    import_cmd.add_argument("jsonl", type=Path)
+    import_cmd.add_argument("--chain", action="store_true", help="Hash-chain imported rows.")
+
+    export_cmd = commands.add_parser("export", help="Export entries to a JSONL file.")
+    export_cmd.add_argument("jsonl", type=Path)
+    export_cmd.add_argument("--start")
+    export_cmd.add_argument("--end")
+
+    query_cmd = commands.add_parser("query", help="Print entries as JSON lines.")
+    query_cmd.add_argument("--start")
+    query_cmd.add_argument("--end")
+    query_cmd.add_argument("--result", choices=ALLOWED_RESULTS)
+    query_cmd.add_argument("--limit", type=int)
+
+    verify_cmd = commands.add_parser("verify", help="Verify entry signatures and hash chain.")
+    verify_cmd.add_argument("--signing-key-path", type=Path)
+    verify_cmd.add_argument("--start")
+    verify_cmd.add_argument("--end")
+    verify_cmd.add_argument("--workers", type=int)
+    verify_cmd.add_argument("--chain", action="store_true", help="Also verify the hash chain.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        chain = args.command == "import" and args.chain
+        with LedgerStore(args.database, chain=chain) as store:
+            if args.command == "import":
+                print(json.dumps({"imported": store.import_jsonl(args.jsonl)}))
+            elif args.command == "export":
+                exported = store.export_jsonl(args.jsonl, args.start, args.end)
+                print(json.dumps({"exported": exported}))
+            elif args.command == "query":
+                records = store.query(args.start, args.end, result=args.result, limit=args.limit)
+                for record in records:
+                    print(json.dumps(record.entry, separators=(",", ":")))
+            else:
+                summary: dict[str, Any] = {}
+                failed = False
+                if args.signing_key_path is not None:
+                    key = load_signing_key(args.signing_key_path)
+                    counts: dict[str, int] = {}
+                    checks = store.verify_signatures(
+                        key, args.start, args.end, workers=args.workers
+                    )
+                    for check in checks:
+                        counts[check.status] = counts.get(check.status, 0) + 1
+                    summary["signatures"] = counts
+                    failed = any(status != "valid" for status in counts)
+                if args.chain:
+                    broken = store.verify_chain()
+                    summary["chainBroken"] = broken
+                    failed = failed or bool(broken)
+                print(json.dumps(summary, sort_keys=True))
+                return 1 if failed else 0
+    except LedgerError as exc:
+        print(f"Ledger operation failed: {exc}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    sys.exit(main())
@@ -0,0 +1,600 @@
+"""Merkle-tree snapshots of a repository for drift detection.
+
+``Invoke-DriftDetection.ps1`` hashes every file listed in its baseline
+manifest on every run, so its cost grows with the size of the monitored tree.
+This module records a snapshot instead: a tree of directory and file nodes in
+which each file carries its SHA-256 and stat metadata (mode, size, mtime) and
+each directory carries a hash over its children's names, kinds, executable
+bits and hashes. Two snapshots are compared top-down and a subtree is entered
+only when its directory hash differs, so the work done by a drift check is
+proportional to what changed rather than to the size of the tree.
+
+Rescanning with the previous snapshot reuses the stored hash of every file
+whose size and mtime are unchanged (the same heuristic as ``git status``);
+files modified within :data:`RACY_WINDOW_NS` of the previous snapshot are
+always rehashed. Pass ``rehash=True`` to hash everything regardless.
+
+Snapshots are stored in a compact binary format: a fixed header followed by a
+zlib-compressed pre-order encoding of the tree using varints for integers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Union
+
+
+FORMAT_MAGIC = b"MRKL"
+FORMAT_VERSION = 1
+DEFAULT_EXCLUDES = frozenset({".git", ".runs", "__pycache__", ".pytest_cache"})
+# Files whose mtime is this close to the previous snapshot may have changed
+# again within the same timestamp tick, so their cached hash is not trusted.
+RACY_WINDOW_NS = 2_000_000_000
+_CHUNK_SIZE = 1 << 20
+_HEADER = struct.Struct("<4sBBQI")  # magic, version, flags, taken_ns, file_count
+
+KIND_FILE = 0
+KIND_DIR = 1
+KIND_SYMLINK = 2
+_KIND_NAMES = {KIND_FILE: "file", KIND_DIR: "directory", KIND_SYMLINK: "symlink"}
+
+
+class SnapshotError(RuntimeError):
+    """Raised when a snapshot cannot be taken, stored, or decoded."""
+
+
+@dataclass
+class FileNode:
+    """A regular file or symlink; ``digest`` is the SHA-256 of its content or link target."""
+
+    name: str
+    kind: int
+    mode: int
+    size: int
+    mtime_ns: int
+    digest: bytes = b""
+
+    @property
+    def executable(self) -> bool:
+        return bool(self.mode & 0o111)
+
+
+@dataclass
+class DirNode:
+    """A directory whose ``digest`` covers every node beneath it."""
+
+    name: str
+    children: dict[str, Union[FileNode, DirNode]] = field(default_factory=dict)
+    digest: bytes = b""
+    kind: int = KIND_DIR
+
+
+Node = Union[FileNode, DirNode]
+
+
+@dataclass
+class Snapshot:
+    """A Merkle tree of a directory taken at ``taken_ns`` (nanoseconds since the epoch)."""
+
+    root: DirNode
+    taken_ns: int
+    file_count: int
+
+    @property
+    def digest(self) -> str:
+        return self.root.digest.hex()
+
+    def iter_files(self) -> Iterator[tuple[str, FileNode]]:
+        """Yield ``(relative_path, node)`` for every file and symlink, in sorted order."""
+        stack: list[tuple[str, DirNode]] = [("", self.root)]
+        while stack:
+            prefix, directory = stack.pop()
+            subdirs = []
+            for name in sorted(directory.children):
+                child = directory.children[name]
+                if isinstance(child, DirNode):
+                    subdirs.append((f"{prefix}{name}/", child))
+                else:
+                    yield f"{prefix}{name}", child
+            stack.extend(reversed(subdirs))
+
+    def find(self, relative_path: str) -> Node | None:
+        node: Node = self.root
+        for part in Path(relative_path).parts:
+            if not isinstance(node, DirNode) or part not in node.children:
+                return None
+            node = node.children[part]
+        return node
+
+
+@dataclass(frozen=True)
+class DriftFinding:
+    """One difference between the baseline and the current tree."""
+
+    path: str
+    type: str
+    message: str
+
+
+@dataclass
+class DriftReport:
+    """Findings of a snapshot comparison plus how much of the tree had to be visited."""
+
+    findings: list[DriftFinding] = field(default_factory=list)
+    baseline_digest: str = ""
+    current_digest: str = ""
+    directories_visited: int = 0
+    subtrees_skipped: int = 0
+
+    @property
+    def drift_detected(self) -> bool:
+        return bool(self.findings)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Serialise using the result shape of ``Invoke-DriftDetection.ps1``."""
+        return {
+            "checkedAtUtc": datetime.now(timezone.utc).isoformat(),
+            "driftDetected": self.drift_detected,
+            "baselineDigest": self.baseline_digest,
+            "currentDigest": self.current_digest,
+            "directoriesVisited": self.directories_visited,
+            "subtreesSkipped": self.subtrees_skipped,
+            "findings": [
+                {"path": f.path, "type": f.type, "message": f.message} for f in self.findings
+            ],
+        }
+
+
+def _hash_file(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while chunk := handle.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _dir_digest(directory: DirNode) -> bytes:
+    digest = hashlib.sha256()
+    for name in sorted(directory.children):
+        child = directory.children[name]
+        flag = 1 if isinstance(child, FileNode) and child.executable else 0
+        digest.update(bytes((child.kind, flag)))
+        digest.update(name.encode("utf-8", "surrogateescape"))
+        digest.update(b"\0")
+        digest.update(child.digest)
+    return digest.digest()
+
+
+def _finalise(directory: DirNode) -> int:
+    """Compute missing directory digests bottom-up; returns the number of files beneath.
+
+    Directories grafted unchanged from a previous snapshot keep their digest.
+    """
+    files = 0
+    for child in directory.children.values():
+        if isinstance(child, DirNode):
+            files += _finalise(child)
+        else:
+            files += 1
+    if not directory.digest:
+        directory.digest = _dir_digest(directory)
+    return files
+
+
+def _reusable(node: Node | None, st: os.stat_result, trusted_before_ns: int) -> bool:
+    return (
+        isinstance(node, FileNode)
+        and node.kind == KIND_FILE
+        and node.size == st.st_size
+        and node.mtime_ns == st.st_mtime_ns
+        and node.mode == st.st_mode
+        and node.mtime_ns < trusted_before_ns
+        and len(node.digest) == 32
+    )
+
+
+def scan_tree(
+    root: Path,
+    previous: Snapshot | None = None,
+    *,
+    paths: Sequence[str] | None = None,
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    rehash: bool = False,
+    workers: int | None = None,
+) -> Snapshot:
+    """Snapshot ``root`` (or only the relative ``paths`` beneath it).
+
+    With ``previous``, files whose stat metadata matches the previous snapshot
+    keep their stored hash; everything else is hashed on a thread pool. With
+    both ``paths`` and ``previous``, everything outside ``paths`` is carried
+    over from ``previous``, so the result is a full snapshot that can be
+    diffed against (or replace) the previous one.
+    """
+    root = Path(root)
+    if not root.is_dir():
+        raise SnapshotError(f"Snapshot root is not a directory: {root}")
+    taken_ns = time.time_ns()
+    excluded = frozenset(excludes)
+    trusted_before = (previous.taken_ns - RACY_WINDOW_NS) if previous and not rehash else -1
+    pending: list[tuple[FileNode, str]] = []
+
+    def add_entry(parent: DirNode, prev_parent: DirNode | None, name: str, path: str) -> None:
+        prev = prev_parent.children.get(name) if prev_parent is not None else None
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            return
+        if stat.S_ISDIR(st.st_mode):
+            directory = DirNode(name)
+            walk(directory, prev if isinstance(prev, DirNode) else None, path)
+            parent.children[name] = directory
+        elif stat.S_ISLNK(st.st_mode):
+            target = os.readlink(path).encode("utf-8", "surrogateescape")
+            parent.children[name] = FileNode(
+                name, KIND_SYMLINK, st.st_mode, len(target), st.st_mtime_ns,
+                hashlib.sha256(target).digest(),
+            )
+        elif stat.S_ISREG(st.st_mode):
+            node = FileNode(name, KIND_FILE, st.st_mode, st.st_size, st.st_mtime_ns)
+            if _reusable(prev, st, trusted_before):
+                node.digest = prev.digest  # type: ignore[union-attr]
+            else:
+                pending.append((node, path))
+            parent.children[name] = node
+
+    def walk(directory: DirNode, prev_dir: DirNode | None, path: str) -> None:
+        try:
+            with os.scandir(path) as entries:
+                names = [e.name for e in entries if e.name not in excluded]
+        except OSError as exc:
+            raise SnapshotError(f"Unable to list {path}: {exc}") from exc
+        for name in names:
+            add_entry(directory, prev_dir, name, os.path.join(path, name))
+
+    tree = DirNode("")
+    if paths is None:
+        walk(tree, previous.root if previous else None, str(root))
+    else:
+        if previous is not None:
+            # Share the previous subtrees; directories on a scanned path are
+            # copied (with an empty digest) before they are modified.
+            tree.children = dict(previous.root.children)
+        for relative in sorted(set(paths)):
+            parts = Path(relative).parts
+            parent, prev_parent = tree, previous.root if previous else None
+            for part in parts[:-1]:
+                nxt = prev_parent.children.get(part) if prev_parent is not None else None
+                child = parent.children.get(part)
+                if not isinstance(child, DirNode):
+                    child = parent.children[part] = DirNode(part)
+                elif child is nxt:
+                    child = parent.children[part] = DirNode(part, dict(child.children))
+                parent = child
+                prev_parent = nxt if isinstance(nxt, DirNode) else None
+            if parts:
+                parent.children.pop(parts[-1], None)  # re-added if it still exists
+                add_entry(parent, prev_parent, parts[-1], str(root.joinpath(*parts)))
+
+    if pending:
+        paths_to_hash = [path for _, path in pending]
+        if len(pending) > 1 and workers != 1:
+            with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+                digests = list(pool.map(_hash_file, paths_to_hash, chunksize=64))
+        else:
+            digests = [_hash_file(path) for path in paths_to_hash]
+        for (node, _), digest in zip(pending, digests):
+            node.digest = digest
+
+    file_count = _finalise(tree)
+    return Snapshot(tree, taken_ns, file_count)
+
+
+def _subtree_paths(node: Node, path: str) -> Iterator[str]:
+    if isinstance(node, DirNode):
+        for name in sorted(node.children):
+            yield from _subtree_paths(node.children[name], f"{path}/{name}")
+    else:
+        yield path
+
+
+def diff_snapshots(baseline: Snapshot, current: Snapshot) -> DriftReport:
+    """Compare two snapshots, descending only into directories whose digests differ."""
+    report = DriftReport(baseline_digest=baseline.digest, current_digest=current.digest)
+
+    def compare(old: DirNode, new: DirNode, prefix: str) -> None:
+        report.directories_visited += 1
+        for name in sorted(old.children.keys() | new.children.keys()):
+            a, b = old.children.get(name), new.children.get(name)
+            path = f"{prefix}{name}"
+            if a is None:
+                for added in _subtree_paths(b, path):  # type: ignore[arg-type]
+                    report.findings.append(DriftFinding(added, "added", "Not in baseline."))
+            elif b is None:
+                for removed in _subtree_paths(a, path):
+                    report.findings.append(DriftFinding(removed, "missing", "Missing from tree."))
+            elif a.kind != b.kind:
+                report.findings.append(
+                    DriftFinding(
+                        path,
+                        "type-changed",
+                        f"Changed from {_KIND_NAMES[a.kind]} to {_KIND_NAMES[b.kind]}.",
+                    )
+                )
+            elif isinstance(a, DirNode):
+                if a.digest == b.digest:
+                    report.subtrees_skipped += 1
+                else:
+                    compare(a, b, f"{path}/")  # type: ignore[arg-type]
+            elif a.digest != b.digest:
+                report.findings.append(
+                    DriftFinding(path, "checksum", "SHA256 hash does not match baseline.")
+                )
+            elif a.executable != b.executable:  # type: ignore[union-attr]
+                report.findings.append(
+                    DriftFinding(path, "mode", "Executable bit differs from baseline.")
+                )
+
+    if baseline.root.digest == current.root.digest:
+        report.subtrees_skipped = 1
+    else:
+        compare(baseline.root, current.root, "")
+    return report
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_snapshot(snapshot: Snapshot, *, level: int = 6) -> bytes:
+    """Serialise ``snapshot`` to the binary format."""
+    body = bytearray()
+
+    def emit(node: Node) -> None:
+        name = node.name.encode("utf-8", "surrogateescape")
+        body.append(node.kind)
+        _write_varint(body, len(name))
+        body.extend(name)
+        body.extend(node.digest)
+        if isinstance(node, DirNode):
+            _write_varint(body, len(node.children))
+            for key in sorted(node.children):
+                emit(node.children[key])
+        else:
+            _write_varint(body, node.mode)
+            _write_varint(body, node.size)
+            _write_varint(body, max(node.mtime_ns, 0))
+
+    emit(snapshot.root)
+    header = _HEADER.pack(
+        FORMAT_MAGIC, FORMAT_VERSION, 0, snapshot.taken_ns, snapshot.file_count
+    )
+    return header + zlib.compress(bytes(body), level)
+
+
+def decode_snapshot(data: bytes) -> Snapshot:
+    """Parse the binary format produced by :func:`encode_snapshot`."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated.")
+    magic, version, _flags, taken_ns, file_count = _HEADER.unpack_from(data)
+    if magic != FORMAT_MAGIC:
+        raise SnapshotError("Not a Merkle snapshot file.")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version {version}.")
+    try:
+        body = zlib.decompress(data[_HEADER.size:])
+    except zlib.error as exc:
+        raise SnapshotError(f"Snapshot body is corrupt: {exc}") from exc
+
+    pos = 0
+
+    def read() -> Node:
+        nonlocal pos
+        kind = body[pos]
+        length, pos = _read_varint(body, pos + 1)
+        name = body[pos:pos + length].decode("utf-8", "surrogateescape")
+        digest = body[pos + length:pos + length + 32]
+        pos += length + 32
+        if kind == KIND_DIR:
+            count, pos = _read_varint(body, pos)
+            directory = DirNode(name, digest=digest)
+            for _ in range(count):
+                child = read()
+                directory.children[child.name] = child
+            return directory
+        if kind not in (KIND_FILE, KIND_SYMLINK):
+            raise SnapshotError(f"Unknown node kind {kind}.")
+        mode, pos = _read_varint(body, pos)
+        size, pos = _read_varint(body, pos)
+        mtime_ns, pos = _read_varint(body, pos)
+        return FileNode(name, kind, mode, size, mtime_ns, digest)
+
+    try:
+        root = read()
+    except IndexError as exc:
+        raise SnapshotError("Snapshot body is truncated.") from exc
+    if not isinstance(root, DirNode) or pos != len(body):
+        raise SnapshotError("Snapshot body is malformed.")
+    return Snapshot(root, taken_ns, file_count)
+
+
+def save_snapshot(snapshot: Snapshot, path: Path) -> int:
+    """Atomically write ``snapshot`` to ``path``; returns the size in bytes."""
+    data = encode_snapshot(snapshot)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except OSError as exc:
+        tmp.unlink(missing_ok=True)
+        raise SnapshotError(f"Unable to write snapshot {path}: {exc}") from exc
+    return len(data)
+
+
+def load_snapshot(path: Path) -> Snapshot:
+    try:
+        data = path.read_bytes()
+    except OSError as exc:
+        raise SnapshotError(f"Unable to read snapshot {path}: {exc}") from exc
+    return decode_snapshot(data)
+
+
+def _make_tree(root: Path, files: int, fanout: int) -> list[Path]:
+    """Create ``files`` small files spread over two directory levels of ``fanout``."""
+    created = []
+    per_leaf = max(1, -(-files // (fanout * fanout)))
+    backdated = time.time() - 3600  # outside the racy window
+    for index in range(files):
+        leaf = index // per_leaf
+        directory = root / f"d{leaf // fanout:03d}" / f"d{leaf % fanout:03d}"
+        if index % per_leaf == 0:
+            directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"f{index:06d}.txt"
+        path.write_bytes(f"file {index}\n".encode() * 4)
+        os.utime(path, (backdated, backdated))
+        created.append(path)
+    return created
+
+
+def run_benchmark(
+    files: int = 100_000, changes: int = 10, fanout: int = 32, work_dir: Path | None = None
+) -> dict[str, Any]:
+    """Time full and incremental snapshots and diffs over a synthetic tree."""
+    base = Path(tempfile.mkdtemp(prefix="merkle-bench-", dir=work_dir))
+    try:
+        tree = base / "tree"
+        created = _make_tree(tree, files, fanout)
+
+        def timed(func: Any, *args: Any, **kwargs: Any) -> tuple[Any, float]:
+            started = time.perf_counter()
+            value = func(*args, **kwargs)
+            return value, round((time.perf_counter() - started) * 1000, 3)
+
+        baseline, full_ms = timed(scan_tree, tree)
+        unchanged, rescan_ms = timed(scan_tree, tree, baseline)
+        identical, diff_identical_ms = timed(diff_snapshots, baseline, unchanged)
+
+        step = max(1, len(created) // max(changes, 1))
+        for path in created[::step][:changes]:
+            path.write_bytes(b"drifted\n")
+        changed, rescan_changed_ms = timed(scan_tree, tree, baseline)
+        drift, diff_changed_ms = timed(diff_snapshots, baseline, changed)
+
+        encoded, encode_ms = timed(encode_snapshot, baseline)
+        _, decode_ms = timed(decode_snapshot, encoded)
+        manifest_bytes = len(
+            json.dumps(
+                {"files": [{"path": p, "sha256": n.digest.hex()} for p, n in baseline.iter_files()]}
+            )
+        )
+        return {
+            "files": baseline.file_count,
+            "changes": len(drift.findings),
+            "fullScanMs": full_ms,
+            "rescanUnchangedMs": rescan_ms,
+            "rescanChangedMs": rescan_changed_ms,
+            "diffIdenticalMs": diff_identical_ms,
+            "diffChangedMs": diff_changed_ms,
+            "directoriesVisited": drift.directories_visited,
+            "subtreesSkipped": drift.subtrees_skipped,
+            "identicalDriftDetected": identical.drift_detected,
+            "encodeMs": encode_ms,
+            "decodeMs": decode_ms,
+            "snapshotBytes": len(encoded),
+            "jsonManifestBytes": manifest_bytes,
+        }
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Merkle-tree snapshots for drift detection.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snap_cmd = commands.add_parser("snapshot", help="Write a snapshot of a directory.")
+    snap_cmd.add_argument("--root", type=Path, default=Path("."))
+    snap_cmd.add_argument("--output", type=Path, required=True)
+    snap_cmd.add_argument("--previous", type=Path, help="Reuse hashes of unchanged files.")
+    snap_cmd.add_argument("--path", action="append", dest="paths", help="Limit to a subpath.")
+
+    diff_cmd = commands.add_parser("diff", help="Compare two snapshot files.")
+    diff_cmd.add_argument("baseline", type=Path)
+    diff_cmd.add_argument("current", type=Path)
+
+    check_cmd = commands.add_parser("check", help="Compare a directory with a baseline.")
+    check_cmd.add_argument("--root", type=Path, default=Path("."))
+    check_cmd.add_argument("--baseline", type=Path, required=True)
+    check_cmd.add_argument("--path", action="append", dest="paths", help="Limit to a subpath.")
+    check_cmd.add_argument("--rehash", action="store_true", help="Ignore cached file hashes.")
+    check_cmd.add_argument("--save", type=Path, help="Also write the current snapshot here.")
+
+    bench_cmd = commands.add_parser("bench", help="Benchmark on a synthetic tree.")
+    bench_cmd.add_argument("--files", type=int, default=100_000)
+    bench_cmd.add_argument("--changes", type=int, default=10)
+    bench_cmd.add_argument("--work-dir", type=Path)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "snapshot":
+            previous = load_snapshot(args.previous) if args.previous else None
+            snapshot = scan_tree(args.root, previous, paths=args.paths)
+            size = save_snapshot(snapshot, args.output)
+            summary = {"digest": snapshot.digest, "files": snapshot.file_count, "bytes": size}
+            print(json.dumps(summary))
+            return 0
+        if args.command == "bench":
+            result = run_benchmark(args.files, args.changes, work_dir=args.work_dir)
+            print(json.dumps(result, indent=2))
+            return 0
+        if args.command == "diff":
+            report = diff_snapshots(load_snapshot(args.baseline), load_snapshot(args.current))
+        else:
+            baseline = load_snapshot(args.baseline)
+            current = scan_tree(args.root, baseline, paths=args.paths, rehash=args.rehash)
+            if args.save is not None:
+                save_snapshot(current, args.save)
+            report = diff_snapshots(baseline, current)
+    except SnapshotError as exc:
+        print(f"Snapshot operation failed: {exc}", file=sys.stderr)
+        return 2
+
+    print(json.dumps(report.as_dict(), indent=2))
+    return 1 if report.drift_detected else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    sys.exit(main())
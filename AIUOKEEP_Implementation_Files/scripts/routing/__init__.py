@@ -0,0 +1,5 @@
+"""File routing helpers for the file-name contract in ``file-routing/``."""
+
+from .file_router import FileRouter, FileRouterError, RouterConfig
+
+__all__ = ["FileRouter", "FileRouterError", "RouterConfig"]
@@ -0,0 +1,484 @@
+"""High-throughput file router driven by ``file-routing/file_router.config.json``.
+
+This is the Python counterpart of ``FileRouter_Watcher.ps1`` for bulk work:
+the file-name contract regex is compiled once, routes are indexed by
+``(project, area, subfolder)`` so every lookup is a dictionary hit, each file
+is hashed exactly once with a streaming SHA-256 on a thread pool (the digest
+serves both the ``sha8`` check and duplicate detection), and files are moved
+with :func:`os.replace` when source and destination share a filesystem.
+
+Sweeps honour each watcher's ``processExistingOnStart`` flag and can run in
+dry-run mode, which plans every move without touching the disk and reports
+throughput. Live filesystem notifications remain the job of the PowerShell
+watcher.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_DOTNET_GROUP = re.compile(r"\(\?<(?![=!])")
+_DOTNET_ENV_VAR = re.compile(r"%([^%]+)%")
+_DOTNET_DATE_TOKENS = (
+    ("yyyy", "%Y"),
+    ("MM", "%m"),
+    ("dd", "%d"),
+    ("HH", "%H"),
+    ("mm", "%M"),
+    ("ss", "%S"),
+)
+
+
+class FileRouterError(RuntimeError):
+    """Raised when the router configuration is invalid or a move fails."""
+
+
+@dataclass(frozen=True)
+class WatcherConfig:
+    """A watcher entry from the configuration with its path resolved."""
+
+    name: str
+    path: Path
+    filter: str
+    include_subdirectories: bool
+    process_existing_on_start: bool
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Where a file should go, decided from its name before any hashing."""
+
+    source: Path
+    metadata: Mapping[str, str] | None
+    destination_dir: Path | None
+    reason: str | None = None
+
+    @property
+    def routable(self) -> bool:
+        return self.reason is None
+
+
+@dataclass
+class SweepReport:
+    """Counters and throughput for a sweep."""
+
+    files: int = 0
+    bytes_hashed: int = 0
+    elapsed_s: float = 0.0
+    events: Counter[str] = field(default_factory=Counter)
+    dry_run: bool = False
+
+    def as_dict(self) -> dict[str, Any]:
+        elapsed = self.elapsed_s or 1e-9
+        return {
+            "dryRun": self.dry_run,
+            "files": self.files,
+            "events": dict(sorted(self.events.items())),
+            "bytesHashed": self.bytes_hashed,
+            "elapsedSeconds": round(self.elapsed_s, 4),
+            "filesPerSecond": round(self.files / elapsed, 1),
+            "mbHashedPerSecond": round(self.bytes_hashed / elapsed / 1_000_000, 2),
+        }
+
+
+def _expand_path(value: str, base: Path) -> Path:
+    expanded = _DOTNET_ENV_VAR.sub(lambda m: os.environ.get(m.group(1), m.group(0)), value)
+    path = Path(os.path.expanduser(os.path.expandvars(expanded)))
+    if not path.is_absolute():
+        path = base / path
+    return Path(os.path.abspath(path))
+
+
+def _strptime_format(dotnet_format: str) -> str:
+    result = dotnet_format
+    for token, directive in _DOTNET_DATE_TOKENS:
+        result = result.replace(token, directive)
+    return result
+
+
+def sha256_file(path: Path) -> str:
+    """Return the lowercase hex SHA-256 of *path*, read in fixed-size chunks."""
+
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RouterConfig:
+    """Parsed configuration with the contract regex and route index prepared."""
+
+    def __init__(self, data: Mapping[str, Any], config_dir: Path) -> None:
+        for key in ("schemaVersion", "routing", "watchers"):
+            if not data.get(key):
+                raise FileRouterError(f"Configuration is missing '{key}'.")
+
+        contract = data.get("fileNameContract") or {}
+        if not contract.get("pattern"):
+            raise FileRouterError("Configuration must provide fileNameContract.pattern.")
+
+        self.data = data
+        self.config_dir = config_dir
+        self.schema_version = str(data["schemaVersion"])
+        # The contract is written for .NET; only named groups need translating.
+        self.pattern = re.compile(_DOTNET_GROUP.sub("(?P<", contract["pattern"]))
+        self.timestamp_format = _strptime_format(
+            contract.get("timestampFormat", "yyyyMMddTHHmmssZ")
+        )
+        self.checksum_length = int(contract.get("checksumLength", 8))
+        self.allowed_extensions = frozenset(
+            ext.lower() for ext in (data.get("filters") or {}).get("allowedExtensions", [])
+        )
+
+        defaults = data.get("defaults") or {}
+        self.quarantine_dir = _expand_path(
+            defaults.get("quarantineDirectory", "./quarantine"), config_dir
+        )
+        self.duplicates_dir = _expand_path(
+            defaults.get("duplicatesDirectory", "./duplicates"), config_dir
+        )
+        self.ledger_path = _expand_path(
+            (data.get("logging") or {}).get("ledgerPath", "./logs/file-router-ledger.jsonl"),
+            config_dir,
+        )
+
+        policy = data.get("duplicatePolicy") or {}
+        self.suffix_format = str(policy.get("suffixFormat", "--dup{0}"))
+        self.max_suffix_attempts = int(policy.get("maxSuffixAttempts", 10))
+
+        self.routes: dict[tuple[str, str, str], Path] = {}
+        self.project_defaults: dict[str, tuple[Path, str | None, str | None]] = {}
+        for project in data["routing"]:
+            name = project["project"]
+            root = _expand_path(project.get("root", "./"), config_dir)
+            project_defaults = project.get("defaults") or {}
+            self.project_defaults[name] = (
+                root,
+                project_defaults.get("area"),
+                project_defaults.get("destination"),
+            )
+            for route in project.get("routes", []):
+                route_key = (name, route["area"], route["subfolder"])
+                self.routes[route_key] = root / route["destination"]
+
+        self.watchers = [
+            WatcherConfig(
+                name=str(watcher.get("name") or watcher["path"]),
+                path=_expand_path(watcher["path"], config_dir),
+                filter=str(watcher.get("filter") or "*.*"),
+                include_subdirectories=bool(watcher.get("includeSubdirectories")),
+                process_existing_on_start=bool(watcher.get("processExistingOnStart")),
+            )
+            for watcher in data["watchers"]
+        ]
+
+    @classmethod
+    def load(cls, path: Path) -> RouterConfig:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except OSError as exc:
+            raise FileRouterError(f"Unable to read router configuration {path}: {exc}") from exc
+        except json.JSONDecodeError as exc:
+            raise FileRouterError(f"Configuration at '{path}' is invalid JSON: {exc}") from exc
+        if not isinstance(data, Mapping):
+            raise FileRouterError(f"Configuration at '{path}' must be a JSON object.")
+        return cls(data, path.resolve().parent)
+
+    def resolve_destination(self, project: str, area: str, subfolder: str) -> Path | str:
+        """Return the destination directory, or ``UnknownProject``/``UnknownRoute``."""
+
+        destination = self.routes.get((project, area, subfolder))
+        if destination is not None:
+            return destination
+
+        defaults = self.project_defaults.get(project)
+        if defaults is None:
+            return "UnknownProject"
+        root, default_area, default_destination = defaults
+        if default_area is not None:
+            destination = self.routes.get((project, default_area, subfolder))
+            if destination is not None:
+                return destination
+        if default_destination:
+            return root / default_destination
+        return "UnknownRoute"
+
+
+class FileRouter:
+    """Routes files according to a :class:`RouterConfig`."""
+
+    def __init__(self, config: RouterConfig, *, dry_run: bool = False, workers: int | None = None):
+        self.config = config
+        self.dry_run = dry_run
+        self.workers = workers
+        self._ledger_lock = threading.Lock()
+        self._device_cache: dict[Path, int] = {}
+
+    # -- decisions ----------------------------------------------------------
+
+    def classify(self, path: Path) -> RouteDecision:
+        """Validate the name of *path* and resolve its route without reading it."""
+
+        config = self.config
+        if config.allowed_extensions and path.suffix.lower() not in config.allowed_extensions:
+            return RouteDecision(path, None, None, f"Extension '{path.suffix.lower()}' not allowed")
+
+        match = config.pattern.match(path.name)
+        if match is None:
+            return RouteDecision(path, None, None, "InvalidName")
+        metadata = {key: value or "" for key, value in match.groupdict().items()}
+
+        try:
+            datetime.strptime(metadata.get("timestamp", ""), config.timestamp_format)
+        except ValueError:
+            return RouteDecision(path, metadata, None, "InvalidTimestamp")
+
+        destination = config.resolve_destination(
+            metadata.get("project", ""), metadata.get("area", ""), metadata.get("subfolder", "")
+        )
+        if isinstance(destination, str):
+            return RouteDecision(path, metadata, None, destination)
+        return RouteDecision(path, metadata, destination)
+
+    def _hash(self, decision: RouteDecision) -> tuple[str | None, int]:
+        if not decision.routable:
+            return None, 0
+        try:
+            size = decision.source.stat().st_size
+            return sha256_file(decision.source), size
+        except OSError:
+            return None, 0
+
+    # -- moves --------------------------------------------------------------
+
+    def _device(self, directory: Path) -> int:
+        device = self._device_cache.get(directory)
+        if device is None:
+            probe = directory
+            while not probe.exists() and probe != probe.parent:
+                probe = probe.parent
+            device = probe.stat().st_dev
+            self._device_cache[directory] = device
+        return device
+
+    def _move(self, source: Path, destination: Path) -> None:
+        if self.dry_run:
+            return
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if source.stat().st_dev == self._device(destination.parent):
+                os.replace(source, destination)
+            else:
+                shutil.move(str(source), str(destination))
+        except OSError as exc:
+            raise FileRouterError(f"Failed to move '{source}' to '{destination}': {exc}") from exc
+
+    @staticmethod
+    def _free_name(directory: Path, source: Path, suffix_format: str, start: int = 1) -> Path:
+        candidate = directory / source.name
+        index = start
+        while candidate.exists():
+            candidate = directory / f"{source.stem}{suffix_format.format(index)}{source.suffix}"
+            index += 1
+        return candidate
+
+    def _place(self, decision: RouteDecision, digest: str) -> tuple[str, Path]:
+        assert decision.destination_dir is not None  # noqa: S101 - guarded by routable
+        source = decision.source
+        target = decision.destination_dir / source.name
+        if not target.exists():
+            return "Routed", target
+
+        if sha256_file(target) == digest:
+            return "DuplicateContent", self._free_name(
+                self.config.duplicates_dir, source, "--dup{0}"
+            )
+
+        for index in range(1, self.config.max_suffix_attempts + 1):
+            name = f"{source.stem}{self.config.suffix_format.format(index)}{source.suffix}"
+            candidate = decision.destination_dir / name
+            if not candidate.exists():
+                return "Conflicted", candidate
+        raise FileRouterError(f"Exceeded maximum duplicate suffix attempts for '{source.name}'.")
+
+    def _quarantine(self, source: Path, reason: str) -> dict[str, Any]:
+        destination = self._free_name(self.config.quarantine_dir, source, "--{0}")
+        self._move(source, destination)
+        return self._event("Quarantined", source, destination, {"reason": reason}, None, reason)
+
+    def _event(
+        self,
+        event_type: str,
+        source: Path,
+        destination: Path | None,
+        metadata: Mapping[str, Any] | None,
+        digest: str | None,
+        message: str | None,
+    ) -> dict[str, Any]:
+        return {
+            "timestampUtc": datetime.now(timezone.utc).isoformat(),
+            "configVersion": self.config.schema_version,
+            "eventType": event_type,
+            "sourcePath": str(source),
+            "destinationPath": str(destination) if destination else None,
+            "hash": digest.upper() if digest else None,
+            "metadata": dict(metadata) if metadata else None,
+            "message": message,
+        }
+
+    def _apply(self, decision: RouteDecision, digest: str | None, trigger: str) -> dict[str, Any]:
+        source = decision.source
+        try:
+            if not decision.routable:
+                return self._quarantine(source, str(decision.reason))
+            if digest is None:
+                return self._event("Error", source, None, None, None, "File could not be read")
+
+            # Contracts without a sha8 group carry no checksum to verify.
+            expected = (decision.metadata or {}).get("sha8")
+            if expected is not None and digest[: self.config.checksum_length] != expected.lower():
+                return self._quarantine(source, "ChecksumMismatch")
+
+            event_type, destination = self._place(decision, digest)
+            self._move(source, destination)
+            metadata = {**(decision.metadata or {}), "trigger": trigger}
+            return self._event(event_type, source, destination, metadata, digest, trigger)
+        except (FileRouterError, OSError) as exc:
+            # A file that vanishes or is locked mid-pass is logged and skipped,
+            # like the PowerShell watcher, rather than aborting the batch.
+            return self._event("Error", source, None, {"error": str(exc)}, digest, trigger)
+
+    def _write_ledger(self, events: Iterable[Mapping[str, Any]]) -> None:
+        if self.dry_run:
+            return
+        lines = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+        if not lines:
+            return
+        with self._ledger_lock:
+            self.config.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.config.ledger_path.open("a", encoding="utf-8") as handle:
+                handle.write(lines)
+
+    # -- entry points -------------------------------------------------------
+
+    def route_files(
+        self, paths: Sequence[Path], trigger: str = "Manual", report: SweepReport | None = None
+    ) -> list[dict[str, Any]]:
+        """Route *paths* in order, hashing them concurrently."""
+
+        report = report or SweepReport(dry_run=self.dry_run)
+        decisions = [self.classify(path) for path in paths]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            hashes = list(executor.map(self._hash, decisions))
+
+        # Moves stay sequential so duplicate and conflict resolution sees the
+        # effect of earlier files in the same batch.
+        events = []
+        for decision, (digest, size) in zip(decisions, hashes):
+            event = self._apply(decision, digest, trigger)
+            events.append(event)
+            report.files += 1
+            report.bytes_hashed += size
+            report.events[event["eventType"]] += 1
+        self._write_ledger(events)
+        return events
+
+    def _scan(self, watcher: WatcherConfig, errors: list[dict[str, Any]]) -> list[Path]:
+        found: list[tuple[float, str]] = []
+        pending = [str(watcher.path)]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if watcher.include_subdirectories:
+                                    pending.append(entry.path)
+                            elif entry.is_file() and fnmatch.fnmatch(entry.name, watcher.filter):
+                                found.append((entry.stat().st_mtime, entry.path))
+                        except OSError as exc:
+                            errors.append(self._scan_error(Path(entry.path), exc))
+            except OSError as exc:
+                errors.append(self._scan_error(Path(directory), exc))
+        found.sort()
+        return [Path(path) for _, path in found]
+
+    def _scan_error(self, path: Path, exc: OSError) -> dict[str, Any]:
+        return self._event("Error", path, None, {"error": str(exc)}, None, "InitialSweep")
+
+    def sweep(self, watchers: Iterable[WatcherConfig] | None = None) -> SweepReport:
+        """Route the existing files of every watcher with ``processExistingOnStart``."""
+
+        report = SweepReport(dry_run=self.dry_run)
+        started = time.perf_counter()
+        selected = self.config.watchers if watchers is None else list(watchers)
+        for watcher in selected:
+            if not watcher.process_existing_on_start:
+                continue
+            if not watcher.path.is_dir():
+                raise FileRouterError(f"Configured watch path '{watcher.path}' does not exist.")
+            errors: list[dict[str, Any]] = []
+            self.route_files(self._scan(watcher, errors), "InitialSweep", report)
+            if errors:
+                report.events["Error"] += len(errors)
+                self._write_ledger(errors)
+        report.elapsed_s = time.perf_counter() - started
+        return report
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Route files per file_router.config.json.")
+    parser.add_argument("--config", type=Path, required=True, help="Router configuration file.")
+    parser.add_argument("--dry-run", action="store_true", help="Plan moves and report throughput.")
+    parser.add_argument("--workers", type=int, help="Hashing threads (default: executor default).")
+    parser.add_argument(
+        "files", nargs="*", type=Path, help="Route these files instead of sweeping."
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        config = RouterConfig.load(args.config)
+        router = FileRouter(config, dry_run=args.dry_run, workers=args.workers)
+        if args.files:
+            report = SweepReport(dry_run=args.dry_run)
+            started = time.perf_counter()
+            router.route_files(args.files, "Manual", report)
+            report.elapsed_s = time.perf_counter() - started
+        else:
+            report = router.sweep()
+    except FileRouterError as exc:
+        print(f"File routing failed: {exc}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(report.as_dict()))
+    return 1 if report.events.get("Error") else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    sys.exit(main())
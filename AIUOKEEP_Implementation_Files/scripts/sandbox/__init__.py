@@ -0,0 +1,5 @@
+"""Sandbox helpers complementing the Stream E PowerShell and shell scripts."""
+
+from .workspace_pool import Lease, WorkspacePool, WorkspacePoolError
+
+__all__ = ["Lease", "WorkspacePool", "WorkspacePoolError"]
@@ -9,11 +9,15 @@ without introducing additional runtime dependencies.
 from __future__ import annotations
 
 import argparse
+import contextlib
+import importlib.util
 import json
+import os
 from dataclasses import dataclass
 from pathlib import Path
 import sys
-from typing import Any, Iterable, Mapping
+from types import ModuleType
+from typing import Any, ContextManager, Iterable, Mapping
 
 
 class ChangePlanValidationError(RuntimeError):
@@ -209,15 +213,53 @@ def _build_parser() -> argparse.ArgumentParser:
         required=False,
         help="Optional path to the ChangePlan JSON Schema file.",
     )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        choices=("cprofile", "sample", "all"),
+        default=None,
+        help="Write profiling data to .runs/profiles/ (uses watcher/profiling.py).",
+    )
     return parser
 
 
+def _load_profiling() -> ModuleType | None:
+    """Load the shared watcher profiling hook when this tree sits in R_PIPELINE."""
+
+    helper = Path(__file__).resolve().parents[3] / "watcher" / "profiling.py"
+    if not helper.is_file():
+        return None
+    spec = importlib.util.spec_from_file_location("watcher_profiling", helper)
+    if spec is None or spec.loader is None:  # pragma: no cover - defensive guard
+        return None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _profiling_context(mode: str | None) -> ContextManager[Any]:
+    if mode is None and not os.environ.get("WATCHER_PROFILE"):
+        return contextlib.nullcontext()
+    profiling = _load_profiling()
+    if profiling is None:
+        if mode is not None:
+            print(
+                "Profiling requested but watcher/profiling.py was not found.",
+                file=sys.stderr,
+            )
+        return contextlib.nullcontext()
+    context: ContextManager[Any] = profiling.profiled("changeplan_validator", mode)
+    return context
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = _build_parser()
     args = parser.parse_args(argv)
 
     try:
-        validate_changeplan(args.workspace, args.schema)
+        with _profiling_context(args.profile):
+            validate_changeplan(args.workspace, args.schema)
     except ChangePlanValidationError as exc:
         print(f"ChangePlan validation failed: {exc}", file=sys.stderr)
         return 1
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.routing.file_router import (  # noqa: E402  pylint: disable=wrong-import-position
+    FileRouter,
+    RouterConfig,
+)
+
+ULID = "01HZX3K7Q9V5M2N8P4R6S0T1W3"
+
+
+def _contract_pattern() -> str:
+    config_path = REPO_ROOT / "file-routing" / "file_router.config.json"
+    return json.loads(config_path.read_text(encoding="utf-8"))["fileNameContract"]["pattern"]
+
+
+def _config(tmp_path: Path) -> RouterConfig:
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    data = {
+        "schemaVersion": "1.0.0",
+        "watchers": [{"name": "Inbox", "path": str(inbox), "processExistingOnStart": True}],
+        "fileNameContract": {
+            "pattern": _contract_pattern(),
+            "timestampFormat": "yyyyMMddTHHmmssZ",
+            "checksumLength": 8,
+        },
+        "filters": {"allowedExtensions": [".md", ".py"]},
+        "routing": [
+            {
+                "project": "SPEC-1",
+                "root": "./repo",
+                "routes": [
+                    {"area": "DOC", "subfolder": "GUIDE", "destination": "docs/guides"},
+                    {"area": "OPS", "subfolder": "AUDIT", "destination": "scripts/audit"},
+                ],
+                "defaults": {"area": "DOC", "destination": "docs"},
+            }
+        ],
+        "defaults": {
+            "quarantineDirectory": "./quarantine",
+            "duplicatesDirectory": "./duplicates",
+        },
+        "logging": {"ledgerPath": "./logs/ledger.jsonl"},
+        "duplicatePolicy": {"suffixFormat": "--dup{0}", "maxSuffixAttempts": 5},
+    }
+    config_path = tmp_path / "file_router.config.json"
+    config_path.write_text(json.dumps(data), encoding="utf-8")
+    return RouterConfig.load(config_path)
+
+
+def _drop(
+    inbox: Path,
+    area: str,
+    subfolder: str,
+    content: bytes,
+    *,
+    sha8: str | None = None,
+    ext: str = ".md",
+    timestamp: str = "20250101T120000Z",
+) -> Path:
+    sha8 = sha8 or hashlib.sha256(content).hexdigest()[:8]
+    name = f"SPEC-1-{area}-{subfolder}__note__{timestamp}__v1.0.0__{ULID}__{sha8}{ext}"
+    path = inbox / name
+    path.write_bytes(content)
+    return path
+
+
+def test_sweep_routes_valid_files_and_quarantines_the_rest(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    inbox = config.watchers[0].path
+    guide = _drop(inbox, "DOC", "GUIDE", b"guide")
+    audit = _drop(inbox, "OPS", "AUDIT", b"audit", ext=".py")
+    _drop(inbox, "DOC", "GUIDE", b"tampered", sha8="deadbeef")
+    _drop(inbox, "DOC", "GUIDE", b"late", timestamp="20251340T000000Z")
+    (inbox / "random.md").write_text("no contract")
+
+    report = FileRouter(config).sweep()
+
+    assert report.events == {"Routed": 2, "Quarantined": 3}
+    assert (tmp_path / "repo" / "docs" / "guides" / guide.name).read_bytes() == b"guide"
+    assert (tmp_path / "repo" / "scripts" / "audit" / audit.name).exists()
+    assert len(list((tmp_path / "quarantine").iterdir())) == 3
+    assert not list(inbox.iterdir())
+
+    ledger_lines = (tmp_path / "logs" / "ledger.jsonl").read_text().splitlines()
+    ledger = [json.loads(line) for line in ledger_lines]
+    reasons = sorted(e["metadata"]["reason"] for e in ledger if e["eventType"] == "Quarantined")
+    assert reasons == ["ChecksumMismatch", "InvalidName", "InvalidTimestamp"]
+
+
+def test_unknown_subfolder_falls_back_to_project_defaults(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+
+    assert config.resolve_destination("SPEC-1", "POL", "GUIDE") == tmp_path / "repo/docs/guides"
+    assert config.resolve_destination("SPEC-1", "POL", "OPA") == tmp_path / "repo/docs"
+    assert config.resolve_destination("OTHER", "DOC", "GUIDE") == "UnknownProject"
+
+
+def test_duplicates_and_conflicts_follow_policy(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    inbox = config.watchers[0].path
+    router = FileRouter(config)
+
+    first = _drop(inbox, "DOC", "GUIDE", b"same")
+    router.route_files([first])
+    again = _drop(inbox, "DOC", "GUIDE", b"same")
+    events = router.route_files([again])
+
+    assert events[0]["eventType"] == "DuplicateContent"
+    assert Path(events[0]["destinationPath"]).parent == tmp_path / "duplicates"
+
+    target = tmp_path / "repo" / "docs" / "guides" / first.name
+    target.write_bytes(b"edited in place")
+    third = _drop(inbox, "DOC", "GUIDE", b"same")
+    events = router.route_files([third])
+
+    assert events[0]["eventType"] == "Conflicted"
+    assert Path(events[0]["destinationPath"]).name == f"{first.stem}--dup1.md"
+
+
+def test_unreadable_target_is_logged_and_the_batch_continues(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    inbox = config.watchers[0].path
+    blocked = _drop(inbox, "DOC", "GUIDE", b"blocked")
+    other = _drop(inbox, "OPS", "AUDIT", b"other")
+    # A directory where the target file should be cannot be hashed (OSError).
+    (tmp_path / "repo" / "docs" / "guides" / blocked.name).mkdir(parents=True)
+
+    report = FileRouter(config).sweep().as_dict()
+
+    assert report["events"] == {"Error": 1, "Routed": 1}
+    assert blocked.exists() and not other.exists()
+    ledger = (tmp_path / "logs" / "ledger.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["eventType"] for line in ledger] == ["Error", "Routed"]
+
+
+def test_contract_without_sha8_group_routes_without_checksum(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    config.pattern = re.compile(
+        r"^(?P<project>SPEC-1)-(?P<area>[A-Z]+)-(?P<subfolder>[A-Z]+)__(?P<timestamp>\d{8}T\d{6}Z)"
+    )
+    note = config.watchers[0].path / "SPEC-1-DOC-GUIDE__20250101T120000Z.md"
+    note.write_text("no checksum in the name", encoding="utf-8")
+
+    events = FileRouter(config).route_files([note])
+
+    assert events[0]["eventType"] == "Routed"
+
+
+def test_dry_run_reports_throughput_without_moving(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    inbox = config.watchers[0].path
+    for index in range(50):
+        _drop(inbox, "DOC", "GUIDE", f"file {index}".encode())
+
+    report = FileRouter(config, dry_run=True, workers=4).sweep().as_dict()
+
+    assert report["dryRun"] is True
+    assert report["files"] == 50
+    assert report["events"] == {"Routed": 50}
+    assert report["filesPerSecond"] > 0
+    assert len(list(inbox.iterdir())) == 50
+    assert not (tmp_path / "logs" / "ledger.jsonl").exists()
+
+
+def test_missing_watch_path_is_an_error(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    config.watchers[0].path.rmdir()
+
+    with pytest.raises(RuntimeError, match="does not exist"):
+        FileRouter(config).sweep()
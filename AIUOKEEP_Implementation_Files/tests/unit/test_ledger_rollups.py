@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.audit.ledger_rollups import (  # noqa: E402  pylint: disable=wrong-import-position
+    RollupEngine,
+    main,
+)
+from scripts.audit.ledger_store import LedgerError, LedgerStore  # noqa: E402
+
+
+def _entry(day: int, hour: int, result: str, duration: float = 100) -> dict:
+    return {
+        "timestamp": f"2025-01-{day:02d}T{hour:02d}:15:00Z",
+        "result": result,
+        "checks": [
+            {"name": "Pester", "status": result, "durationMs": duration},
+            {"name": "Ruff", "status": "skipped"},
+        ],
+        "metadata": {"runId": f"run-{day}-{hour}"},
+    }
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path: Path):
+    with LedgerStore(tmp_path / "ledger.db") as store:
+        yield store
+
+
+def test_refresh_only_processes_new_entries(store: LedgerStore) -> None:
+    engine = RollupEngine(store)
+
+    first = engine.append([_entry(1, 10, "pass"), _entry(1, 11, "fail")])
+    second = engine.append([_entry(2, 9, "pass")])
+    idle = engine.refresh()
+
+    assert (first.processed, second.processed, idle.processed) == (2, 1, 0)
+    assert engine.watermark == 3
+
+
+def test_report_matches_entries_in_window(store: LedgerStore) -> None:
+    engine = RollupEngine(store)
+    engine.append(
+        [
+            _entry(1, 23, "pass", 100),
+            _entry(2, 10, "fail", 300),
+            _entry(3, 4, "pass", 200),
+            _entry(9, 1, "pass"),
+        ]
+    )
+
+    report = engine.report("2025-01-03T05:00:00Z", window_start="2025-01-01T12:00:00Z")
+
+    assert report["totals"] == {"runs": 3, "passed": 2, "failed": 1, "passRatePct": 66.67}
+    assert [day["dateUtc"] for day in report["daily"]] == ["2025-01-01", "2025-01-02", "2025-01-03"]
+    pester = next(check for check in report["checks"] if check["name"] == "Pester")
+    assert (pester["passed"], pester["failed"], pester["averageDurationMs"]) == (2, 1, 200)
+    ruff = next(check for check in report["checks"] if check["name"] == "Ruff")
+    assert ruff["skipped"] == 3
+    assert report["recentFailures"][0]["runId"] == "run-2-10"
+    assert report["recentFailures"][0]["failingChecks"] == ["Pester"]
+
+
+def test_rebuild_reproduces_incremental_rollups(store: LedgerStore) -> None:
+    engine = RollupEngine(store)
+    for hour in range(6):
+        engine.append([_entry(4, hour, "pass" if hour % 3 else "fail")])
+    incremental = engine.report("2025-01-05T00:00:00Z")
+
+    engine.rebuild()
+    rebuilt = engine.report("2025-01-05T00:00:00Z")
+
+    for key in ("totals", "checks", "daily"):
+        assert rebuilt[key] == incremental[key]
+
+
+def test_report_rejects_inverted_window(store: LedgerStore) -> None:
+    engine = RollupEngine(store)
+
+    with pytest.raises(LedgerError):
+        engine.report("2025-01-01T00:00:00Z", window_start="2025-01-02T00:00:00Z")
+
+
+def test_cli_writes_monthly_report(tmp_path: Path) -> None:
+    database = tmp_path / "ledger.db"
+    with LedgerStore(database) as store:
+        store.append_many([_entry(day, 8, "pass") for day in range(1, 29)])
+
+    output = tmp_path / "reports" / "monthly.json"
+    exit_code = main(
+        [
+            "--database",
+            str(database),
+            "report",
+            "--period",
+            "monthly",
+            "--window-end",
+            "2025-01-31T00:00:00Z",
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert exit_code == 0
+    assert json.loads(output.read_text())["totals"]["runs"] == 28
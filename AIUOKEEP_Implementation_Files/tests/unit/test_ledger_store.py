@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.audit.ledger_store import (  # noqa: E402  pylint: disable=wrong-import-position
+    LedgerError,
+    LedgerStore,
+    compute_signature,
+    main,
+    normalise_timestamp,
+    signature_payload,
+)
+
+SIGNING_KEY = b"0123456789abcdef0123456789abcdef"
+
+
+def _entry(day: int, hour: int, result: str = "pass") -> dict:
+    return {
+        "version": "1.0",
+        "timestamp": f"2025-01-{day:02d}T{hour:02d}:00:00.0000000Z",
+        "result": result,
+        "checks": [
+            {"name": "Pester", "status": result, "durationMs": 2890},
+            {"name": "PSScriptAnalyzer", "status": "pass", "durationMs": 1423.5},
+        ],
+        "metadata": {"runId": f"run-{day}-{hour}", "schemaVersion": "1.0"},
+    }
+
+
+def _signed(entry: dict) -> dict:
+    return {**entry, "signature": compute_signature(entry, SIGNING_KEY)}
+
+
+def test_normalise_timestamp_matches_dotnet_round_trip_format() -> None:
+    assert normalise_timestamp("2025-01-01T00:00:00Z") == "2025-01-01T00:00:00.0000000Z"
+    assert (
+        normalise_timestamp("2025-01-01T02:30:00.123+02:30")
+        == "2025-01-01T00:00:00.1230000Z"
+    )
+    with pytest.raises(LedgerError):
+        normalise_timestamp("yesterday")
+
+
+def test_signature_payload_matches_powershell_layout() -> None:
+    payload = signature_payload(_entry(1, 0))
+
+    assert payload == (
+        "2025-01-01T00:00:00.0000000Z|pass|"
+        "Pester|pass|2890||;PSScriptAnalyzer|pass|1423.5||"
+        '|{"runId":"run-1-0","schemaVersion":"1.0"}'
+    )
+
+
+def test_batched_appends_are_flushed_and_queryable(tmp_path: Path) -> None:
+    with LedgerStore(tmp_path / "ledger.db", batch_size=3) as store:
+        for day in range(1, 6):
+            store.append(_entry(day, 12, "fail" if day % 2 else "pass"))
+
+        window = list(store.query("2025-01-02T00:00:00Z", "2025-01-05T00:00:00Z"))
+        failures = list(store.query(result="fail"))
+
+        assert store.count() == 5
+        assert [record.entry["metadata"]["runId"] for record in window] == [
+            "run-2-12",
+            "run-3-12",
+            "run-4-12",
+        ]
+        assert len(failures) == 3
+
+
+def test_page_uses_keyset_continuation(tmp_path: Path) -> None:
+    with LedgerStore(tmp_path / "ledger.db") as store:
+        store.append_many(_entry(1, hour) for hour in range(5))
+
+        first = store.page(2)
+        second = store.page(2, after_id=first.next_after_id)
+        last = store.page(2, after_id=second.next_after_id)
+
+    assert [record.id for record in first.records] == [1, 2]
+    assert [record.id for record in second.records] == [3, 4]
+    assert [record.id for record in last.records] == [5]
+    assert last.next_after_id is None
+
+
+def test_jsonl_round_trip(tmp_path: Path) -> None:
+    source = tmp_path / "run-ledger.jsonl"
+    entries = [_signed(_entry(1, hour)) for hour in range(3)]
+    source.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n", encoding="utf-8")
+
+    with LedgerStore(tmp_path / "ledger.db") as store:
+        assert store.import_jsonl(source) == 3
+        assert store.export_jsonl(tmp_path / "out.jsonl") == 3
+
+    exported = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert exported == entries
+
+
+def test_import_rejects_entries_that_violate_schema(tmp_path: Path) -> None:
+    source = tmp_path / "run-ledger.jsonl"
+    source.write_text(json.dumps({"timestamp": "2025-01-01T00:00:00Z", "result": "ok"}) + "\n")
+
+    with LedgerStore(tmp_path / "ledger.db") as store:
+        with pytest.raises(LedgerError, match="line 1"):
+            store.import_jsonl(source)
+
+
+def test_bulk_signature_verification_reports_each_status(tmp_path: Path) -> None:
+    tampered = _signed(_entry(1, 1))
+    tampered["result"] = "fail"
+    unsupported = {**_entry(1, 2), "signature": "sha1:abc"}
+
+    with LedgerStore(tmp_path / "ledger.db") as store:
+        store.append_many([_signed(_entry(1, 0)), tampered, unsupported, _entry(1, 3)])
+        statuses = [check.status for check in store.verify_signatures(SIGNING_KEY, chunk_size=1)]
+
+    assert statuses == ["valid", "invalid", "unsupported-algorithm", "missing"]
+
+
+def test_hash_chain_detects_tampering_within_range(tmp_path: Path) -> None:
+    database = tmp_path / "ledger.db"
+    with LedgerStore(database, chain=True, batch_size=2) as store:
+        store.append_many(_entry(1, hour) for hour in range(6))
+        assert store.verify_chain() == []
+
+    with LedgerStore(database) as store:
+        store._conn.execute(  # noqa: SLF001 - simulate out-of-band tampering
+            "UPDATE ledger SET payload = replace(payload, 'pass', 'fail') WHERE id = 4"
+        )
+        assert store.verify_chain(start_id=4, end_id=5) == [4]
+        assert store.verify_chain(start_id=5) == []
+
+
+def test_chain_verification_skips_unchained_rows(tmp_path: Path, capsys) -> None:
+    database = tmp_path / "ledger.db"
+    source = tmp_path / "ledger.jsonl"
+    source.write_text(
+        "\n".join(json.dumps(_entry(1, hour)) for hour in range(3)) + "\n", encoding="utf-8"
+    )
+    assert main(["--database", str(database), "import", str(source)]) == 0
+    with LedgerStore(database, chain=True) as store:
+        store.append_many(_entry(2, hour) for hour in range(3))
+    capsys.readouterr()
+
+    assert main(["--database", str(database), "verify", "--chain"]) == 0
+    assert json.loads(capsys.readouterr().out) == {"chainBroken": []}
+    with LedgerStore(database) as store:
+        assert store.verify_chain(start_id=5) == []
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.audit.merkle_snapshot import (  # noqa: E402  pylint: disable=wrong-import-position
+    SnapshotError,
+    decode_snapshot,
+    diff_snapshots,
+    encode_snapshot,
+    load_snapshot,
+    main,
+    run_benchmark,
+    save_snapshot,
+    scan_tree,
+)
+
+
+def _tree(root: Path) -> Path:
+    backdated = time.time() - 3600
+    files = {
+        "policy/guardrails.json": "{}\n",
+        "schemas/a/one.json": "1\n",
+        "schemas/a/two.json": "2\n",
+        "schemas/b/three.json": "3\n",
+        "tools/run.sh": "#!/bin/sh\n",
+        ".git/HEAD": "ref: refs/heads/main\n",
+    }
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        os.utime(path, (backdated, backdated))
+    return root
+
+
+def test_identical_trees_skip_at_the_root(tmp_path):
+    root = _tree(tmp_path / "repo")
+
+    baseline = scan_tree(root)
+    report = diff_snapshots(baseline, scan_tree(root))
+
+    assert baseline.file_count == 5  # .git is excluded by default
+    assert not report.drift_detected
+    assert (report.directories_visited, report.subtrees_skipped) == (0, 1)
+
+
+def test_drift_descends_only_into_changed_subtrees(tmp_path):
+    root = _tree(tmp_path / "repo")
+    baseline = scan_tree(root)
+
+    (root / "schemas/a/two.json").write_text("changed\n")
+    (root / "schemas/a/new.json").write_text("new\n")
+    (root / "policy/guardrails.json").unlink()
+    (root / "tools/run.sh").chmod(0o755)
+    current = scan_tree(root, baseline)
+    report = diff_snapshots(baseline, current)
+
+    findings = {(f.path, f.type) for f in report.findings}
+    assert findings == {
+        ("schemas/a/two.json", "checksum"),
+        ("schemas/a/new.json", "added"),
+        ("policy/guardrails.json", "missing"),
+        ("tools/run.sh", "mode"),
+    }
+    # root, policy, schemas, schemas/a and tools are entered; schemas/b is skipped.
+    assert report.directories_visited == 5
+    assert report.subtrees_skipped == 1
+    assert report.as_dict()["driftDetected"] is True
+
+
+def test_rescan_reuses_hashes_unless_stat_changes(tmp_path, monkeypatch):
+    root = _tree(tmp_path / "repo")
+    baseline = scan_tree(root)
+    target = root / "schemas/b/three.json"
+    stat_before = target.stat()
+    # Same size and mtime: the cached hash is trusted without reading the file.
+    target.write_text("4\n")
+    os.utime(target, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns))
+
+    hashed: list[str] = []
+    import scripts.audit.merkle_snapshot as module  # pylint: disable=import-outside-toplevel
+
+    original = module._hash_file  # pylint: disable=protected-access
+    monkeypatch.setattr(module, "_hash_file", lambda p: hashed.append(p) or original(p))
+
+    assert not diff_snapshots(baseline, scan_tree(root, baseline)).drift_detected
+    assert hashed == []
+
+    report = diff_snapshots(baseline, scan_tree(root, baseline, rehash=True))
+    assert [(f.path, f.type) for f in report.findings] == [("schemas/b/three.json", "checksum")]
+    assert len(hashed) == 5
+
+
+def test_binary_round_trip_and_corruption(tmp_path):
+    root = _tree(tmp_path / "repo")
+    (root / "tools/link").symlink_to("run.sh")
+    snapshot = scan_tree(root, paths=["schemas/a", "tools"])
+
+    path = tmp_path / "baseline.mrkl"
+    save_snapshot(snapshot, path)
+    loaded = load_snapshot(path)
+
+    assert loaded.digest == snapshot.digest
+    assert [p for p, _ in loaded.iter_files()] == [
+        "schemas/a/one.json", "schemas/a/two.json", "tools/link", "tools/run.sh"
+    ]
+    assert loaded.find("tools/link").kind == 2
+    assert not diff_snapshots(snapshot, loaded).drift_detected
+
+    data = encode_snapshot(snapshot)
+    with pytest.raises(SnapshotError, match="corrupt"):
+        decode_snapshot(data[:-4])
+    with pytest.raises(SnapshotError, match="Not a Merkle"):
+        decode_snapshot(b"JUNK" + data[4:])
+
+
+def test_check_command_reports_drift_in_ps_result_shape(tmp_path, capsys):
+    root = _tree(tmp_path / "repo")
+    baseline = tmp_path / "baseline.mrkl"
+    assert main(["snapshot", "--root", str(root), "--output", str(baseline)]) == 0
+    capsys.readouterr()
+
+    assert main(["check", "--root", str(root), "--baseline", str(baseline)]) == 0
+    capsys.readouterr()
+    (root / "schemas/b/three.json").write_text("drift\n")
+
+    assert main(["check", "--root", str(root), "--baseline", str(baseline)]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result["driftDetected"] is True
+    assert result["findings"] == [
+        {
+            "path": "schemas/b/three.json",
+            "type": "checksum",
+            "message": "SHA256 hash does not match baseline.",
+        }
+    ]
+
+
+def test_check_path_only_rescans_that_path(tmp_path, capsys):
+    root = _tree(tmp_path / "repo")
+    baseline = tmp_path / "baseline.mrkl"
+    assert main(["snapshot", "--root", str(root), "--output", str(baseline)]) == 0
+    (root / "schemas/b/three.json").write_text("drift outside the path\n")
+    capsys.readouterr()
+
+    # Files outside --path come from the baseline, so they are not "missing".
+    assert main(["check", "--root", str(root), "--baseline", str(baseline),
+                 "--path", "schemas/a"]) == 0
+    capsys.readouterr()
+
+    (root / "schemas/a/one.json").unlink()
+    (root / "schemas/a/new.json").write_text("new\n")
+    saved = tmp_path / "current.mrkl"
+    assert main(["check", "--root", str(root), "--baseline", str(baseline),
+                 "--path", "schemas/a", "--save", str(saved)]) == 1
+    findings = json.loads(capsys.readouterr().out)["findings"]
+    assert [(f["path"], f["type"]) for f in findings] == [
+        ("schemas/a/new.json", "added"), ("schemas/a/one.json", "missing")
+    ]
+    assert load_snapshot(saved).file_count == load_snapshot(baseline).file_count
+    assert load_snapshot(saved).find("schemas/b/three.json") is not None
+
+
+def test_benchmark_smoke(tmp_path):
+    result = run_benchmark(files=300, changes=3, fanout=4, work_dir=tmp_path)
+
+    assert result["files"] == 300
+    assert result["changes"] == 3
+    assert result["identicalDriftDetected"] is False
+    assert result["snapshotBytes"] < result["jsonManifestBytes"]
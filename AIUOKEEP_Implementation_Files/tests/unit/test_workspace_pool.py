@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.sandbox.workspace_pool import (  # noqa: E402  pylint: disable=wrong-import-position
+    WorkspacePool,
+    WorkspacePoolError,
+    main,
+)
+
+
+def _tree(root: Path) -> dict[str, bytes]:
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in sorted(root.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.fixture(name="base")
+def fixture_base(tmp_path: Path) -> Path:
+    base = tmp_path / "base"
+    for index in range(20):
+        path = base / f"pkg{index % 3}" / f"mod_{index}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"VALUE = {index}\n", encoding="utf-8")
+    (base / "README.md").write_text("base\n", encoding="utf-8")
+    return base
+
+
+def _dirty(workspace: Path) -> None:
+    target = workspace / "pkg0" / "mod_0.py"
+    target.unlink()
+    target.write_text("VALUE = 'changed'\n", encoding="utf-8")
+    (workspace / "pkg1" / "mod_1.py").unlink()
+    (workspace / "untracked.txt").write_text("new", encoding="utf-8")
+    (workspace / "build" / "out").mkdir(parents=True)
+    (workspace / "build" / "out" / "artifact.bin").write_bytes(b"\0")
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink"])
+def test_release_resets_workspace_to_base(tmp_path: Path, base: Path, mode: str) -> None:
+    pool = WorkspacePool(base, tmp_path / "pool", size=2, mode=mode)
+    expected = _tree(base)
+
+    handle = pool.acquire()
+    _dirty(handle.path)
+    result = pool.release(handle)
+
+    assert (result.restored, result.removed) == (2, 2)
+    assert result.unchanged == len(expected) - 2
+    assert _tree(handle.path) == expected
+    stats = pool.stats.as_dict()
+    assert (stats["clones"], stats["leases"], stats["returns"]) == (2, 1, 1)
+    assert (stats["filesRestored"], stats["filesRemoved"]) == (2, 2)
+
+
+def test_hardlink_clones_share_inodes_and_detect_in_place_writes(
+    tmp_path: Path, base: Path
+) -> None:
+    pool = WorkspacePool(base, tmp_path / "pool", size=1, mode="hardlink")
+
+    with pool.lease() as workspace:
+        readme = workspace / "README.md"
+        assert readme.stat().st_ino == (base / "README.md").stat().st_ino
+        assert not readme.stat().st_mode & 0o222
+
+    handle = pool.acquire()
+    target = handle.path / "README.md"
+    os.chmod(target, 0o644)
+    with target.open("a", encoding="utf-8") as stream:
+        stream.write("written through the link\n")
+    (handle.path / "junk.txt").write_text("left behind", encoding="utf-8")
+    with pytest.raises(WorkspacePoolError, match="modified through a hardlink"):
+        pool.release(handle)
+
+    # The half-reset workspace is dropped instead of being leased again.
+    assert not handle.path.exists()
+    with pytest.raises(WorkspacePoolError, match="discarded after a failed reset"):
+        pool.acquire(timeout=1)
+    assert pool.stats.as_dict()["discarded"] == 1
+
+
+def test_failed_reset_replaces_workspace_with_fresh_clone(
+    tmp_path: Path, base: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pool = WorkspacePool(base, tmp_path / "pool", size=1, mode="copy")
+    handle = pool.acquire()
+    _dirty(handle.path)
+    clone_file = pool._clone_file  # noqa: SLF001 - fail the first restore only
+    calls = []
+
+    def flaky_clone(rel: str, dst: Path) -> None:
+        calls.append(rel)
+        if len(calls) == 1:
+            raise OSError("file locked")
+        clone_file(rel, dst)
+
+    monkeypatch.setattr(pool, "_clone_file", flaky_clone)
+    with pytest.raises(OSError, match="file locked"):
+        pool.release(handle)
+
+    again = pool.acquire(timeout=1)
+    assert again.path == handle.path
+    assert _tree(again.path) == _tree(base)
+    stats = pool.stats.as_dict()
+    assert (stats["failedResets"], stats["discarded"], stats["clones"]) == (1, 0, 2)
+
+
+def test_acquire_waits_for_a_free_workspace(tmp_path: Path, base: Path) -> None:
+    pool = WorkspacePool(base, tmp_path / "pool", size=1, mode="copy")
+    first = pool.acquire()
+
+    with pytest.raises(WorkspacePoolError, match="No workspace became free"):
+        pool.acquire(timeout=0.05)
+
+    timer = threading.Timer(0.05, pool.release, args=(first,))
+    timer.start()
+    second = pool.acquire(timeout=5)
+    timer.join()
+    assert second.path == first.path
+    pool.release(second)
+
+
+def test_warm_adopts_existing_workspaces(tmp_path: Path, base: Path) -> None:
+    pool = WorkspacePool(base, tmp_path / "pool", size=2, mode="copy")
+    pool.warm()
+    (tmp_path / "pool" / "ws-01" / "stale.log").write_text("left over", encoding="utf-8")
+
+    restarted = WorkspacePool(base, tmp_path / "pool", size=2, mode="copy")
+    restarted.warm()
+
+    assert restarted.stats.clones == 0
+    assert restarted.stats.files_removed == 1
+    assert _tree(tmp_path / "pool" / "ws-01") == _tree(base)
+
+
+def test_from_git_snapshots_ref_once(tmp_path: Path) -> None:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "app.py").write_text("print('hi')\n", encoding="utf-8")
+
+    def git(*args: str) -> None:
+        subprocess.run(
+            ["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+            check=True,
+            capture_output=True,
+        )
+
+    git("init", "-q")
+    git("add", "app.py")
+    git("commit", "-q", "-m", "init")
+
+    pool = WorkspacePool.from_git(repo, "HEAD", tmp_path / "pool", size=1)
+    marker = tmp_path / "pool" / "base.commit"
+    first_mtime = marker.stat().st_mtime_ns
+    again = WorkspacePool.from_git(repo, "HEAD", tmp_path / "pool", size=1)
+
+    assert pool.mode in ("reflink", "copy")
+    assert sorted(again.files) == ["app.py"]
+    assert marker.stat().st_mtime_ns == first_mtime
+    with pytest.raises(WorkspacePoolError, match="rev-parse failed"):
+        WorkspacePool.from_git(repo, "no-such-ref", tmp_path / "pool")
+
+
+def test_cli_bench_reports_speedup(
+    tmp_path: Path, base: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    exit_code = main(
+        [
+            "--base",
+            str(base),
+            "--root",
+            str(tmp_path / "pool"),
+            "--size",
+            "1",
+            "--mode",
+            "copy",
+            "bench",
+            "--iterations",
+            "3",
+        ]
+    )
+
+    assert exit_code == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["files"] == 21
+    assert report["bench"]["iterations"] == 3
+    assert report["pool"]["resets"] == 3
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+staged_check.py
+Pre-commit entry point that checks the staged content of .py/.ps1 files
+without touching the working tree and reuses the watcher's result cache.
+
+Staged blobs are read straight from the index with one `git cat-file --batch`
+process. Each blob's SHA-256 is looked up in .runs/cache/content-<sha256>.json,
+which watcher/build.ps1 writes next to its per-path records, so a file the
+watcher already checked at the same content costs a dictionary lookup. Only
+blobs without a cached result are checked (py: compile(); ps1/psm1: the
+PowerShell parser in one pwsh process, when pwsh is available), and their
+results are written back to the cache. A cached "error" fails the commit
+without re-running.
+
+With --lint SCRIPT (the pre-commit hook passes scripts/precommit/check-one.ps1)
+every file that parsed cleanly is also handed to that script in one pwsh call,
+unless .runs/cache/lint-<sha256>.json records that the same script already
+passed on that content. Only this hook writes lint records; the watcher's
+content records cover the syntax check alone and never skip the lint. A lint
+record is written once the script passed; if it fails, nothing is recorded and
+the files are linted again on the next commit. The lint script reads the
+working-tree files, as check-one.ps1 always has.
+
+pwsh is required for .ps1/.psm1 parsing and for --lint. Without it the affected
+files are reported as "unchecked", nothing is written to the cache, and the
+exit status is 1.
+
+The hash matches watcher/build.ps1 (Get-FileHash of the working-tree file)
+because .gitattributes pins .py/.ps1 to eol=lf, so index and disk bytes agree.
+
+Usage:
+  python scripts/precommit/staged_check.py                # every staged file
+  python scripts/precommit/staged_check.py a.py b.ps1     # as called by pre-commit
+  python scripts/precommit/staged_check.py --no-cache --json
+  python scripts/precommit/staged_check.py --lint scripts/precommit/check-one.ps1 a.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CHECKED_SUFFIXES = (".py", ".ps1", ".psm1")
+
+# Parses every {path, content} pair from stdin in one pwsh process and prints
+# a JSON array of error-message arrays in the same order.
+_PS_PARSE = r"""
+$items = [Console]::In.ReadToEnd() | ConvertFrom-Json
+$out = @(foreach ($item in @($items)) {
+  $tokens = $null; $errors = $null
+  [System.Management.Automation.Language.Parser]::ParseInput(
+    [string]$item.content, [string]$item.path, [ref]$tokens, [ref]$errors) | Out-Null
+  ,@($errors | ForEach-Object { $_.ToString() })
+})
+ConvertTo-Json -InputObject $out -Depth 4 -Compress
+"""
+
+
+class StagedCheckError(RuntimeError):
+    """Raised when the index cannot be read."""
+
+
+@dataclass
+class StagedBlob:
+    path: str
+    oid: str
+    sha256: str
+    content: bytes
+
+
+@dataclass
+class FileResult:
+    path: str
+    sha256: str
+    status: str  # ok | error | unchecked (pwsh missing or failed to run)
+    source: str  # cache | check
+    errors: List[str]
+
+
+def _git(repo: Path, *args: str, stdin: Optional[bytes] = None) -> bytes:
+    proc = subprocess.run(
+        ["git", *args], cwd=str(repo), input=stdin, capture_output=True
+    )
+    if proc.returncode != 0:
+        raise StagedCheckError(
+            f"git {' '.join(args)} failed: {proc.stderr.decode(errors='replace').strip()}"
+        )
+    return proc.stdout
+
+
+def staged_paths(repo: Path) -> List[str]:
+    """Added/copied/modified/renamed paths in the index, relative to the repo root."""
+    out = _git(repo, "diff", "--cached", "--name-only", "-z", "--diff-filter=ACMR")
+    return [p for p in out.decode("utf8").split("\0") if p]
+
+
+def read_staged_blobs(repo: Path, paths: Sequence[str]) -> List[StagedBlob]:
+    """Read the stage-0 index entries for `paths` with a single cat-file process."""
+    if not paths:
+        return []
+    out = _git(repo, "ls-files", "-s", "-z", "--", *paths)
+    entries: List[Tuple[str, str]] = []
+    for record in out.decode("utf8").split("\0"):
+        if not record:
+            continue
+        meta, _, path = record.partition("\t")
+        mode, oid, stage = meta.split()
+        if stage != "0" or mode == "160000":
+            continue  # unmerged entry or submodule
+        entries.append((path, oid))
+    if not entries:
+        return []
+
+    raw = _git(
+        repo, "cat-file", "--batch", stdin="".join(f"{oid}\n" for _, oid in entries).encode()
+    )
+    blobs: List[StagedBlob] = []
+    pos = 0
+    for path, oid in entries:
+        eol = raw.index(b"\n", pos)
+        header = raw[pos:eol].decode().split()
+        if len(header) != 3 or header[1] != "blob":
+            raise StagedCheckError(f"unexpected cat-file header for {path}: {header}")
+        size = int(header[2])
+        content = raw[eol + 1: eol + 1 + size]
+        pos = eol + 1 + size + 1  # content is followed by a newline
+        blobs.append(StagedBlob(path, oid, hashlib.sha256(content).hexdigest(), content))
+    return blobs
+
+
+def content_record_path(cache_dir: Path, sha256: str) -> Path:
+    return cache_dir / f"content-{sha256}.json"
+
+
+def lookup_cached(cache_dir: Path, sha256: str) -> Optional[Dict]:
+    """The cached result for this content, or None when missing or unusable."""
+    try:
+        # utf-8-sig: Windows PowerShell 5.1 writes a BOM with -Encoding utf8.
+        with content_record_path(cache_dir, sha256).open("r", encoding="utf-8-sig") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("hash") != sha256 or record.get("status") not in ("ok", "error"):
+        return None
+    return record
+
+
+def lint_record_path(cache_dir: Path, sha256: str) -> Path:
+    return cache_dir / f"lint-{sha256}.json"
+
+
+def lint_passed(cache_dir: Path, sha256: str, script: Path) -> bool:
+    """True when `script` already passed on this content (written by this hook only)."""
+    try:
+        with lint_record_path(cache_dir, sha256).open("r", encoding="utf8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        record.get("hash") == sha256
+        and record.get("status") == "ok"
+        and record.get("lint") == script.name
+    )
+
+
+def _write_record(target: Path, record: Dict) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(target.parent), prefix=".record-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            json.dump(record, f)
+        os.replace(tmp, target)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def store_result(cache_dir: Path, result: FileResult) -> None:
+    _write_record(content_record_path(cache_dir, result.sha256), {
+        "path": result.path,
+        "hash": result.sha256,
+        "status": result.status,
+        "errors": result.errors,
+        "when": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+def store_lint_pass(cache_dir: Path, result: FileResult, script: Path) -> None:
+    _write_record(lint_record_path(cache_dir, result.sha256), {
+        "path": result.path,
+        "hash": result.sha256,
+        "status": "ok",
+        "lint": script.name,
+        "when": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+def check_python(blob: StagedBlob) -> FileResult:
+    """Same check as watcher/py_check.py, run on the staged bytes."""
+    errors: List[str] = []
+    try:
+        compile(blob.content, blob.path, "exec", dont_inherit=True)
+    except (SyntaxError, ValueError) as exc:
+        errors.append(f"{type(exc).__name__}: {exc}")
+    return FileResult(blob.path, blob.sha256, "error" if errors else "ok", "check", errors)
+
+
+def check_powershell(blobs: Sequence[StagedBlob], timeout: float = 120) -> List[FileResult]:
+    """Parse all staged PowerShell blobs in one pwsh process."""
+    pwsh = shutil.which("pwsh")
+    if pwsh is None or not blobs:
+        return [
+            FileResult(b.path, b.sha256, "unchecked", "check", ["pwsh not found; not parsed"])
+            for b in blobs
+        ]
+    payload = json.dumps(
+        [{"path": b.path, "content": b.content.decode("utf8", errors="replace")} for b in blobs]
+    )
+    try:
+        proc = subprocess.run(
+            [pwsh, "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", _PS_PARSE],
+            input=payload, capture_output=True, text=True, timeout=timeout,
+        )
+        parsed = json.loads(proc.stdout) if proc.returncode == 0 else None
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        parsed = None
+    if not isinstance(parsed, list) or len(parsed) != len(blobs):
+        return [
+            FileResult(b.path, b.sha256, "unchecked", "check", ["pwsh parser failed to run"])
+            for b in blobs
+        ]
+    results = []
+    for blob, errors in zip(blobs, parsed):
+        errors = [str(e) for e in (errors or [])]
+        results.append(
+            FileResult(blob.path, blob.sha256, "error" if errors else "ok", "check", errors)
+        )
+    return results
+
+
+def run_lint(
+    script: Path, results: Sequence[FileResult], repo: Path, timeout: float = 600
+) -> Optional[bool]:
+    """Run the lint script once over `results`; True when it passed.
+
+    None when pwsh is not available and the script could not run at all.
+    """
+    if not results:
+        return True
+    pwsh = shutil.which("pwsh")
+    if pwsh is None:
+        return None
+    try:
+        proc = subprocess.run(
+            [pwsh, "-NoLogo", "-NoProfile", "-NonInteractive", "-File", str(script),
+             *[r.path for r in results]],
+            cwd=str(repo), timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        print(f"staged-check: lint script failed to run: {exc}", file=sys.stderr)
+        return False
+    return proc.returncode == 0
+
+
+def run_checks(
+    blobs: Sequence[StagedBlob],
+    cache_dir: Optional[Path],
+    lint: Optional[Path] = None,
+    repo: Optional[Path] = None,
+) -> List[FileResult]:
+    """Resolve every blob from the cache or by checking it; results keep input order."""
+    by_path: Dict[str, FileResult] = {}
+    py_misses: List[StagedBlob] = []
+    ps_misses: List[StagedBlob] = []
+    for blob in blobs:
+        suffix = Path(blob.path).suffix.lower()
+        if suffix not in CHECKED_SUFFIXES:
+            continue
+        cached = lookup_cached(cache_dir, blob.sha256) if cache_dir is not None else None
+        if cached is not None:
+            by_path[blob.path] = FileResult(
+                blob.path, blob.sha256, cached["status"], "cache", list(cached.get("errors") or [])
+            )
+        elif suffix == ".py":
+            py_misses.append(blob)
+        else:
+            ps_misses.append(blob)
+
+    checked: List[FileResult] = []
+    if py_misses or ps_misses:
+        # pwsh start-up dominates, so all PowerShell misses share one process
+        # that runs while the Python misses are compiled. compile() holds the
+        # GIL, so those run serially here.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            ps_future = pool.submit(check_powershell, ps_misses) if ps_misses else None
+            checked.extend(check_python(blob) for blob in py_misses)
+            if ps_future is not None:
+                checked.extend(ps_future.result())
+        for result in checked:
+            by_path[result.path] = result
+
+    lint_failed: List[FileResult] = []
+    if lint is not None:
+        # Content records only vouch for the syntax check, so clean cache hits
+        # are linted too unless this hook recorded a lint pass for them.
+        to_lint = [
+            r for r in by_path.values()
+            if r.status == "ok"
+            and (cache_dir is None or not lint_passed(cache_dir, r.sha256, lint))
+        ]
+        passed = run_lint(lint, to_lint, repo or Path("."))
+        if passed is None:
+            for result in to_lint:
+                result.status = "unchecked"
+                result.errors = [f"pwsh not found; {lint.name} did not run"]
+            return [by_path[b.path] for b in blobs if b.path in by_path]  # cache nothing
+        if not passed:
+            lint_failed = to_lint
+            for result in to_lint:
+                result.status = "error"
+                result.errors = [f"{lint.name} reported problems (see output above)"]
+        elif cache_dir is not None:
+            for result in to_lint:
+                store_lint_pass(cache_dir, result, lint)
+
+    if cache_dir is not None:
+        for result in checked:
+            if result in lint_failed:
+                continue  # lint failures are not cached, so they are linted again
+            if result.status in ("ok", "error"):
+                store_result(cache_dir, result)
+
+    return [by_path[b.path] for b in blobs if b.path in by_path]
+
+
+def _repo_root(start: Path) -> Path:
+    return Path(_git(start, "rev-parse", "--show-toplevel").decode().strip())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(
+        description="Check staged .py/.ps1 content, reusing the watcher cache."
+    )
+    p.add_argument("files", nargs="*", help="Paths to check (default: every staged file)")
+    p.add_argument("--repo", type=Path, default=Path("."))
+    p.add_argument("--cache-dir", type=Path, default=None, help="Default: <repo>/.runs/cache")
+    p.add_argument("--no-cache", action="store_true", help="Ignore and do not update the cache")
+    p.add_argument(
+        "--lint", type=Path, default=None,
+        help="PowerShell script run once on the cache misses (e.g. check-one.ps1)",
+    )
+    p.add_argument("--json", action="store_true", help="Print a JSON report to stdout")
+    args = p.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        repo = _repo_root(args.repo)
+        if args.files:
+            cwd = Path.cwd().resolve()
+            paths = [
+                Path(os.path.relpath((cwd / f).resolve(), repo)).as_posix() for f in args.files
+            ]
+        else:
+            paths = staged_paths(repo)
+        paths = [p for p in paths if Path(p).suffix.lower() in CHECKED_SUFFIXES]
+        blobs = read_staged_blobs(repo, paths)
+    except StagedCheckError as exc:
+        print(f"staged-check failed: {exc}", file=sys.stderr)
+        return 2
+
+    cache_dir = None if args.no_cache else (args.cache_dir or repo / ".runs" / "cache")
+    lint = None
+    if args.lint is not None:
+        lint = args.lint if args.lint.is_absolute() else repo / args.lint
+    results = run_checks(blobs, cache_dir, lint, repo)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    failed = [r for r in results if r.status == "error"]
+    unchecked = [r for r in results if r.status == "unchecked"]
+    hits = sum(1 for r in results if r.source == "cache")
+    summary = {
+        "files": len(results),
+        "cacheHits": hits,
+        "checked": len(results) - hits,
+        "failed": len(failed),
+        "unchecked": len(unchecked),
+        "elapsedMs": elapsed_ms,
+    }
+    if args.json:
+        print(json.dumps({**summary, "results": [asdict(r) for r in results]}, indent=2))
+    for r in failed:
+        origin = " (cached)" if r.source == "cache" else ""
+        for err in r.errors or ["check failed"]:
+            print(f"{r.path}{origin}: {err}", file=sys.stderr)
+    if unchecked:
+        print(
+            f"staged-check: WARNING: {len(unchecked)} file(s) were NOT checked "
+            "(install PowerShell 7 so pwsh is on PATH):",
+            file=sys.stderr,
+        )
+        for r in unchecked:
+            print(f"  {r.path}: {'; '.join(r.errors)}", file=sys.stderr)
+    print(
+        "staged-check: {files} file(s), {cacheHits} cached, {checked} checked, "
+        "{failed} failed in {elapsedMs} ms".format(**summary),
+        file=sys.stderr,
+    )
+    return 1 if failed or unchecked else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
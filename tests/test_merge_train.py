@@ -0,0 +1,128 @@
+import runpy
+import subprocess
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+train_mod: Any = type("_Mod", (), runpy.run_path(str(REPO_ROOT / "tools" / "merge_train.py")))
+
+
+def _git(repo: Path, *args: str) -> str:
+    proc = subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=str(repo), capture_output=True, text=True, check=True,
+    )
+    return proc.stdout.strip()
+
+
+def _repo(tmp_path: Path, branches: List[str], bad=(), conflicting=()) -> Path:
+    """One file per branch; `bad` branches add BROKEN, `conflicting` edit shared.txt."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q", "-b", "main")
+    (repo / "shared.txt").write_text("base\n")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "base")
+    for name in branches:
+        _git(repo, "checkout", "-q", "-b", name, "main")
+        (repo / f"{name}.txt").write_text(name)
+        if name in bad:
+            (repo / f"BROKEN-{name}").write_text("x")
+        if name in conflicting:
+            (repo / "shared.txt").write_text(f"{name}\n")
+        _git(repo, "add", ".")
+        _git(repo, "commit", "-q", "-m", name)
+    _git(repo, "checkout", "-q", "main")
+    return repo
+
+
+def _no_broken_files(worktree: Path, branches: List[str]) -> bool:
+    return not list(worktree.glob("BROKEN-*"))
+
+
+def _run(repo: Path, queue: List[str], **kwargs: Any):
+    train = train_mod.MergeTrain(repo, "main", _no_broken_files, **kwargs)
+    try:
+        return train.run(queue)
+    finally:
+        train.close()
+
+
+def test_clean_queue_merges_in_speculative_stacks(tmp_path):
+    queue = [f"b{i}" for i in range(6)]
+    repo = _repo(tmp_path, queue)
+
+    report = _run(repo, queue, batch_size=2, depth=3, apply=True).as_dict()
+
+    assert report["merged"] == queue
+    assert (report["rounds"], report["validations"], report["wastedValidations"]) == (1, 3, 0)
+    assert _git(repo, "rev-parse", "main") == report["head"]
+    files = _git(repo, "ls-tree", "--name-only", "main").split()
+    assert all(f"{name}.txt" in files for name in queue)
+    # main is checked out in the repo, so its files and index moved with it.
+    assert _git(repo, "status", "--porcelain") == ""
+    assert all((repo / f"{name}.txt").exists() for name in queue)
+    assert _git(repo, "worktree", "list").count("\n") == 0  # slots cleaned up
+
+
+def test_failing_batch_is_bisected_to_the_culprit(tmp_path):
+    queue = [f"b{i}" for i in range(8)]
+    repo = _repo(tmp_path, queue, bad={"b5"})
+    before = _git(repo, "rev-parse", "main")
+
+    report = _run(repo, queue, batch_size=4, depth=2).as_dict()
+
+    assert report["rejected"] == ["b5"]
+    assert report["merged"] == ["b0", "b1", "b2", "b3", "b4", "b6", "b7"]
+    assert report["bisectValidations"] == 2
+    # Simulation only: the target ref is untouched.
+    assert _git(repo, "rev-parse", "main") == before
+    assert report["head"] != before
+    tree = _git(repo, "ls-tree", "--name-only", report["head"]).split()
+    assert "BROKEN-b5" not in tree and "b7.txt" in tree
+
+
+def test_stacks_after_a_failure_are_counted_as_wasted(tmp_path):
+    queue = ["a", "bad", "c", "d"]
+    repo = _repo(tmp_path, queue, bad={"bad"})
+
+    report = _run(repo, queue, batch_size=1, depth=4).as_dict()
+
+    assert report["rejected"] == ["bad"]
+    assert report["merged"] == ["a", "c", "d"]
+    # Round 1 validates 4 stacks; "c" and "d" were stacked on "bad".
+    assert report["wastedValidations"] == 2
+    assert report["mergesPerHour"] > 0 and report["serialMergesPerHour"] > 0
+
+
+def test_conflicting_branch_is_dropped_without_validation(tmp_path):
+    queue = ["x", "y", "z"]
+    repo = _repo(tmp_path, queue, conflicting={"x", "y"})
+
+    report = _run(repo, queue, batch_size=3, depth=1).as_dict()
+
+    assert report["conflicts"] == ["y"]
+    assert report["merged"] == ["x", "z"]
+    assert report["validations"] == 1  # only the retried [x, z] batch
+
+
+def test_cli_uses_shell_command_and_exit_code(tmp_path, capsys):
+    queue = ["ok", "bad"]
+    repo = _repo(tmp_path, queue, bad={"bad"})
+    command = 'test -z "$(ls BROKEN-* 2>/dev/null)" && test -n "$MERGE_TRAIN_HEAD"'
+
+    exit_code = train_mod.main(
+        ["--repo", str(repo), "--command", command, "--batch-size", "2", *queue]
+    )
+
+    assert exit_code == 1
+    assert '"rejected": [\n    "bad"\n  ]' in capsys.readouterr().out
+
+
+def test_unknown_branch_is_an_error(tmp_path):
+    repo = _repo(tmp_path, ["a"])
+
+    with pytest.raises(train_mod.MergeTrainError, match="unknown branch"):
+        _run(repo, ["a", "missing"])
@@ -0,0 +1,102 @@
+import runpy
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+registry_mod: Any = type(
+    "_Mod", (), runpy.run_path(str(REPO_ROOT / "tools" / "module_registry.py"))
+)
+
+REGISTRY_YAML = """
+modules:
+  - id: "DR-5K9"
+    name: "domain_router"
+    version: "1.2.0"
+    owner: "Platform Engineering"
+    dependencies: ["ingestion_hub"]
+    paths: ["src/router"]
+  - id: "IN-7M2"
+    name: "ingestion_hub"
+    version: "1.1.0"
+    owner: "Data Services"
+    dependencies: []
+  - id: "AN-9Q4"
+    name: "analytics_core"
+    version: "0.5.1"
+    owner: "Insights"
+    dependencies: ["ingestion_hub"]
+  - id: "AL-3D7"
+    name: "alerting_bridge"
+    version: "0.3.0"
+    owner: "Site Reliability"
+    dependencies: ["domain_router", "analytics_core"]
+"""
+
+
+def _write_registry(tmp_path: Path, text: str = REGISTRY_YAML) -> Path:
+    path = tmp_path / "registry.yaml"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_impacted_modules_follow_reverse_dependencies(tmp_path: Path) -> None:
+    registry = registry_mod.load_registry(_write_registry(tmp_path))
+
+    assert registry.impacted(["domain_router"]) == ["domain_router", "alerting_bridge"]
+    assert registry.impacted(["ingestion_hub"])[0] == "ingestion_hub"
+    assert set(registry.impacted(["ingestion_hub"])) == set(registry.names)
+    assert registry.impacted(["alerting_bridge"]) == ["alerting_bridge"]
+
+
+def test_changed_paths_map_to_modules(tmp_path: Path) -> None:
+    registry = registry_mod.load_registry(_write_registry(tmp_path))
+
+    changed = registry.modules_for_paths(
+        [
+            "modules/analytics_core_AN-9Q4/AN-9Q4.run.py",
+            "./src/router/table.py",
+            "README.md",
+        ]
+    )
+
+    assert changed == ["analytics_core", "domain_router"]
+    assert registry.impacted_by_paths(["README.md"]) == []
+
+
+def test_cycles_are_reported(tmp_path: Path) -> None:
+    text = REGISTRY_YAML.replace('dependencies: []', 'dependencies: ["alerting_bridge"]')
+
+    with pytest.raises(registry_mod.RegistryError) as exc:
+        registry_mod.load_registry(_write_registry(tmp_path, text))
+
+    assert "Dependency cycle detected" in exc.value.reasons[0]
+
+
+def test_validation_matches_powershell_reasons(tmp_path: Path) -> None:
+    text = REGISTRY_YAML.replace('    owner: "Insights"\n', "")
+
+    with pytest.raises(registry_mod.RegistryError) as exc:
+        registry_mod.load_registry(_write_registry(tmp_path, text))
+
+    assert "Module 'analytics_core' is missing required field 'owner'." in exc.value.reasons
+
+
+def test_mermaid_regenerates_only_when_registry_changes(tmp_path: Path) -> None:
+    registry_path = _write_registry(tmp_path)
+    output = tmp_path / "ci" / "graph.mmd"
+
+    assert registry_mod.ensure_mermaid(registry_path, output) is True
+    assert registry_mod.ensure_mermaid(registry_path, output) is False
+    assert "alerting_bridge --> analytics_core" in output.read_text()
+
+    registry_path.write_text(REGISTRY_YAML.replace("0.3.0", "0.4.0"), encoding="utf-8")
+    assert registry_mod.ensure_mermaid(registry_path, output) is True
+
+
+def test_synthetic_benchmark_runs() -> None:
+    result = registry_mod.benchmark(modules=500, queries=50)
+
+    assert result["modules"] == 500
+    assert result["affected_avg"] >= 1
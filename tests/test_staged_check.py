@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import runpy
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+staged: Any = type(
+    "_Mod", (), runpy.run_path(str(REPO_ROOT / "scripts" / "precommit" / "staged_check.py"))
+)
+
+
+def _git(repo: Path, *args: str) -> str:
+    proc = subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=str(repo), capture_output=True, text=True, check=True,
+    )
+    return proc.stdout.strip()
+
+
+def _repo(tmp_path: Path) -> Path:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q", "-b", "main")
+    return repo
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def test_reads_staged_content_not_the_working_tree(tmp_path):
+    repo = _repo(tmp_path)
+    (repo / "a.py").write_text("x = 1\n")
+    (repo / "notes.txt").write_text("hi\n")
+    _git(repo, "add", ".")
+    (repo / "a.py").write_text("def broken(:\n")  # unstaged edit
+
+    blobs = staged.read_staged_blobs(repo, staged.staged_paths(repo))
+
+    assert [(b.path, b.content) for b in blobs] == [("a.py", b"x = 1\n"), ("notes.txt", b"hi\n")]
+    assert blobs[0].sha256 == _sha("x = 1\n")
+    assert staged.main(["--repo", str(repo), "--no-cache"]) == 0
+
+
+def test_watcher_cache_hits_skip_checks_and_misses_are_written_back(tmp_path, capsys):
+    repo = _repo(tmp_path)
+    cache = repo / ".runs" / "cache"
+    cache.mkdir(parents=True)
+    good, bad, cached_bad = "y = 2\n", "def f(:\n", "z = 3\n"
+    (repo / "good.py").write_text(good)
+    (repo / "bad.py").write_text(bad)
+    (repo / "cached_bad.py").write_text(cached_bad)
+    _git(repo, "add", ".")
+    # Records as watcher/build.ps1 writes them (BOM from Windows PowerShell 5.1).
+    (cache / f"content-{_sha(good)}.json").write_text(
+        json.dumps({"path": "good.py", "hash": _sha(good), "status": "ok"}), encoding="utf-8-sig"
+    )
+    (cache / f"content-{_sha(cached_bad)}.json").write_text(
+        json.dumps({"hash": _sha(cached_bad), "status": "error", "errors": ["stale failure"]})
+    )
+
+    assert staged.main(["--repo", str(repo), "--json"]) == 1
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    by_path = {r["path"]: r for r in report["results"]}
+    assert (report["cacheHits"], report["checked"], report["failed"]) == (2, 1, 2)
+    assert by_path["good.py"]["source"] == "cache"
+    assert by_path["bad.py"]["source"] == "check" and by_path["bad.py"]["status"] == "error"
+    assert "cached_bad.py (cached): stale failure" in captured.err
+
+    record = json.loads((cache / f"content-{_sha(bad)}.json").read_text())
+    assert record["status"] == "error" and record["path"] == "bad.py"
+
+    # Second run: everything comes from the cache.
+    assert staged.main(["--repo", str(repo), "--json"]) == 1
+    assert json.loads(capsys.readouterr().out)["cacheHits"] == 3
+
+
+def test_filenames_limit_the_check_and_ignore_unhandled_types(tmp_path, monkeypatch):
+    repo = _repo(tmp_path)
+    (repo / "sub").mkdir()
+    (repo / "sub" / "ok.py").write_text("a = 1\n")
+    (repo / "bad.py").write_text("def f(:\n")
+    (repo / "data.json").write_text("{}")
+    _git(repo, "add", ".")
+    monkeypatch.chdir(repo / "sub")
+
+    assert staged.main(["ok.py", "../data.json", "--no-cache"]) == 0
+    assert staged.main(["../bad.py", "--no-cache"]) == 1
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake pwsh is a POSIX shell script")
+def test_lint_skips_only_content_this_hook_linted(tmp_path, monkeypatch):
+    repo = _repo(tmp_path)
+    cache = repo / ".runs" / "cache"
+    cache.mkdir(parents=True)
+    (repo / "linted.py").write_text("a = 1\n")
+    (repo / "built.py").write_text("c = 3\n")
+    (repo / "new.py").write_text("b = 2\n")
+    _git(repo, "add", ".")
+    linted, built, new = _sha("a = 1\n"), _sha("c = 3\n"), _sha("b = 2\n")
+    for sha in (linted, built):
+        (cache / f"content-{sha}.json").write_text(json.dumps({"hash": sha, "status": "ok"}))
+    (cache / f"lint-{linted}.json").write_text(
+        json.dumps({"hash": linted, "status": "ok", "lint": "lint.ps1"})
+    )
+    # Stand-in pwsh that logs the files it is asked to lint.
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "lint.log"
+    fake = bin_dir / "pwsh"
+    fake.write_text(f'#!/bin/sh\necho "$@" >> "{log}"\nexit "${{LINT_RC:-0}}"\n')
+    fake.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    args = ["--repo", str(repo), "--lint", "lint.ps1"]
+
+    monkeypatch.setenv("LINT_RC", "1")
+    assert staged.main(args) == 1
+    assert not (cache / f"lint-{new}.json").exists()
+    assert not (cache / f"lint-{built}.json").exists()
+
+    monkeypatch.setenv("LINT_RC", "0")
+    assert staged.main(args) == 0
+    assert staged.main(args) == 0  # lint passes recorded: no third lint run
+    runs = log.read_text().splitlines()
+    # A build.ps1 content record alone does not skip the lint.
+    assert len(runs) == 2 and all(run.endswith("lint.ps1 built.py new.py") for run in runs)
+    assert json.loads((cache / f"lint-{new}.json").read_text())["lint"] == "lint.ps1"
+
+
+def test_missing_pwsh_fails_and_caches_nothing(tmp_path, monkeypatch, capsys):
+    repo = _repo(tmp_path)
+    cache = repo / ".runs" / "cache"
+    (repo / "a.py").write_text("import os\nx = undefined_name\n")
+    (repo / "b.ps1").write_text("Write-Output 1\n")
+    _git(repo, "add", ".")
+    monkeypatch.setattr(staged.shutil, "which", lambda name: None)
+
+    assert staged.main(["--repo", str(repo), "--lint", "lint.ps1", "--json"]) == 1
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert report["unchecked"] == 2 and report["failed"] == 0
+    assert "WARNING: 2 file(s) were NOT checked" in captured.err
+    assert not cache.exists() or not list(cache.iterdir())
@@ -0,0 +1,160 @@
+import json
+import runpy
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+pytest.importorskip("requests")
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+broker_mod: Any = type("_Mod", (), runpy.run_path(str(REPO_ROOT / "tools" / "token_broker.py")))
+
+
+class _StubGitHub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls: List[str] = []
+    connections: set = set()
+    expires_at = "2030-01-01T01:00:00Z"
+    fail_next_post = 0
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        type(self).calls.append(f"GET {self.path}")
+        type(self).connections.add(self.client_address)
+        self._send(200, {"id": 42})
+
+    def do_POST(self) -> None:
+        cls = type(self)
+        cls.calls.append(f"POST {self.path}")
+        cls.connections.add(self.client_address)
+        if cls.fail_next_post:
+            cls.fail_next_post -= 1
+            self._send(503, {"message": "try again"})
+            return
+        token = f"ghs_{len([c for c in cls.calls if c.startswith('POST')])}"
+        self._send(201, {"token": token, "expires_at": cls.expires_at})
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture(name="api")
+def fixture_api():
+    _StubGitHub.calls = []
+    _StubGitHub.connections = set()
+    _StubGitHub.fail_next_post = 0
+    _StubGitHub.expires_at = "2030-01-01T01:00:00Z"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGitHub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class _Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _broker(tmp_path: Path, api: str, clock: _Clock, signed: List[Dict[str, Any]]):
+    key = tmp_path / "app.pem"
+    key.write_text("not-a-real-key")
+
+    def signer(payload: Dict[str, Any], private_key: bytes) -> str:
+        signed.append(payload)
+        return f"jwt-{len(signed)}"
+
+    return broker_mod.TokenBroker(
+        "123",
+        key,
+        api_url=api,
+        cache_dir=tmp_path / "cache",
+        session=broker_mod.build_session(backoff_factor=0),
+        signer=signer,
+        clock=clock,
+    )
+
+
+# 2030-01-01T00:00:00Z
+T0 = 1893456000.0
+
+
+def test_jwt_is_reused_until_near_expiry(tmp_path, api):
+    clock, signed = _Clock(T0), []
+    broker = _broker(tmp_path, api, clock, signed)
+
+    first = broker.app_jwt()
+    clock.now += 200
+    assert broker.app_jwt() == first
+    clock.now += 100
+    assert broker.app_jwt() != first
+    assert signed[0] == {"iat": int(T0) - 60, "exp": int(T0) + 540, "iss": "123"}
+
+
+def test_installation_token_is_cached_in_memory_and_on_disk(tmp_path, api):
+    clock, signed = _Clock(T0), []
+    broker = _broker(tmp_path, api, clock, signed)
+
+    info = broker.installation_token("org", "repo")
+    assert broker.installation_token("org", "repo") == info
+    assert info == {"installation_id": 42, "token": "ghs_1", "expires_at": "2030-01-01T01:00:00Z"}
+    assert _StubGitHub.calls == [
+        "GET /repos/org/repo/installation",
+        "POST /app/installations/42/access_tokens",
+    ]
+    # One pooled keep-alive connection served both calls.
+    assert len(_StubGitHub.connections) == 1
+
+    # A second process starts cold but reads the token from the disk cache.
+    other = _broker(tmp_path, api, clock, [])
+    assert other.installation_token("org", "repo") == info
+    assert len(_StubGitHub.calls) == 2
+    cache_file = next((tmp_path / "cache").glob("*.json"))
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+
+
+def test_expiring_token_is_refreshed_without_rediscovering_installation(tmp_path, api):
+    clock, signed = _Clock(T0), []
+    broker = _broker(tmp_path, api, clock, signed)
+    broker.installation_token("org", "repo")
+
+    _StubGitHub.expires_at = "2030-01-01T02:00:00Z"
+    clock.now += 3600 - 200
+    info = broker.installation_token("org", "repo")
+
+    assert info["token"] == "ghs_2"
+    assert _StubGitHub.calls[-1] == "POST /app/installations/42/access_tokens"
+    assert sum(call.startswith("GET") for call in _StubGitHub.calls) == 1
+
+
+def test_transient_server_errors_are_retried(tmp_path, api):
+    broker = _broker(tmp_path, api, _Clock(T0), [])
+    _StubGitHub.fail_next_post = 2
+
+    info = broker.installation_token("org", "repo")
+
+    assert info["token"] == "ghs_3"
+    assert _StubGitHub.calls.count("POST /app/installations/42/access_tokens") == 3
+
+
+def test_rejected_request_raises(tmp_path, api):
+    broker = _broker(tmp_path, api, _Clock(T0), [])
+    _StubGitHub.fail_next_post = 10
+
+    with pytest.raises(broker_mod.TokenBrokerError, match="503"):
+        broker.installation_token("org", "repo")
+    assert not list((tmp_path / "cache").glob("*.json"))
@@ -7,6 +7,10 @@
 # 2) Discover installation ID for a repo: GET /repos/{owner}/{repo}/installation (app-level JWT)
 # 3) POST /app/installations/{installation_id}/access_tokens to get an installation token
 #
+# For repeated calls (merge train, bulk pushes) prefer tools/token_broker.py, which
+# caches the JWT and installation tokens and reuses one pooled session. Both
+# helpers below accept an optional requests.Session for connection reuse.
+#
 # Usage:
 #  PYTHONPATH=. python tools/create_installation_token.py --jwt <jwt> --owner myorg --repo myrepo
 
@@ -14,26 +18,26 @@ import argparse
 import requests
 import sys
 
-def get_installation(app_jwt, owner, repo):
+def get_installation(app_jwt, owner, repo, session=None):
     headers = {
         "Authorization": f"Bearer {app_jwt}",
         "Accept": "application/vnd.github+json"
     }
     url = f"https://api.github.com/repos/{owner}/{repo}/installation"
-    r = requests.get(url, headers=headers)
+    r = (session or requests).get(url, headers=headers, timeout=30)
     if r.status_code == 200:
         return r.json()["id"]
     else:
         print("Failed to get installation for repo:", r.status_code, r.text)
         return None
 
-def create_installation_token(app_jwt, installation_id):
+def create_installation_token(app_jwt, installation_id, session=None):
     headers = {
         "Authorization": f"Bearer {app_jwt}",
         "Accept": "application/vnd.github+json"
     }
     url = f"https://api.github.com/app/installations/{installation_id}/access_tokens"
-    r = requests.post(url, headers=headers)
+    r = (session or requests).post(url, headers=headers, timeout=30)
     if r.status_code == 201:
         return r.json()
     else:
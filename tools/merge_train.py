@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+merge_train.py
+Local merge-train engine with speculative batching and failure bisection.
+
+The queue is cut into batches of --batch-size branches. Each round builds up
+to --depth stacked candidates in dedicated git worktrees:
+
+  stack 1 = target + batch 1
+  stack 2 = target + batch 1 + batch 2
+  ...
+
+and validates them in parallel with the pluggable validation command. Every
+stack up to the first failure is accepted (the target moves to the last
+passing stack). A failing batch is bisected over its prefixes to isolate the
+first culprit: the branches before it are merged, the culprit is rejected and
+the rest go back to the front of the queue. Branches that do not merge
+cleanly are rejected as conflicts without spending a validation. Results of
+stacks built on top of a failure are discarded and counted as wasted.
+
+The validation command runs through the shell inside the candidate worktree
+with MERGE_TRAIN_HEAD (candidate commit) and MERGE_TRAIN_BRANCHES (comma
+separated) in the environment; exit code 0 means pass. Without --apply the
+target ref is left untouched and the run is a simulation. With --apply a
+target branch that is checked out in a worktree is advanced with
+`git merge --ff-only` there, so that worktree's index and files follow the ref.
+
+Usage:
+  python tools/merge_train.py --target main --command "pytest -q" feat/a feat/b feat/c
+  python tools/merge_train.py --target main --queue-file queue.txt --batch-size 4 --depth 3 --apply
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+Validator = Callable[[Path, List[str]], bool]
+
+GIT_IDENTITY = ["-c", "user.name=merge-train", "-c", "user.email=merge-train@localhost"]
+
+
+class MergeTrainError(RuntimeError):
+    """Raised when git fails for a reason other than a merge conflict."""
+
+
+@dataclass
+class ValidationRun:
+    kind: str  # "speculative" or "bisect"
+    branches: List[str]
+    head: str
+    passed: bool
+    seconds: float
+    wasted: bool = False
+
+
+@dataclass
+class BranchOutcome:
+    branch: str
+    status: str  # "merged", "rejected" or "conflict"
+    round: int
+    commit: Optional[str] = None
+
+
+@dataclass
+class TrainReport:
+    target: str
+    base: str
+    head: str
+    applied: bool
+    outcomes: List[BranchOutcome] = field(default_factory=list)
+    validations: List[ValidationRun] = field(default_factory=list)
+    rounds: int = 0
+    wall_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        merged = [o.branch for o in self.outcomes if o.status == "merged"]
+        rejected = [o.branch for o in self.outcomes if o.status == "rejected"]
+        conflicts = [o.branch for o in self.outcomes if o.status == "conflict"]
+        runs = self.validations
+        wasted = [v for v in runs if v.wasted]
+        busy = sum(v.seconds for v in runs)
+        mean = busy / len(runs) if runs else 0.0
+        hours = self.wall_seconds / 3600.0
+        decided = len(merged) + len(rejected)
+        return {
+            "target": self.target,
+            "base": self.base,
+            "head": self.head,
+            "applied": self.applied,
+            "merged": merged,
+            "rejected": rejected,
+            "conflicts": conflicts,
+            "rounds": self.rounds,
+            "validations": len(runs),
+            "bisectValidations": sum(1 for v in runs if v.kind == "bisect"),
+            "wastedValidations": len(wasted),
+            "wastedValidationSeconds": round(sum(v.seconds for v in wasted), 3),
+            "validationSeconds": round(busy, 3),
+            "wallSeconds": round(self.wall_seconds, 3),
+            "mergesPerHour": round(len(merged) / hours, 3) if hours > 0 else 0.0,
+            # One validation per branch, one at a time, at the observed mean cost.
+            "serialMergesPerHour": (
+                round(len(merged) / (decided * mean / 3600.0), 3) if decided and mean else 0.0
+            ),
+            "outcomes": [asdict(o) for o in self.outcomes],
+        }
+
+
+def shell_validator(command: str, timeout: Optional[float] = None) -> Validator:
+    """Validator that runs `command` through the shell in the worktree."""
+
+    def validate(worktree: Path, branches: List[str]) -> bool:
+        env = dict(os.environ)
+        env["MERGE_TRAIN_BRANCHES"] = ",".join(branches)
+        env["MERGE_TRAIN_HEAD"] = _git(worktree, "rev-parse", "HEAD")
+        try:
+            proc = subprocess.run(
+                command, shell=True, cwd=str(worktree), env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        return proc.returncode == 0
+
+    return validate
+
+
+def _git(cwd: Path, *args: str, check: bool = True) -> str:
+    proc = subprocess.run(
+        ["git", *GIT_IDENTITY, *args], cwd=str(cwd), capture_output=True, text=True
+    )
+    if check and proc.returncode != 0:
+        raise MergeTrainError(f"git {' '.join(args)} failed: {proc.stderr.strip()}")
+    return proc.stdout.strip()
+
+
+class MergeTrain:
+    """Runs a queue of branches through speculative, bisecting validation."""
+
+    def __init__(
+        self,
+        repo: Path,
+        target: str,
+        validator: Validator,
+        *,
+        batch_size: int = 4,
+        depth: int = 2,
+        worktree_root: Optional[Path] = None,
+        apply: bool = False,
+    ):
+        if batch_size < 1 or depth < 1:
+            raise ValueError("batch_size and depth must be at least 1")
+        self.repo = Path(_git(Path(repo), "rev-parse", "--show-toplevel"))
+        self.target = target
+        self.validator = validator
+        self.batch_size = batch_size
+        self.depth = depth
+        self.worktree_root = Path(worktree_root or self.repo / ".worktrees" / "merge-train")
+        self.apply = apply
+        self._slots: List[Path] = []
+        self._checkout: Optional[Path] = None
+
+    # -- worktrees -------------------------------------------------------
+
+    def _slot(self, index: int, base: str) -> Path:
+        while len(self._slots) <= index:
+            path = self.worktree_root / f"slot-{len(self._slots)}"
+            if path.exists():
+                _git(self.repo, "worktree", "remove", "--force", str(path), check=False)
+                shutil.rmtree(path, ignore_errors=True)
+            _git(self.repo, "worktree", "add", "--detach", "-f", str(path), base)
+            self._slots.append(path)
+        return self._slots[index]
+
+    def _build(self, slot: Path, base: str, branches: List[str]) -> Tuple[Optional[str], int]:
+        """Merge `branches` onto `base` in `slot`.
+
+        Returns (head, -1) on success or (None, index of conflicting branch).
+        """
+        _git(slot, "checkout", "-q", "--detach", "-f", base)
+        _git(slot, "clean", "-qfdx")
+        for index, branch in enumerate(branches):
+            merged = subprocess.run(
+                ["git", *GIT_IDENTITY, "merge", "-q", "--no-ff", "--no-edit",
+                 "-m", f"merge-train: {branch}", branch],
+                cwd=str(slot), capture_output=True, text=True,
+            )
+            if merged.returncode != 0:
+                _git(slot, "merge", "--abort", check=False)
+                if "not something we can merge" in merged.stderr:
+                    raise MergeTrainError(f"unknown branch {branch}")
+                return None, index
+        return _git(slot, "rev-parse", "HEAD"), -1
+
+    def _validate(self, kind: str, slot: Path, head: str, branches: List[str]) -> ValidationRun:
+        started = time.perf_counter()
+        passed = bool(self.validator(slot, branches))
+        return ValidationRun(kind, list(branches), head, passed, time.perf_counter() - started)
+
+    def close(self) -> None:
+        for path in self._slots:
+            _git(self.repo, "worktree", "remove", "--force", str(path), check=False)
+        self._slots = []
+        _git(self.repo, "worktree", "prune", check=False)
+
+    # -- train -----------------------------------------------------------
+
+    def _target_checkout(self) -> Optional[Path]:
+        """Worktree that has the target branch checked out, if any."""
+        path = None
+        listing = _git(self.repo, "worktree", "list", "--porcelain")
+        for line in listing.splitlines():
+            if line.startswith("worktree "):
+                path = Path(line[len("worktree "):])
+            elif line == f"branch refs/heads/{self.target}":
+                return path
+        return None
+
+    def _advance(self, report: TrainReport, new: str) -> None:
+        if self.apply:
+            ref = f"refs/heads/{self.target}"
+            if self._checkout is None:
+                # Compare-and-swap so a concurrent push to the target is not lost.
+                _git(self.repo, "update-ref", ref, new, report.head)
+            else:
+                # update-ref would move the branch under the worktree's index.
+                current = _git(self.repo, "rev-parse", "--verify", ref)
+                if current != report.head:
+                    raise MergeTrainError(f"{self.target} moved during the train")
+                _git(self._checkout, "merge", "-q", "--ff-only", new)
+        report.head = new
+
+    def _bisect(self, report: TrainReport, batch: List[str]) -> Tuple[int, Optional[str]]:
+        """Find the first failing prefix of `batch` on top of report.head.
+
+        Returns (index of the culprit, head of the longest passing prefix).
+        """
+        lo, hi = 0, len(batch)  # prefix lo passes (the base), prefix hi fails
+        heads: Dict[int, Optional[str]] = {0: None}
+        slot = self._slot(0, report.head)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            head, _ = self._build(slot, report.head, batch[:mid])
+            assert head is not None  # the full batch already merged cleanly
+            run = self._validate("bisect", slot, head, batch[:mid])
+            report.validations.append(run)
+            if run.passed:
+                lo, heads[mid] = mid, head
+            else:
+                hi = mid
+        return hi - 1, heads.get(lo)
+
+    def run(self, queue: List[str]) -> TrainReport:
+        started = time.perf_counter()
+        base = _git(self.repo, "rev-parse", "--verify", f"refs/heads/{self.target}")
+        report = TrainReport(self.target, base, base, self.apply)
+        if self.apply:
+            self._checkout = self._target_checkout()
+        pending: Deque[str] = deque(queue)
+        pool = ThreadPoolExecutor(max_workers=self.depth)
+        try:
+            while pending:
+                report.rounds += 1
+                items = list(pending)[: self.batch_size * self.depth]
+                batches = [
+                    items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)
+                ]
+                # Build stacks sequentially (cheap), validate them in parallel.
+                stacks: List[Tuple[List[str], Optional[str], int]] = []
+                prev = report.head
+                for index, batch in enumerate(batches):
+                    slot = self._slot(index, report.head)
+                    head, conflict = self._build(slot, prev, batch)
+                    stacks.append((batch, head, conflict))
+                    if head is None:
+                        break
+                    prev = head
+                futures = [
+                    pool.submit(self._validate, "speculative", self._slots[i], head, batch)
+                    for i, (batch, head, _) in enumerate(stacks) if head is not None
+                ]
+                runs = [f.result() for f in futures]
+
+                failed = next(
+                    (i for i, (_, head, _) in enumerate(stacks)
+                     if head is None or not runs[i].passed),
+                    None,
+                )
+                for i, run in enumerate(runs):
+                    run.wasted = failed is not None and i > failed
+                report.validations.extend(runs)
+
+                accepted = stacks if failed is None else stacks[:failed]
+                for batch, head, _ in accepted:
+                    self._advance(report, head)  # type: ignore[arg-type]
+                    for branch in batch:
+                        pending.popleft()
+                        report.outcomes.append(
+                            BranchOutcome(branch, "merged", report.rounds, head)
+                        )
+                if failed is None:
+                    continue
+
+                batch, head, conflict = stacks[failed]
+                for _ in batch:
+                    pending.popleft()
+                if head is None:
+                    # Drop the conflicting branch; the rest are retried untouched.
+                    culprit = batch[conflict]
+                    report.outcomes.append(BranchOutcome(culprit, "conflict", report.rounds))
+                    retry = batch[:conflict] + batch[conflict + 1:]
+                else:
+                    index, prefix_head = self._bisect(report, batch)
+                    if prefix_head is not None:
+                        self._advance(report, prefix_head)
+                    for branch in batch[:index]:
+                        report.outcomes.append(
+                            BranchOutcome(branch, "merged", report.rounds, prefix_head)
+                        )
+                    report.outcomes.append(
+                        BranchOutcome(batch[index], "rejected", report.rounds)
+                    )
+                    retry = batch[index + 1:]
+                pending.extendleft(reversed(retry))
+        finally:
+            pool.shutdown()
+            report.wall_seconds = time.perf_counter() - started
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Run a local speculative merge train.")
+    p.add_argument("branches", nargs="*", help="Queued branches, in merge order")
+    p.add_argument("--queue-file", type=Path, help="File with one branch per line")
+    p.add_argument("--repo", type=Path, default=Path("."))
+    p.add_argument("--target", default="main")
+    p.add_argument("--command", required=True, help="Validation command (shell)")
+    p.add_argument("--timeout", type=float, help="Per-validation timeout in seconds")
+    p.add_argument("--batch-size", type=int, default=4)
+    p.add_argument("--depth", type=int, default=2, help="Stacks validated in parallel")
+    p.add_argument("--worktree-root", type=Path)
+    p.add_argument("--apply", action="store_true", help="Advance the target ref")
+    p.add_argument("--output", type=Path, help="Also write the JSON report here")
+    args = p.parse_args(argv)
+
+    queue = list(args.branches)
+    if args.queue_file:
+        lines = args.queue_file.read_text(encoding="utf8").splitlines()
+        queue += [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+    if not queue:
+        p.error("no branches queued")
+
+    try:
+        train = MergeTrain(
+            args.repo, args.target, shell_validator(args.command, args.timeout),
+            batch_size=args.batch_size, depth=args.depth,
+            worktree_root=args.worktree_root, apply=args.apply,
+        )
+        try:
+            report = train.run(queue).as_dict()
+        finally:
+            train.close()
+    except (MergeTrainError, ValueError) as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        return 2
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text, encoding="utf8")
+    print(text)
+    return 1 if report["rejected"] or report["conflicts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+module_registry.py
+Indexed view of modules/registry.yaml for change-impact queries.
+
+The registry is parsed once into integer-indexed adjacency lists. Validation
+mirrors tools/Test-ModuleRegistry.ps1 and additionally rejects dependency
+cycles. A topological order and, for every module, the bitset of modules that
+transitively depend on it are precomputed, so "what is affected by this
+change" is a dictionary lookup per changed path plus one bitset union.
+
+Changed paths map to modules through the Two-ID folder convention
+(modules/{name}_{id}/...) and through an optional per-module `paths` list of
+repository-relative prefixes.
+
+Usage:
+  python tools/module_registry.py validate
+  python tools/module_registry.py impact modules/domain_router_DR-5K9/DR-5K9.run.py
+  python tools/module_registry.py graph --output .runs/ci/graph.mmd
+  python tools/module_registry.py bench --modules 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - exercised only without PyYAML
+    yaml = None  # type: ignore[assignment]
+
+ID_PATTERN = re.compile(r"^[A-Z]{2}-[A-Z0-9]{3}$")
+SEMVER_PATTERN = re.compile(r"^[0-9]+\.[0-9]+\.[0-9]+$")
+REQUIRED_FIELDS = ("id", "name", "version", "owner", "dependencies")
+MODULES_ROOT = "modules"
+
+
+class RegistryError(ValueError):
+    """Raised when the registry cannot be parsed or fails validation."""
+
+    def __init__(self, reasons: Sequence[str]):
+        super().__init__("; ".join(reasons))
+        self.reasons = list(reasons)
+
+
+def _node_id(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "_", name)
+
+
+def _normalise_path(path: str) -> str:
+    text = path.replace("\\", "/").strip()
+    while text.startswith("./"):
+        text = text[2:]
+    return str(PurePosixPath(text)) if text else ""
+
+
+@dataclass
+class ModuleRegistry:
+    """Adjacency index over the registry with precomputed closures."""
+
+    names: List[str]
+    ids: List[str]
+    dependencies: List[List[int]]
+    dependents: List[List[int]] = field(default_factory=list)
+    index: Dict[str, int] = field(default_factory=dict)
+    topo_order: List[int] = field(default_factory=list)
+    topo_rank: List[int] = field(default_factory=list)
+    closures: List[int] = field(default_factory=list)
+    path_prefixes: Dict[str, int] = field(default_factory=dict)
+    digest: str = ""
+
+    @classmethod
+    def from_document(cls, document: Any, digest: str = "") -> "ModuleRegistry":
+        entries = _validate(document)
+        names = [str(e["name"]) for e in entries]
+        index = {name: i for i, name in enumerate(names)}
+        registry = cls(
+            names=names,
+            ids=[str(e["id"]) for e in entries],
+            dependencies=[[index[str(d)] for d in e["dependencies"]] for e in entries],
+            index=index,
+            digest=digest,
+        )
+        registry.dependents = [[] for _ in names]
+        for i, deps in enumerate(registry.dependencies):
+            for d in deps:
+                registry.dependents[d].append(i)
+        registry.topo_order = registry._toposort()
+        registry.topo_rank = [0] * len(names)
+        for position, node in enumerate(registry.topo_order):
+            registry.topo_rank[node] = position
+        registry.closures = registry._reverse_closures()
+        for i, entry in enumerate(entries):
+            registry.path_prefixes[f"{MODULES_ROOT}/{names[i]}_{registry.ids[i]}"] = i
+            for prefix in entry.get("paths") or []:
+                registry.path_prefixes[_normalise_path(str(prefix))] = i
+        return registry
+
+    def _toposort(self) -> List[int]:
+        # Kahn's algorithm, dependencies first. The result is deterministic
+        # for a given registry order.
+        remaining = [len(deps) for deps in self.dependencies]
+        ready = [i for i, count in enumerate(remaining) if count == 0]
+        order: List[int] = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for dependent in self.dependents[node]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.names):
+            cycle = self._find_cycle({i for i, count in enumerate(remaining) if count})
+            raise RegistryError(
+                ["Dependency cycle detected: " + " -> ".join(self.names[i] for i in cycle)]
+            )
+        return order
+
+    def _find_cycle(self, candidates: set) -> List[int]:
+        # Every node left over by Kahn's algorithm lies on or behind a cycle;
+        # walking dependencies inside that set must revisit a node.
+        node = min(candidates)
+        seen: Dict[int, int] = {}
+        path: List[int] = []
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(d for d in self.dependencies[node] if d in candidates)
+        return path[seen[node]:] + [node]
+
+    def _reverse_closures(self) -> List[int]:
+        # closure[v] has bit i set when module i is v itself or transitively
+        # depends on v. Visiting in reverse topological order means every
+        # dependent's closure is complete before it is folded in.
+        closures = [0] * len(self.names)
+        for node in reversed(self.topo_order):
+            bits = 1 << node
+            for dependent in self.dependents[node]:
+                bits |= closures[dependent]
+            closures[node] = bits
+        return closures
+
+    def modules_for_paths(self, paths: Iterable[str]) -> List[str]:
+        """Map changed repository paths to the modules that own them."""
+        hits: Dict[int, None] = {}
+        for raw in paths:
+            candidate = PurePosixPath(_normalise_path(raw))
+            for prefix in (candidate, *candidate.parents):
+                owner = self.path_prefixes.get(str(prefix))
+                if owner is not None:
+                    hits[owner] = None
+        return [self.names[i] for i in hits]
+
+    def impacted(self, modules: Iterable[str]) -> List[str]:
+        """Return changed modules plus everything depending on them, in topo order."""
+        bits = 0
+        for name in modules:
+            if name not in self.index:
+                raise RegistryError([f"Unknown module '{name}'."])
+            bits |= self.closures[self.index[name]]
+        if not bits:
+            return []
+        selected = []
+        while bits:
+            low = bits & -bits
+            selected.append(low.bit_length() - 1)
+            bits ^= low
+        return [self.names[i] for i in sorted(selected, key=self.topo_rank.__getitem__)]
+
+    def impacted_by_paths(self, paths: Iterable[str]) -> List[str]:
+        return self.impacted(self.modules_for_paths(paths))
+
+    def to_mermaid(self) -> str:
+        """Render the dependency graph in the layout of .runs/ci/graph.mmd."""
+        lines = ["graph LR"]
+        ordered = sorted(range(len(self.names)), key=self.names.__getitem__)
+        for i in ordered:
+            lines.append(f'  {_node_id(self.names[i])}["{self.names[i]} ({self.ids[i]})"]')
+        for i in ordered:
+            for d in sorted(self.dependencies[i], key=self.names.__getitem__):
+                lines.append(f"  {_node_id(self.names[i])} --> {_node_id(self.names[d])}")
+        return "\n".join(lines) + "\n"
+
+
+def _validate(document: Any) -> List[Dict[str, Any]]:
+    """Apply the Test-ModuleRegistry.ps1 rules; raise RegistryError on failure."""
+    if not isinstance(document, dict):
+        raise RegistryError(["Registry root must be a mapping with a 'modules' entry."])
+    if "modules" not in document:
+        raise RegistryError(["Registry must define a top-level 'modules' collection."])
+    modules = document["modules"]
+    if not isinstance(modules, list):
+        raise RegistryError(["Registry 'modules' entry must be a sequence."])
+
+    reasons: List[str] = []
+    entries: List[Dict[str, Any]] = []
+    ids_seen: set = set()
+    names_seen: set = set()
+    for entry in modules:
+        if not isinstance(entry, dict):
+            reasons.append("Each module entry must be a mapping.")
+            continue
+        name = str(entry.get("name") or "<unknown>")
+        for required in REQUIRED_FIELDS:
+            if required not in entry:
+                reasons.append(f"Module '{name}' is missing required field '{required}'.")
+
+        module_id = entry.get("id")
+        if module_id is None or not ID_PATTERN.match(str(module_id)):
+            reasons.append(f"Module '{name}' must have a Two-ID formatted id (AA-123).")
+        elif str(module_id) in ids_seen:
+            reasons.append(f"Module id '{module_id}' is duplicated.")
+        else:
+            ids_seen.add(str(module_id))
+
+        if name in names_seen:
+            reasons.append(f"Module name '{name}' is duplicated.")
+        names_seen.add(name)
+
+        version = entry.get("version")
+        if version is None or not SEMVER_PATTERN.match(str(version)):
+            reasons.append(f"Module '{name}' version must follow SemVer (MAJOR.MINOR.PATCH).")
+
+        owner = entry.get("owner")
+        if owner is None or not str(owner).strip():
+            reasons.append(f"Module '{name}' owner must be a non-empty string.")
+
+        deps = entry.get("dependencies")
+        if deps is None:
+            deps = []
+        elif not isinstance(deps, list):
+            reasons.append(f"Module '{name}' dependencies must be an array.")
+            deps = []
+        entries.append({**entry, "name": name, "dependencies": [str(d) for d in deps]})
+
+    for entry in entries:
+        for dependency in entry["dependencies"]:
+            if dependency not in names_seen:
+                reasons.append(
+                    f"Module '{entry['name']}' declares dependency '{dependency}' "
+                    "that is not present in the registry."
+                )
+    if reasons:
+        raise RegistryError(reasons)
+    return entries
+
+
+def _parse_yaml(text: str) -> Any:
+    if yaml is None:
+        raise RegistryError(["PyYAML is required to read the registry (pip install pyyaml)."])
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        return yaml.load(text, Loader=loader)
+    except yaml.YAMLError as e:
+        raise RegistryError([f"Registry YAML could not be parsed: {e}"]) from e
+
+
+_CACHE: Dict[Path, ModuleRegistry] = {}
+
+
+def load_registry(path: Path) -> ModuleRegistry:
+    """Load and index the registry, reusing the previous index if unchanged."""
+    path = Path(path)
+    if not path.is_file():
+        raise RegistryError([f"Registry file not found at '{path}'."])
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    cached = _CACHE.get(path.resolve())
+    if cached is not None and cached.digest == digest:
+        return cached
+    registry = ModuleRegistry.from_document(_parse_yaml(raw.decode("utf-8")), digest)
+    _CACHE[path.resolve()] = registry
+    return registry
+
+
+def ensure_mermaid(registry_path: Path, output_path: Path) -> bool:
+    """Write the Mermaid graph only when the registry content hash changed.
+
+    The hash of the registry that produced the graph is kept next to it in
+    `<output>.sha256`. Returns True when the graph was (re)generated.
+    """
+    registry_path = Path(registry_path)
+    output_path = Path(output_path)
+    stamp_path = output_path.with_name(output_path.name + ".sha256")
+    digest = hashlib.sha256(registry_path.read_bytes()).hexdigest()
+    if output_path.exists() and stamp_path.exists():
+        if stamp_path.read_text(encoding="utf8").strip() == digest:
+            return False
+    registry = load_registry(registry_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(registry.to_mermaid(), encoding="utf8")
+    stamp_path.write_text(digest + "\n", encoding="utf8")
+    return True
+
+
+def synthetic_document(modules: int, max_deps: int = 4, seed: int = 0) -> Dict[str, Any]:
+    """Generate an acyclic registry document with `modules` entries."""
+    rng = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    alphabet = "0123456789" + letters
+    entries = []
+    for i in range(modules):
+        prefix = letters[(i // 46656) // 26 % 26] + letters[(i // 46656) % 26]
+        suffix = "".join(alphabet[(i // 36 ** p) % 36] for p in (2, 1, 0))
+        # Only depend on earlier modules so the graph stays acyclic.
+        deps = rng.sample(range(i), min(i, rng.randint(0, max_deps)))
+        entries.append(
+            {
+                "id": f"{prefix}-{suffix}",
+                "name": f"module_{i:05d}",
+                "version": "1.0.0",
+                "owner": "Synthetic",
+                "dependencies": [f"module_{d:05d}" for d in deps],
+            }
+        )
+    return {"modules": entries}
+
+
+def benchmark(modules: int = 10000, queries: int = 1000, seed: int = 0) -> Dict[str, Any]:
+    """Time indexing and impact queries over a synthetic registry."""
+    document = synthetic_document(modules, seed=seed)
+    start = time.perf_counter()
+    registry = ModuleRegistry.from_document(document)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(seed + 1)
+    changed = [
+        f"{MODULES_ROOT}/{registry.names[i]}_{registry.ids[i]}/src/file.py"
+        for i in (rng.randrange(modules) for _ in range(queries))
+    ]
+    affected = 0
+    start = time.perf_counter()
+    for path in changed:
+        affected += len(registry.impacted_by_paths([path]))
+    query_ms = (time.perf_counter() - start) * 1000
+    return {
+        "modules": modules,
+        "edges": sum(len(d) for d in registry.dependencies),
+        "index_ms": round(index_ms, 2),
+        "queries": queries,
+        "query_avg_ms": round(query_ms / queries, 4),
+        "affected_avg": round(affected / queries, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Query modules/registry.yaml.")
+    p.add_argument("--registry", type=Path, default=Path("modules/registry.yaml"))
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("validate", help="Validate the registry and report cycles.")
+    impact = sub.add_parser("impact", help="List modules affected by changed paths.")
+    impact.add_argument("paths", nargs="+")
+    graph = sub.add_parser("graph", help="Regenerate the Mermaid graph if stale.")
+    graph.add_argument("--output", type=Path, default=Path(".runs/ci/graph.mmd"))
+    bench = sub.add_parser("bench", help="Benchmark on a synthetic registry.")
+    bench.add_argument("--modules", type=int, default=10000)
+    bench.add_argument("--queries", type=int, default=1000)
+    args = p.parse_args(argv)
+
+    try:
+        if args.command == "bench":
+            result: Any = benchmark(args.modules, args.queries)
+        elif args.command == "graph":
+            result = {"regenerated": ensure_mermaid(args.registry, args.output)}
+        else:
+            registry = load_registry(args.registry)
+            if args.command == "impact":
+                changed = registry.modules_for_paths(args.paths)
+                result = {"changed": changed, "impacted": registry.impacted(changed)}
+            else:
+                order = [registry.names[i] for i in registry.topo_order]
+                result = {"modules": len(registry.names), "order": order}
+    except RegistryError as e:
+        print(json.dumps({"pass": False, "reasons": e.reasons}))
+        return 1
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
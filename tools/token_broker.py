@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+token_broker.py
+Cached GitHub App token broker for the merge-train and push scripts.
+
+- The App private key is read once and the App JWT is reused until it is
+  within `refresh_margin` seconds of expiry.
+- Installation tokens are cached per (owner, repo) in memory and on disk,
+  next to the installation id, and are only re-minted when close to
+  `expires_at`. Disk access is serialised with a per-entry lock file so
+  concurrent pushes share one token instead of each minting their own.
+- All API calls go through one pooled `requests.Session` that retries
+  429/5xx responses with exponential backoff.
+
+Requires: pip install requests PyJWT cryptography
+
+Usage:
+  python tools/token_broker.py --app-id 12345 --private-key key.pem --owner myorg --repo myrepo
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if sys.platform == "win32":  # pragma: no cover - exercised on Windows runners only
+    import msvcrt
+else:
+    import fcntl
+
+GITHUB_API_URL = "https://api.github.com"
+JWT_LIFETIME_S = 9 * 60
+DEFAULT_REFRESH_MARGIN_S = 5 * 60
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("GITHUB_TOKEN_CACHE_DIR")
+    or Path.home() / ".cache" / "r_pipeline" / "github-tokens"
+)
+
+Signer = Callable[[Dict[str, Any], bytes], str]
+
+
+class TokenBrokerError(RuntimeError):
+    """Raised when GitHub rejects a token request."""
+
+
+def build_session(
+    retries: int = 3, backoff_factor: float = 0.5, pool_size: int = 4
+) -> requests.Session:
+    """Return a session with connection pooling and retry/backoff on 429/5xx."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # Minting a token is safe to repeat, so POST is retried as well.
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept": "application/vnd.github+json"})
+    return session
+
+
+def _pyjwt_signer(payload: Dict[str, Any], private_key: bytes) -> str:
+    import jwt  # imported lazily so callers with a custom signer need no PyJWT
+
+    token = jwt.encode(payload, private_key, algorithm="RS256")
+    return token.decode("utf-8") if isinstance(token, bytes) else token
+
+
+def _parse_expiry(value: str) -> float:
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
+
+
+@contextlib.contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as handle:
+        if sys.platform == "win32":  # pragma: no cover
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":  # pragma: no cover
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class TokenBroker:
+    """Issues cached App JWTs and installation tokens."""
+
+    def __init__(
+        self,
+        app_id: str,
+        private_key_path: Path,
+        *,
+        api_url: str = GITHUB_API_URL,
+        cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+        refresh_margin: int = DEFAULT_REFRESH_MARGIN_S,
+        session: Optional[requests.Session] = None,
+        signer: Signer = _pyjwt_signer,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.app_id = str(app_id)
+        self.private_key_path = Path(private_key_path)
+        self.api_url = api_url.rstrip("/")
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.refresh_margin = refresh_margin
+        self.session = session or build_session()
+        self._signer = signer
+        self._clock = clock
+        self._private_key: Optional[bytes] = None
+        self._jwt: Optional[Tuple[str, float]] = None
+        self._tokens: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # -- App JWT ---------------------------------------------------------
+
+    def app_jwt(self) -> str:
+        """Return an App JWT, signing a new one only when near expiry."""
+        with self._lock:
+            now = self._clock()
+            if self._jwt is not None and self._jwt[1] - self.refresh_margin > now:
+                return self._jwt[0]
+            if self._private_key is None:
+                self._private_key = self.private_key_path.read_bytes()
+            issued = int(now)
+            expires = issued + JWT_LIFETIME_S
+            # iat is backdated to tolerate clock drift, as in generate_jwt.py.
+            payload = {"iat": issued - 60, "exp": expires, "iss": self.app_id}
+            token = self._signer(payload, self._private_key)
+            self._jwt = (token, float(expires))
+            return token
+
+    # -- installation tokens --------------------------------------------
+
+    def _cache_path(self, owner: str, repo: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", f"{self.app_id}__{owner}__{repo}")
+        return self.cache_dir / f"{safe}.json"
+
+    def _fresh(self, record: Optional[Dict[str, Any]]) -> bool:
+        if not record or "token" not in record or "expires_at" not in record:
+            return False
+        return _parse_expiry(record["expires_at"]) - self.refresh_margin > self._clock()
+
+    def _read_cache(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, path: Path, record: Dict[str, Any]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf8") as f:
+                json.dump(record, f)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    def _request(self, method: str, path: str) -> requests.Response:
+        headers = {"Authorization": f"Bearer {self.app_jwt()}"}
+        return self.session.request(method, self.api_url + path, headers=headers, timeout=30)
+
+    def get_installation_id(self, owner: str, repo: str) -> int:
+        r = self._request("GET", f"/repos/{owner}/{repo}/installation")
+        if r.status_code != 200:
+            raise TokenBrokerError(f"Failed to get installation for repo: {r.status_code} {r.text}")
+        return int(r.json()["id"])
+
+    def _mint(self, owner: str, repo: str, installation_id: Optional[int]) -> Dict[str, Any]:
+        if installation_id is None:
+            installation_id = self.get_installation_id(owner, repo)
+        r = self._request("POST", f"/app/installations/{installation_id}/access_tokens")
+        if r.status_code == 404:
+            # The App was reinstalled; the cached installation id is stale.
+            installation_id = self.get_installation_id(owner, repo)
+            r = self._request("POST", f"/app/installations/{installation_id}/access_tokens")
+        if r.status_code != 201:
+            raise TokenBrokerError(f"Failed to create installation token: {r.status_code} {r.text}")
+        body = r.json()
+        return {
+            "installation_id": installation_id,
+            "token": body["token"],
+            "expires_at": body["expires_at"],
+        }
+
+    def installation_token(self, owner: str, repo: str) -> Dict[str, Any]:
+        """Return {installation_id, token, expires_at}, minting only when needed."""
+        key = (owner, repo)
+        with self._lock:
+            record = self._tokens.get(key)
+        if record is not None and self._fresh(record):
+            return dict(record)
+
+        path = self._cache_path(owner, repo)
+        fresh: Dict[str, Any]
+        if path is None:
+            fresh = self._mint(owner, repo, record.get("installation_id") if record else None)
+        else:
+            with _file_lock(path.with_suffix(".lock")):
+                # Another process may have refreshed the token while we waited.
+                cached = self._read_cache(path)
+                if cached is not None and self._fresh(cached):
+                    fresh = cached
+                else:
+                    known = (cached or record or {}).get("installation_id")
+                    fresh = self._mint(owner, repo, known)
+                    self._write_cache(path, fresh)
+        with self._lock:
+            self._tokens[key] = fresh
+        return dict(fresh)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def main(argv: Optional[list] = None) -> int:
+    p = argparse.ArgumentParser(description="Print a cached GitHub App installation token.")
+    p.add_argument("--app-id", required=True, help="GitHub App ID (integer)")
+    p.add_argument("--private-key", required=True, type=Path, help="Path to App private key (PEM)")
+    p.add_argument("--owner", required=True)
+    p.add_argument("--repo", required=True)
+    p.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    p.add_argument("--api-url", default=GITHUB_API_URL)
+    args = p.parse_args(argv)
+
+    broker = TokenBroker(
+        args.app_id, args.private_key, api_url=args.api_url, cache_dir=args.cache_dir
+    )
+    try:
+        info = broker.installation_token(args.owner, args.repo)
+    except (TokenBrokerError, requests.RequestException) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    finally:
+        broker.close()
+
+    print("installation_id:", info["installation_id"])
+    print("token:", info["token"])
+    print("expires_at:", info["expires_at"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+bench.py
+End-to-end save -> result latency benchmark for the watcher pipeline (WS-08).
+
+For each synthetic repo size and save burst it:
+  1. saves N files (rewrites them with new content),
+  2. runs py_check.py for each saved file, as build.ps1 does,
+  3. writes the batch record to .runs/watch/<ts>.json,
+  4. runs consumer.py, which emits .runs/watch/summary.json,
+and measures save -> record JSON latency, save -> summary latency, throughput
+and peak child RSS. consumer.py is also timed against a run history the size
+of the repo, and changeplan_validator.py against a ChangePlan listing every
+file.
+
+Results are written as JSON. With --baseline the run is compared to a stored
+baseline and exits 1 when any metric regresses beyond --tolerance.
+
+Usage:
+  python watcher/bench.py --sizes 1,100,10000 --bursts 1,10
+  python watcher/bench.py --baseline .runs/ci/bench_baseline.json --update-baseline
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_HERE = str(Path(__file__).resolve().parent)
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
+# Records use the same build.ps1 run-record schema as distributed runs.
+from distributed import make_record  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+PY_CHECK = REPO_ROOT / "watcher" / "py_check.py"
+CONSUMER = REPO_ROOT / "watcher" / "consumer.py"
+CHANGEPLAN_VALIDATOR = (
+    REPO_ROOT
+    / "AIUOKEEP_Implementation_Files"
+    / "scripts"
+    / "validation"
+    / "changeplan_validator.py"
+)
+
+TARGET_MS = 2000.0
+# Metrics where a larger value is a regression; throughput is the inverse.
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "peak_rss_kib")
+HIGHER_IS_BETTER = ("throughput_per_s",)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_tool(cmd: List[str], cwd: Path) -> Tuple[int, str, Optional[int]]:
+    """Run a child process and return (exit code, stdout, peak RSS in KiB).
+
+    On POSIX the child is reaped with os.wait4 so its own rusage is reported
+    rather than the cumulative RUSAGE_CHILDREN high-water mark.
+    """
+    proc = subprocess.Popen(
+        cmd, cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    assert proc.stdout is not None
+    out = proc.stdout.read().decode("utf8", "replace")
+    proc.stdout.close()
+    if not hasattr(os, "wait4"):
+        return proc.wait(), out, None
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    rss = usage.ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024  # bytes on macOS, KiB on Linux
+    return proc.returncode, out, rss
+
+
+def make_repo(root: Path, files: int) -> List[Path]:
+    """Create a synthetic repo with `files` small Python modules."""
+    paths = []
+    for i in range(files):
+        path = root / "src" / f"pkg_{i // 1000:03d}" / f"mod_{i:05d}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"def f_{i}(x):\n    return x + {i}\n", encoding="utf8")
+        paths.append(path)
+    (root / ".runs" / "watch").mkdir(parents=True, exist_ok=True)
+    return paths
+
+
+def _metrics(
+    latencies: List[float], elapsed_s: float, count: int, rss: List[Optional[int]]
+) -> Dict[str, Any]:
+    known = [r for r in rss if r is not None]
+    return {
+        "samples": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "max_ms": round(max(latencies, default=0.0), 3),
+        "throughput_per_s": round(count / elapsed_s, 3) if elapsed_s > 0 else 0.0,
+        "peak_rss_kib": max(known) if known else None,
+    }
+
+
+def bench_save_burst(
+    repo: Path, files: List[Path], burst: int, repeats: int
+) -> Dict[str, Any]:
+    """Save `burst` files, check them and emit record + summary JSON."""
+    run_dir = repo / ".runs" / "watch"
+    to_record: List[float] = []
+    to_summary: List[float] = []
+    rss: List[Optional[int]] = []
+    consumer_rss: List[Optional[int]] = []
+    total_s = 0.0
+    saved = 0
+    targets = files[: max(1, min(burst, len(files)))]
+    for rep in range(repeats):
+        start = time.perf_counter()
+        saves = []
+        for path in targets:
+            path.write_text(
+                path.read_text(encoding="utf8") + f"# save {rep}\n", encoding="utf8"
+            )
+            saves.append(time.perf_counter())
+        records = []
+        for path in targets:
+            t0 = time.perf_counter()
+            cmd = [sys.executable, str(PY_CHECK), "--file", str(path)]
+            _, out, peak = run_tool(cmd, repo)
+            rss.append(peak)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            records.append(make_record(str(path), json.loads(out), elapsed_ms))
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        (run_dir / f"{stamp}.json").write_text(json.dumps(records), encoding="utf8")
+        emitted = time.perf_counter()
+        _, _, peak = run_tool([sys.executable, str(CONSUMER)], repo)
+        consumer_rss.append(peak)
+        summarized = time.perf_counter()
+        to_record.extend((emitted - s) * 1000 for s in saves)
+        to_summary.extend((summarized - s) * 1000 for s in saves)
+        total_s += summarized - start
+        saved += len(targets)
+    result = _metrics(to_record, total_s, saved, rss)
+    result["summary_p50_ms"] = round(percentile(to_summary, 50), 3)
+    result["summary_p95_ms"] = round(percentile(to_summary, 95), 3)
+    result["consumer_peak_rss_kib"] = max(
+        [r for r in consumer_rss if r is not None], default=None
+    )
+    return result
+
+
+def bench_consumer(repo: Path, history: int, repeats: int) -> Dict[str, Any]:
+    """Time consumer.py over a .runs/watch directory holding `history` runs."""
+    run_dir = repo / ".runs" / "watch"
+    existing = len(list(run_dir.glob("hist-*.json")))
+    for i in range(existing, history):
+        record = make_record(f"src/mod_{i:05d}.py", {"status": "ok"}, 1.0)
+        path = run_dir / f"hist-{i:05d}.json"
+        path.write_text(json.dumps([record]), encoding="utf8")
+    latencies, rss = [], []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        _, _, peak = run_tool([sys.executable, str(CONSUMER)], repo)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        rss.append(peak)
+    return _metrics(latencies, time.perf_counter() - start, repeats, rss)
+
+
+def bench_changeplan(repo: Path, files: List[Path], repeats: int) -> Dict[str, Any]:
+    """Time changeplan_validator.py on a ChangePlan that lists every file."""
+    workspace = repo / "changeplan"
+    workspace.mkdir(exist_ok=True)
+    plan = {
+        "summary": "Synthetic benchmark change",
+        "changes": [
+            {
+                "path": p.relative_to(repo).as_posix(),
+                "description": "touch",
+                "tests": ["bench"],
+            }
+            for p in files
+        ],
+        "validation": {"format": True, "lint": True, "test": True},
+    }
+    (workspace / "changeplan.json").write_text(json.dumps(plan), encoding="utf8")
+    cmd = [sys.executable, str(CHANGEPLAN_VALIDATOR), "--workspace", str(workspace)]
+    latencies, rss = [], []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        rc, _, peak = run_tool(cmd, repo)
+        if rc != 0:
+            raise RuntimeError(f"changeplan_validator exited {rc} on synthetic plan")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        rss.append(peak)
+    return _metrics(latencies, time.perf_counter() - start, repeats, rss)
+
+
+def run_suite(
+    work_dir: Path, sizes: List[int], bursts: List[int], repeats: int
+) -> Dict[str, Any]:
+    """Run every scenario and return the results document."""
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    for size in sizes:
+        repo = work_dir / f"repo-{size}"
+        files = make_repo(repo, size)
+        for burst in bursts:
+            if burst > size:
+                continue
+            key = f"save_burst/files={size}/burst={burst}"
+            scenarios[key] = bench_save_burst(repo, files, burst, repeats)
+        scenarios[f"consumer/history={size}"] = bench_consumer(repo, size, repeats)
+        scenarios[f"changeplan_validator/changes={size}"] = bench_changeplan(
+            repo, files, repeats
+        )
+    return {
+        "generated": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {"sizes": sizes, "bursts": bursts, "repeats": repeats},
+        "scenarios": scenarios,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Return a message for every metric that regressed beyond `tolerance`.
+
+    Scenarios missing from either side are ignored so the suite can grow.
+    """
+    regressions = []
+    base = baseline.get("scenarios", {})
+    for key, current in sorted(results.get("scenarios", {}).items()):
+        previous = base.get(key)
+        if not previous:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            now, then = current.get(metric), previous.get(metric)
+            if not now or not then:
+                continue
+            if metric in LOWER_IS_BETTER and now > then * (1 + tolerance):
+                change = (now / then - 1) * 100
+            elif metric in HIGHER_IS_BETTER and now < then * (1 - tolerance):
+                change = (now / then - 1) * 100
+            else:
+                continue
+            regressions.append(f"{key} {metric}: {then} -> {now} ({change:+.1f}%)")
+    return regressions
+
+
+def check_target(results: Dict[str, Any], target_ms: float) -> List[str]:
+    """Flag single-file saves whose p95 save -> summary latency misses the target."""
+    failures = []
+    for key, metrics in sorted(results.get("scenarios", {}).items()):
+        if key.startswith("save_burst/") and key.endswith("/burst=1"):
+            if metrics["summary_p95_ms"] > target_ms:
+                failures.append(
+                    f"{key} summary_p95_ms {metrics['summary_p95_ms']} > {target_ms}"
+                )
+    return failures
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Watcher save -> result benchmark.")
+    p.add_argument("--sizes", type=_int_list, default=[1, 100, 10000])
+    p.add_argument("--bursts", type=_int_list, default=[1, 10, 50])
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument(
+        "--output", type=Path, default=REPO_ROOT / ".runs" / "ci" / "bench.json"
+    )
+    p.add_argument("--baseline", type=Path, help="Baseline JSON to compare against")
+    p.add_argument("--update-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=0.25,
+                   help="Allowed relative regression (0.25 = 25%%)")
+    p.add_argument("--target-ms", type=float, default=TARGET_MS)
+    p.add_argument("--work-dir", type=Path, help="Keep synthetic repos here")
+    args = p.parse_args(argv)
+
+    if args.work_dir:
+        args.work_dir.mkdir(parents=True, exist_ok=True)
+        results = run_suite(args.work_dir, args.sizes, args.bursts, args.repeats)
+    else:
+        with tempfile.TemporaryDirectory(prefix="watcher-bench-") as tmp:
+            results = run_suite(Path(tmp), args.sizes, args.bursts, args.repeats)
+
+    failures = check_target(results, args.target_ms)
+    if args.baseline and args.baseline.exists() and not args.update_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf8"))
+        failures.extend(compare(results, baseline, args.tolerance))
+    results["failures"] = failures
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf8")
+    if args.baseline and args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf8")
+
+    for key, metrics in results["scenarios"].items():
+        print(json.dumps({"scenario": key, **metrics}, separators=(",", ":")))
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -67,6 +67,78 @@ function Get-CachePathForFile {
   return (Join-Path (Join-Path $repoRoot '.runs/cache') ("path-" + $key + ".json"))
 }
 
+# Tracing (see watcher/tracing.py): one trace per batch, shared with child
+# processes through WATCHER_TRACE_* and sampled by a hash of the trace ID.
+$traceBatch = [System.Diagnostics.Stopwatch]::StartNew()
+$traceOwned = $false
+if (-not $env:WATCHER_TRACE_ID) {
+  $env:WATCHER_TRACE_ID = [guid]::NewGuid().ToString('N')
+  $traceOwned = $true
+}
+$traceId = $env:WATCHER_TRACE_ID
+if (-not $env:WATCHER_TRACE_DIR) { $env:WATCHER_TRACE_DIR = Join-Path $repoRoot '.runs/trace' }
+$traceRate = 0.1
+if ($env:WATCHER_TRACE_SAMPLE) {
+  try { $traceRate = [double]::Parse($env:WATCHER_TRACE_SAMPLE, [Globalization.CultureInfo]::InvariantCulture) } catch { }
+}
+$traceSampled = $false
+$traceSampledOwned = $false
+if ($env:WATCHER_TRACE_SAMPLED) {
+  $traceSampled = ($env:WATCHER_TRACE_SAMPLED -eq '1')
+} else {
+  if ($traceRate -ge 1) {
+    $traceSampled = $true
+  } elseif ($traceRate -gt 0) {
+    $bucket = [Convert]::ToUInt32((Get-StringHash -s $traceId).Substring(0, 8), 16)
+    $traceSampled = ($bucket / 4294967296.0) -lt $traceRate
+  }
+  # Children (py_check.py per file) read the decision instead of importing
+  # tracing and re-hashing the trace ID on every spawn.
+  $env:WATCHER_TRACE_SAMPLED = $(if ($traceSampled) { '1' } else { '0' })
+  $traceSampledOwned = $true
+}
+$traceFragment = Join-Path (Join-Path $env:WATCHER_TRACE_DIR $traceId) ("{0}.jsonl" -f $PID)
+$batchSpanId = [guid]::NewGuid().ToString('N').Substring(0, 16)
+
+function Write-TraceSpan {
+  param(
+    [string]$Name,
+    [double]$DurationMs,
+    [string]$Category = 'build',
+    [string]$ParentId,
+    [hashtable]$Data = @{},
+    [string]$SpanId = ([guid]::NewGuid().ToString('N').Substring(0, 16))
+  )
+  if (-not $traceSampled) { return }
+  try {
+    $durUs = [long]($DurationMs * 1000)
+    $nowUs = [long](([DateTime]::UtcNow.Ticks - 621355968000000000) / 10)
+    $spanArgs = [ordered]@{ trace_id = $traceId; span_id = $SpanId }
+    if ($ParentId) { $spanArgs.parent_id = $ParentId }
+    foreach ($k in $Data.Keys) { $spanArgs[$k] = $Data[$k] }
+    $lines = @()
+    if (-not (Test-Path -LiteralPath $traceFragment)) {
+      New-Item -ItemType Directory -Path (Split-Path -Parent $traceFragment) -Force | Out-Null
+      $lines += ([ordered]@{ name = 'process_name'; ph = 'M'; pid = $PID; args = @{ name = 'build.ps1' } } | ConvertTo-Json -Compress)
+    }
+    $lines += ([ordered]@{
+      name = $Name; cat = $Category; ph = 'X'; ts = $nowUs - $durUs; dur = $durUs
+      pid = $PID; tid = [System.Threading.Thread]::CurrentThread.ManagedThreadId; args = $spanArgs
+    } | ConvertTo-Json -Compress -Depth 5)
+    # AppendAllText writes UTF-8 without a BOM so fragments stay valid JSONL.
+    [System.IO.File]::AppendAllText($traceFragment, (($lines -join "`n") + "`n"))
+  } catch { }
+}
+
+# Time between the first queued change (set by watch.ps1) and this batch starting.
+if ($env:WATCHER_TRACE_QUEUED_US) {
+  try {
+    $nowUs = [long](([DateTime]::UtcNow.Ticks - 621355968000000000) / 10)
+    Write-TraceSpan -Name 'debounce' -Category 'watch' -ParentId $batchSpanId -DurationMs (($nowUs - [long]$env:WATCHER_TRACE_QUEUED_US) / 1000.0)
+  } catch { }
+  Remove-Item Env:WATCHER_TRACE_QUEUED_US -ErrorAction SilentlyContinue
+}
+
 function Try-Run-External {
   param(
     [string]$CmdName,
@@ -84,6 +156,9 @@ foreach ($file in $Files) {
   try {
     $steps = @()
     $swTotal = [System.Diagnostics.Stopwatch]::StartNew()
+    $swFile = [System.Diagnostics.Stopwatch]::StartNew()
+    $fileSpanId = [guid]::NewGuid().ToString('N').Substring(0, 16)
+    $env:WATCHER_TRACE_PARENT = $fileSpanId
 
     $ext = [IO.Path]::GetExtension($file).ToLowerInvariant()
     $result = [ordered]@{
@@ -104,11 +179,14 @@ foreach ($file in $Files) {
     if (Test-Path $cachePath -PathType Leaf -ErrorAction SilentlyContinue) {
       try {
         $prev = Get-Content -LiteralPath $cachePath -Raw | ConvertFrom-Json
-        if ($prev -and $prev.hash -eq $currentHash) { $cacheHit = $true }
+        # A cached error is re-checked; records written before 'status' existed count as hits.
+        $prevFailed = $prev -and $prev.PSObject.Properties['status'] -and $prev.status -eq 'error'
+        if ($prev -and $prev.hash -eq $currentHash -and -not $prevFailed) { $cacheHit = $true }
       } catch { }
     }
     $swCache.Stop()
     $steps += [ordered]@{ name = 'cache-check'; elapsed_ms = [int]$swCache.Elapsed.TotalMilliseconds; success = $true }
+    Write-TraceSpan -Name 'cache-check' -Category 'cache' -ParentId $fileSpanId -DurationMs $swCache.Elapsed.TotalMilliseconds -Data @{ hit = $cacheHit }
 
     if ($cacheHit) {
       $result.handler = "cache"
@@ -118,6 +196,7 @@ foreach ($file in $Files) {
       $result.success = $true
       $results += $result
       Log-Line ("CHECK OK (skipped): {0}" -f $file)
+      Write-TraceSpan -Name 'check' -ParentId $batchSpanId -SpanId $fileSpanId -DurationMs $swFile.Elapsed.TotalMilliseconds -Data @{ file = $file; status = 'skipped' }
       continue
     }
 
@@ -140,6 +219,7 @@ foreach ($file in $Files) {
             }
             $sw.Stop()
             $steps += [ordered]@{ name = 'py_check'; elapsed_ms = [int]$sw.Elapsed.TotalMilliseconds; success = ($result.status -eq 'ok') }
+            Write-TraceSpan -Name 'py_check' -Category 'tool' -ParentId $fileSpanId -DurationMs $sw.Elapsed.TotalMilliseconds
           } catch {
             $result.status = "error"
             $result.details.py_check = @{ error = $_.Exception.Message }
@@ -153,6 +233,7 @@ foreach ($file in $Files) {
             $result.status = "ok"
             $sw.Stop()
             $steps += [ordered]@{ name = 'py_compile'; elapsed_ms = [int]$sw.Elapsed.TotalMilliseconds; success = $true }
+            Write-TraceSpan -Name 'py_compile' -Category 'tool' -ParentId $fileSpanId -DurationMs $sw.Elapsed.TotalMilliseconds
           } catch {
             $result.status = "error"
             $result.details.py_check = @{ error = $_.Exception.Message }
@@ -171,6 +252,7 @@ foreach ($file in $Files) {
           }
           $sw.Stop()
           $steps += [ordered]@{ name = 'ruff'; elapsed_ms = [int]$sw.Elapsed.TotalMilliseconds; success = $ruffRes.ok }
+          Write-TraceSpan -Name 'ruff' -Category 'tool' -ParentId $fileSpanId -DurationMs $sw.Elapsed.TotalMilliseconds
         } else {
           $result.details.ruff = @{ available = $false }
         }
@@ -185,6 +267,7 @@ foreach ($file in $Files) {
           }
           $sw.Stop()
           $steps += [ordered]@{ name = 'pyright'; elapsed_ms = [int]$sw.Elapsed.TotalMilliseconds; success = $pyrightRes.ok }
+          Write-TraceSpan -Name 'pyright' -Category 'tool' -ParentId $fileSpanId -DurationMs $sw.Elapsed.TotalMilliseconds
         } else {
           $result.details.pyright = @{ available = $false }
         }
@@ -216,6 +299,7 @@ foreach ($file in $Files) {
         }
         $sw.Stop()
         $steps += [ordered]@{ name = 'ps_parse'; elapsed_ms = [int]$sw.Elapsed.TotalMilliseconds; success = ($result.status -eq 'ok') }
+        Write-TraceSpan -Name 'ps_parse' -Category 'tool' -ParentId $fileSpanId -DurationMs $sw.Elapsed.TotalMilliseconds
       }
 
       default {
@@ -279,6 +363,7 @@ foreach ($file in $Files) {
       $swSP.Stop()
       $result.details.SafePatch = $spDetails
       $steps += [ordered]@{ name = 'safepatch'; elapsed_ms = [int]$swSP.Elapsed.TotalMilliseconds; success = $spOk }
+      Write-TraceSpan -Name 'safepatch' -Category 'tool' -ParentId $fileSpanId -DurationMs $swSP.Elapsed.TotalMilliseconds
     }
 
     # SPEC-1 integration (best-effort)
@@ -305,12 +390,27 @@ foreach ($file in $Files) {
     $result.success = ($result.status -eq 'ok' -or $result.status -eq 'skipped')
 
     # update cache with current hash
+    $swCacheWrite = [System.Diagnostics.Stopwatch]::StartNew()
     try {
-      @{ path = $file; hash = $currentHash; when = (Get-Date).ToString('o') } | ConvertTo-Json -Depth 5 | Out-File -FilePath $cachePath -Encoding utf8
+      $cacheRecord = [ordered]@{ path = $file; hash = $currentHash; status = $result.status; when = (Get-Date).ToString('o') }
+      $cacheRecord | ConvertTo-Json -Depth 5 | Out-File -FilePath $cachePath -Encoding utf8
+      # Content-addressed copy read by scripts/precommit/staged_check.py.
+      if ($currentHash -and ($result.status -eq 'ok' -or $result.status -eq 'error')) {
+        $errs = @()
+        if ($result.details.Contains('parseErrors')) { $errs = @($result.details.parseErrors) }
+        elseif ($result.status -eq 'error' -and $result.details.Contains('py_check')) {
+          try { $errs = @([string]$result.details.py_check.error) } catch { }
+        }
+        $contentRecord = [ordered]@{ path = $file; hash = $currentHash; status = $result.status; errors = $errs; when = $cacheRecord.when }
+        $contentRecord | ConvertTo-Json -Depth 5 | Out-File -FilePath (Join-Path (Split-Path -Parent $cachePath) ("content-" + $currentHash + ".json")) -Encoding utf8
+      }
     } catch { }
+    $swCacheWrite.Stop()
+    Write-TraceSpan -Name 'cache-write' -Category 'cache' -ParentId $fileSpanId -DurationMs $swCacheWrite.Elapsed.TotalMilliseconds
 
     $results += $result
     Log-Line ("CHECK OK: {0} -> {1}" -f $file, $result.status)
+    Write-TraceSpan -Name 'check' -ParentId $batchSpanId -SpanId $fileSpanId -DurationMs $swFile.Elapsed.TotalMilliseconds -Data @{ file = $file; status = $result.status }
   } catch {
     $err = $_.Exception.Message
     $results += [ordered]@{ file=$file; handler="internal"; status="error"; details=@{message=$err}; timestamp=(Get-Date).ToString("o") }
@@ -319,6 +419,7 @@ foreach ($file in $Files) {
 }
 
 # write results JSON as an array deterministically (even for single item)
+$swEmit = [System.Diagnostics.Stopwatch]::StartNew()
 ConvertTo-Json -Depth 10 -InputObject $results | Out-File -FilePath $OutputPath -Encoding utf8
 
 # Also append each record to .runs/watch/<timestamp>.jsonl
@@ -326,6 +427,15 @@ $recordsPath = Join-Path $OutputDir ($timestamp + ".jsonl")
 foreach ($r in $results) {
   $r | ConvertTo-Json -Depth 10 | Out-File -FilePath $recordsPath -Encoding utf8 -Append
 }
+$swEmit.Stop()
+Write-TraceSpan -Name 'write-results' -Category 'io' -ParentId $batchSpanId -DurationMs $swEmit.Elapsed.TotalMilliseconds
+Write-TraceSpan -Name 'batch' -SpanId $batchSpanId -DurationMs $traceBatch.Elapsed.TotalMilliseconds -Data @{ files = @($Files).Count }
+
+# watch.ps1 runs builds in-process, so do not leak this batch's trace into the next one.
+Remove-Item Env:WATCHER_TRACE_PARENT -ErrorAction SilentlyContinue
+if ($traceOwned) { Remove-Item Env:WATCHER_TRACE_ID -ErrorAction SilentlyContinue }
+if ($traceSampledOwned) { Remove-Item Env:WATCHER_TRACE_SAMPLED -ErrorAction SilentlyContinue }
 
 Write-Host "Wrote results to $OutputPath"
+if ($traceSampled) { Write-Host "Trace $traceId recorded under $($env:WATCHER_TRACE_DIR)" }
 exit 0
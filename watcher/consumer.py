@@ -2,16 +2,26 @@
 """
 consumer.py
 Lightweight consumer that reads .runs/watch/*.json and emits a summarized report
-to structured logs (stdout) and writes .runs/watch/summary.json.
+to structured logs (stdout) and writes .runs/watch/summary.json. New batches are
+also folded into the per-file status index (status_index.py), whose totals are
+reported under "current".
 """
 
+import argparse
 import json
 from pathlib import Path
 from collections import Counter
-from typing import Any, List
+from typing import Any, List, Optional
 import logging
 import sys
 
+_HERE = str(Path(__file__).resolve().parent)
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
+from profiling import add_profile_argument, profiled  # noqa: E402
+from status_index import DEFAULT_INDEX_PATH, update_index  # noqa: E402
+from tracing import get_tracer  # noqa: E402
+
 
 def find_json_runs(run_dir: Path) -> List[Path]:
     if not run_dir.exists():
@@ -64,15 +74,31 @@ def emit_summary(summary: dict[str, Any]) -> None:
     logger.info(json.dumps(summary, separators=(",", ":")))
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(allow_abbrev=False)
+    add_profile_argument(p)
+    p.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH)
+    # main() is also called in-process (tests, CI) with unrelated sys.argv.
+    args, _ = p.parse_known_args(argv)
     run_dir = Path(".runs/watch")
-    records = load_latest(run_dir)
-    summary = summarize(records)
-    out_path = run_dir / "summary.json"
-    run_dir.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf8") as f:
-        json.dump(summary, f, indent=2)
-    emit_summary(summary)
+    tracer = get_tracer()
+    with profiled("consumer", args.profile), tracer.span("consumer", cat="consumer"):
+        with tracer.span("load_latest", cat="io") as span:
+            records = load_latest(run_dir)
+            span.set(records=len(records))
+        with tracer.span("summarize", cat="consumer"):
+            summary = summarize(records)
+        with tracer.span("update_index", cat="index") as span:
+            index = update_index(run_dir, args.index)
+            summary["current"] = index.counts()
+            span.set(files=len(index))
+        out_path = run_dir / "summary.json"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        with tracer.span("write_summary", cat="io"):
+            with out_path.open("w", encoding="utf8") as f:
+                json.dump(summary, f, indent=2)
+            emit_summary(summary)
+    tracer.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,608 @@
+#!/usr/bin/env python3
+"""
+distributed.py
+Coordinator/worker mode for full-repo Python checks across several machines.
+
+The coordinator shards the files into batches by size (largest first) and
+hands them out over one of two transports:
+  --tcp HOST:PORT   line-delimited JSON over TCP
+  --spool DIR       request/reply files in a shared directory (NFS/SMB)
+Workers run the py_check.py check on their own checkout of the repo (--root)
+and send back records in the build.ps1 run-record schema.
+
+Scheduling lives in the coordinator (TaskBoard); workers only ask for work:
+- Work stealing: when the queue is empty, an idle worker takes the unchecked
+  second half of the busiest in-flight batch. The owner learns its new limit
+  from the reply to its next progress report. A file checked by both sides is
+  kept once.
+- Retry: a worker that disconnects (TCP) or stops heartbeating for --lease-s
+  loses its batches; they go back to the front of the queue. A batch that
+  has been lost --max-attempts times is recorded as an error.
+- Output: one record per file in path order, written to
+  <output-dir>/<timestamp>.json like build.ps1, so consumer.py reads it
+  unchanged.
+
+Usage:
+  python watcher/distributed.py coordinator --tcp 0.0.0.0:7300 --root .
+  python watcher/distributed.py worker --tcp coordinator-host:7300 --root /src/repo
+  python watcher/distributed.py coordinator --spool /mnt/share/spool --local-workers 4
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+_HERE = str(Path(__file__).resolve().parent)
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
+from py_check import check_file  # noqa: E402
+
+HANDLER = "python-syntax-check"
+DEFAULT_EXCLUDES = (".git", ".runs", ".venv", "node_modules", "__pycache__")
+
+
+def shard_files(
+    files: List[Tuple[str, int]], batch_bytes: int = 256 * 1024, batch_files: int = 200
+) -> List[List[str]]:
+    """Cut (path, size) pairs into batches, largest files and batches first.
+
+    A batch closes when it reaches `batch_bytes` or `batch_files`, so big files
+    travel in small batches and small files are grouped to amortise overhead.
+    """
+    ordered = sorted(files, key=lambda f: (-f[1], f[0]))
+    batches: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for path, nbytes in ordered:
+        current.append(path)
+        size += nbytes
+        if size >= batch_bytes or len(current) >= batch_files:
+            batches.append(current)
+            current, size = [], 0
+    if current:
+        batches.append(current)
+    return batches
+
+
+def discover_files(root: Path, excludes=DEFAULT_EXCLUDES) -> List[Tuple[str, int]]:
+    """Every *.py file under `root` as (posix relative path, size)."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in excludes)
+        for name in filenames:
+            if name.endswith(".py"):
+                full = Path(dirpath) / name
+                found.append((full.relative_to(root).as_posix(), full.stat().st_size))
+    return sorted(found)
+
+
+def roundtrip_timestamp(moment: Optional[datetime] = None) -> str:
+    """Local time in .NET round-trip format, as build.ps1's ToString("o") writes it."""
+    moment = (moment or datetime.now()).astimezone()
+    offset = moment.strftime("%z")
+    return (
+        f"{moment:%Y-%m-%dT%H:%M:%S}.{moment.microsecond:06d}0"
+        f"{offset[:3]}:{offset[3:]}"
+    )
+
+
+def make_record(
+    path: str, result: Dict[str, Any], elapsed_ms: float, worker: Optional[str] = None
+) -> Dict[str, Any]:
+    """A build.ps1 run record; the checker output sits under details.py_check."""
+    ok = result.get("status") == "ok"
+    details: Dict[str, Any] = {"py_check": dict(result, file=path)}
+    if worker is not None:
+        details["worker"] = worker
+    return {
+        "file": path,
+        "handler": HANDLER,
+        "status": "ok" if ok else "error",
+        "details": details,
+        "timestamp": roundtrip_timestamp(),
+        "steps": [
+            {"name": "py_check", "elapsed_ms": round(elapsed_ms, 3), "success": ok}
+        ],
+        "success": ok,
+    }
+
+
+class TaskBoard:
+    """Coordinator state: the queue, in-flight batches and collected records.
+
+    Every transport funnels worker messages into handle(); the caller is
+    expected to call reap() periodically to detect lost workers.
+    """
+
+    def __init__(
+        self,
+        batches: List[List[str]],
+        lease_s: float = 10.0,
+        max_attempts: int = 3,
+        min_steal: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.min_steal = min_steal
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.expected = {p for batch in batches for p in batch}
+        self.queue: Deque[Dict[str, Any]] = deque(
+            {"id": f"t{i:05d}", "files": batch, "attempt": 1}
+            for i, batch in enumerate(batches)
+        )
+        self.inflight: Dict[str, Dict[str, Any]] = {}
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.last_seen: Dict[str, float] = {}
+        self.lost: set = set()
+        self.stats: Dict[str, Any] = {
+            "tasks": len(batches),
+            "stolen": 0,
+            "retried": 0,
+            "duplicates": 0,
+            "failed": 0,
+            "workers": {},
+        }
+
+    def finished(self) -> bool:
+        return len(self.records) >= len(self.expected)
+
+    def handle(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            worker = str(msg.get("worker", "?"))
+            self.last_seen[worker] = self.clock()
+            self.lost.discard(worker)
+            op = msg.get("op")
+            if op == "claim":
+                return self._claim(worker)
+            if op == "progress":
+                return self._progress(msg)
+            if op == "complete":
+                return self._complete(worker, msg)
+            if op == "heartbeat":
+                return {"ok": True}
+            return {"error": f"unknown op {op!r}"}
+
+    def _assign(self, task: Dict[str, Any], worker: str) -> Dict[str, Any]:
+        task = dict(task, owner=worker, done=0, limit=len(task["files"]))
+        self.inflight[task["id"]] = task
+        return {"task": {"id": task["id"], "files": task["files"]}}
+
+    def _claim(self, worker: str) -> Dict[str, Any]:
+        if self.finished():
+            return {"stop": True}
+        if self.queue:
+            return self._assign(self.queue.popleft(), worker)
+        # Steal the unchecked back half of the busiest batch owned by someone else.
+        victims = [
+            t for t in self.inflight.values()
+            if t["owner"] != worker and t["limit"] - t["done"] >= self.min_steal
+        ]
+        if not victims:
+            return {"task": None}
+        victim = max(victims, key=lambda t: (t["limit"] - t["done"], t["id"]))
+        cut = victim["done"] + math.ceil((victim["limit"] - victim["done"]) / 2)
+        stolen = {
+            "id": f"{victim['id']}.s",
+            "files": victim["files"][cut:victim["limit"]],
+            "attempt": victim["attempt"],
+        }
+        while stolen["id"] in self.inflight:
+            stolen["id"] += "s"
+        victim["limit"] = cut
+        victim["files"] = victim["files"][:cut]
+        self.stats["stolen"] += 1
+        return self._assign(stolen, worker)
+
+    def _progress(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        task = self.inflight.get(msg.get("task", ""))
+        if task is None:
+            return {"limit": 0}  # reassigned after this worker was declared lost
+        task["done"] = max(task["done"], int(msg.get("done", 0)))
+        return {"limit": task["limit"]}
+
+    def _complete(self, worker: str, msg: Dict[str, Any]) -> Dict[str, Any]:
+        self.inflight.pop(msg.get("task", ""), None)
+        for record in msg.get("records", []):
+            path = record.get("file")
+            if path not in self.expected:
+                continue
+            if path in self.records:
+                self.stats["duplicates"] += 1
+                continue
+            self.records[path] = record
+            per_worker = self.stats["workers"]
+            per_worker[worker] = per_worker.get(worker, 0) + 1
+        return {"ok": True, "stop": self.finished()}
+
+    def drop_worker(self, worker: str) -> None:
+        """Requeue every batch owned by `worker` (front of the queue)."""
+        with self.lock:
+            self._drop(worker)
+
+    def _drop(self, worker: str) -> None:
+        self.lost.add(worker)
+        for task_id in sorted(self.inflight, reverse=True):
+            task = self.inflight[task_id]
+            if task["owner"] != worker:
+                continue
+            del self.inflight[task_id]
+            files = task["files"][:task["limit"]]
+            pending = [p for p in files if p not in self.records]
+            if not pending:
+                continue
+            if task["attempt"] >= self.max_attempts:
+                for path in pending:
+                    self.records[path] = make_record(
+                        path,
+                        {"status": "error", "error": "worker_lost",
+                         "attempts": task["attempt"]},
+                        0.0,
+                        worker,
+                    )
+                self.stats["failed"] += len(pending)
+                continue
+            self.stats["retried"] += 1
+            self.queue.appendleft(
+                {"id": f"{task_id}.r", "files": pending, "attempt": task["attempt"] + 1}
+            )
+
+    def reap(self) -> List[str]:
+        """Declare workers silent for longer than the lease lost; returns them."""
+        with self.lock:
+            now = self.clock()
+            owners = {t["owner"] for t in self.inflight.values()}
+            lost = sorted(
+                w for w in owners
+                if w not in self.lost
+                and now - self.last_seen.get(w, now) > self.lease_s
+            )
+            for worker in lost:
+                self._drop(worker)
+            return lost
+
+    def merged_records(self) -> List[Dict[str, Any]]:
+        return [self.records[p] for p in sorted(self.records)]
+
+
+# --- transports --------------------------------------------------------------
+
+
+def _parse_addr(value: str) -> Tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class _TcpHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        board: TaskBoard = self.server.board  # type: ignore[attr-defined]
+        worker = None
+        try:
+            for line in self.rfile:
+                msg = json.loads(line)
+                worker = msg.get("worker", worker)
+                reply = board.handle(msg)
+                self.wfile.write(json.dumps(reply).encode("utf8") + b"\n")
+                self.wfile.flush()
+        except (OSError, ValueError):
+            pass
+        if worker is not None and not board.finished():
+            board.drop_worker(worker)  # connection lost mid-run
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_tcp(board: TaskBoard, addr: Tuple[str, int]) -> socketserver.BaseServer:
+    server = _TcpServer(addr, _TcpHandler)
+    server.board = board  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TcpClient:
+    def __init__(self, addr: Tuple[str, int], timeout: float = 30.0):
+        self.sock = socket.create_connection(addr, timeout=timeout)
+        self.rfile = self.sock.makefile("rb")
+        self.lock = threading.Lock()
+
+    def request(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            self.sock.sendall(json.dumps(msg).encode("utf8") + b"\n")
+            line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("coordinator closed the connection")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self.rfile.close()
+        self.sock.close()
+
+
+def _write_atomic(path: Path, payload: Dict[str, Any]) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf8")
+    os.replace(tmp, path)
+
+
+class SpoolServer:
+    """Answers request files in <spool>/requests with files in <spool>/replies."""
+
+    def __init__(self, board: TaskBoard, spool: Path, poll_s: float = 0.002):
+        self.board = board
+        self.requests = spool / "requests"
+        self.replies = spool / "replies"
+        for d in (self.requests, self.replies):
+            d.mkdir(parents=True, exist_ok=True)
+        self.poll_s = poll_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            pending = sorted(p for p in self.requests.glob("*.json"))
+            for path in pending:
+                try:
+                    msg = json.loads(path.read_text(encoding="utf8"))
+                except (OSError, ValueError):
+                    continue
+                _write_atomic(self.replies / path.name, self.board.handle(msg))
+                path.unlink(missing_ok=True)
+            if not pending:
+                self._stop.wait(self.poll_s)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class SpoolClient:
+    def __init__(self, spool: Path, worker: str, timeout: float = 30.0):
+        self.requests = spool / "requests"
+        self.replies = spool / "replies"
+        self.worker = worker
+        self.timeout = timeout
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def request(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            self.seq += 1
+            name = f"{self.worker}-{self.seq:08d}.json"
+            _write_atomic(self.requests / name, msg)
+            reply = self.replies / name
+            deadline = time.monotonic() + self.timeout
+            delay = 0.001
+            while True:
+                try:
+                    payload = json.loads(reply.read_text(encoding="utf8"))
+                    reply.unlink(missing_ok=True)
+                    return payload
+                except FileNotFoundError:
+                    pass
+                if time.monotonic() > deadline:
+                    (self.requests / name).unlink(missing_ok=True)
+                    raise ConnectionError("no reply from coordinator spool")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+    def close(self) -> None:
+        pass
+
+
+# --- worker ------------------------------------------------------------------
+
+
+def run_worker(
+    client,
+    worker: str,
+    root: Path,
+    heartbeat_s: float = 2.0,
+    progress_s: float = 0.05,
+    idle_s: float = 0.05,
+    exit_after: Optional[int] = None,
+) -> int:
+    """Claim batches until the coordinator says stop; returns files checked."""
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(heartbeat_s):
+            try:
+                client.request({"op": "heartbeat", "worker": worker})
+            except (OSError, ValueError):
+                return
+
+    def ask(msg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # A finished coordinator, a dropped connection and a spool timeout all
+        # end the worker quietly; the lease expiry requeues any open batch.
+        try:
+            return client.request(msg)
+        except (OSError, ValueError):
+            return None
+
+    threading.Thread(target=beat, daemon=True).start()
+    checked = 0
+    try:
+        while True:
+            reply = ask({"op": "claim", "worker": worker})
+            if reply is None or reply.get("stop"):
+                break
+            task = reply.get("task")
+            if task is None:
+                time.sleep(idle_s)
+                continue
+            files = task["files"]
+            limit, records, last = len(files), [], time.monotonic()
+            i = 0
+            while i < limit:
+                started = time.perf_counter()
+                result = check_file(root / files[i])
+                elapsed = (time.perf_counter() - started) * 1000
+                records.append(make_record(files[i], result, elapsed, worker))
+                i += 1
+                checked += 1
+                if exit_after is not None and checked >= exit_after:
+                    os._exit(3)  # simulate a node dying mid-batch
+                if i < limit and time.monotonic() - last >= progress_s:
+                    msg = {"op": "progress", "worker": worker, "task": task["id"],
+                           "done": i}
+                    progress = ask(msg)
+                    if progress is None:
+                        return checked
+                    limit = min(limit, progress["limit"])
+                    last = time.monotonic()
+            done = ask(
+                {"op": "complete", "worker": worker, "task": task["id"],
+                 "records": records}
+            )
+            if done is None or done.get("stop"):
+                break
+    finally:
+        stop.set()
+        client.close()
+    return checked
+
+
+# --- coordinator -------------------------------------------------------------
+
+
+def _worker_command(args: argparse.Namespace, worker: str) -> List[str]:
+    cmd = [sys.executable, str(Path(__file__).resolve()), "worker", "--id", worker,
+           "--root", str(args.root)]
+    if args.spool:
+        cmd += ["--spool", str(args.spool)]
+    else:
+        cmd += ["--tcp", f"{args.bound[0]}:{args.bound[1]}"]
+    return cmd
+
+
+def run_coordinator(args: argparse.Namespace) -> Dict[str, Any]:
+    """Shard, serve until every file has a record, write the merged run record."""
+    started = time.perf_counter()
+    root = Path(args.root).resolve()
+    if args.files:
+        files = [(Path(f).as_posix(), (root / f).stat().st_size) for f in args.files]
+    else:
+        files = discover_files(root)
+    board = TaskBoard(
+        shard_files(files, args.batch_bytes, args.batch_files),
+        lease_s=args.lease_s,
+        max_attempts=args.max_attempts,
+    )
+
+    if args.spool:
+        server: Any = SpoolServer(board, Path(args.spool))
+    else:
+        server = serve_tcp(board, _parse_addr(args.tcp))
+        host, port = server.server_address[:2]
+        args.bound = ("127.0.0.1" if host in ("0.0.0.0", "") else host, port)
+        print(json.dumps({"listening": f"{host}:{port}"}), file=sys.stderr, flush=True)
+
+    workers = [
+        subprocess.Popen(_worker_command(args, f"local-{i}"))
+        for i in range(args.local_workers)
+    ]
+    deadline = time.monotonic() + args.timeout
+    timed_out = False
+    try:
+        while not board.finished():
+            board.reap()
+            if time.monotonic() > deadline:
+                timed_out = True
+                break
+            time.sleep(0.02)
+        for proc in workers:
+            try:
+                proc.wait(timeout=max(args.lease_s, 5.0))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    finally:
+        server.shutdown()
+        if not args.spool:
+            server.server_close()
+
+    records = board.merged_records()
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    out_path = out_dir / f"{stamp}.json"
+    if out_path.exists():
+        out_path = out_dir / f"{stamp}-{uuid.uuid4().hex[:6]}.json"
+    out_path.write_text(json.dumps(records, indent=2), encoding="utf8")
+    return dict(
+        board.stats,
+        files=len(files),
+        recorded=len(records),
+        errors=sum(1 for r in records if r["status"] != "ok"),
+        timedOut=timed_out,
+        elapsedMs=round((time.perf_counter() - started) * 1000, 3),
+        output=str(out_path),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Distributed watcher checks.")
+    sub = p.add_subparsers(dest="command", required=True)
+    for name in ("coordinator", "worker"):
+        cmd = sub.add_parser(name)
+        transport = cmd.add_mutually_exclusive_group(required=True)
+        transport.add_argument("--tcp", help="HOST:PORT (port 0 picks a free port)")
+        transport.add_argument("--spool", type=Path, help="Shared spool directory")
+        cmd.add_argument("--root", type=Path, default=Path("."))
+    coord = sub.choices["coordinator"]
+    coord.add_argument(
+        "files", nargs="*", help="Paths relative to --root (default: every *.py)"
+    )
+    coord.add_argument("--local-workers", type=int, default=0)
+    coord.add_argument("--batch-bytes", type=int, default=256 * 1024)
+    coord.add_argument("--batch-files", type=int, default=200)
+    coord.add_argument("--lease-s", type=float, default=10.0)
+    coord.add_argument("--max-attempts", type=int, default=3)
+    coord.add_argument("--timeout", type=float, default=600.0)
+    coord.add_argument("--output-dir", default=".runs/watch")
+    work = sub.choices["worker"]
+    work.add_argument("--id", default=None, help="Worker name (default: host-pid)")
+    work.add_argument("--heartbeat-s", type=float, default=2.0)
+    work.add_argument("--exit-after", type=int, default=None, help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.command == "worker":
+        worker = args.id or f"{socket.gethostname()}-{os.getpid()}"
+        try:
+            if args.spool:
+                client: Any = SpoolClient(args.spool, worker)
+            else:
+                client = TcpClient(_parse_addr(args.tcp))
+        except OSError as exc:
+            print(f"worker {worker}: cannot reach coordinator: {exc}", file=sys.stderr)
+            return 2
+        checked = run_worker(client, worker, args.root.resolve(),
+                             heartbeat_s=args.heartbeat_s, exit_after=args.exit_after)
+        print(json.dumps({"worker": worker, "checked": checked}), file=sys.stderr)
+        return 0
+
+    summary = run_coordinator(args)
+    print(json.dumps(summary, indent=2))
+    if summary["timedOut"]:
+        return 2
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
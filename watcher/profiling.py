@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+Opt-in profiling hook shared by py_check.py, consumer.py and
+changeplan_validator.py, plus a report command that merges many short runs.
+
+Enable per run with `--profile [cprofile|sample|all]` or for every process with
+WATCHER_PROFILE=cprofile|sample|all (1 means cprofile). Output goes to
+  .runs/profiles/<run>/<entry>-<pid>.prof     cProfile stats
+  .runs/profiles/<run>/<entry>-<pid>.folded   wall-clock stack samples
+where <run> is WATCHER_PROFILE_RUN if set (so one watcher batch shares a
+directory) or the UTC start timestamp. WATCHER_PROFILE_DIR overrides the root
+and WATCHER_PROFILE_INTERVAL_MS the sampling interval (default 1 ms).
+
+The sampler is a daemon thread reading sys._current_frames(), so it works on
+Windows and does not take over SIGALRM/SIGPROF from the profiled program.
+The .folded files use the flamegraph.pl / speedscope collapsed-stack format.
+cProfile and pstats are imported only when a profile is taken or merged, so
+importing this module costs little when profiling is off.
+
+Usage:
+  python watcher/profiling.py report                # every run, top 25
+  python watcher/profiling.py report --run 20250101T120000Z --top 10
+  python watcher/profiling.py report --sort tottime --json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+ENV_PROFILE = "WATCHER_PROFILE"
+ENV_DIR = "WATCHER_PROFILE_DIR"
+ENV_RUN = "WATCHER_PROFILE_RUN"
+ENV_INTERVAL = "WATCHER_PROFILE_INTERVAL_MS"
+DEFAULT_PROFILE_DIR = Path(".runs") / "profiles"
+MODES = ("cprofile", "sample", "all")
+
+
+def add_profile_argument(parser: argparse.ArgumentParser) -> None:
+    """Add the shared --profile option to an entry point's parser."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        choices=MODES,
+        default=None,
+        help="Write profiling data to .runs/profiles/ (default mode: cprofile)",
+    )
+
+
+def resolve_mode(requested: Optional[str] = None) -> Optional[str]:
+    """The --profile value if given, else WATCHER_PROFILE, else None."""
+    if requested:
+        return requested
+    value = os.environ.get(ENV_PROFILE, "").strip().lower()
+    if value in ("", "0", "false", "off"):
+        return None
+    if value in ("1", "true", "on"):
+        return "cprofile"
+    return value if value in MODES else None
+
+
+def run_dir(root: Optional[Path] = None) -> Path:
+    root = root or Path(os.environ.get(ENV_DIR) or DEFAULT_PROFILE_DIR)
+    run = os.environ.get(ENV_RUN) or datetime.now(timezone.utc).strftime(
+        "%Y%m%dT%H%M%SZ"
+    )
+    return root / run
+
+
+class StackSampler:
+    """Samples one thread's stack at a fixed wall-clock interval."""
+
+    def __init__(self, interval_s: float = 0.001, thread_id: Optional[int] = None):
+        self.interval_s = interval_s
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(
+                    f"{code.co_name} ({Path(code.co_filename).name}:"
+                    f"{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        with path.open("w", encoding="utf8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled(
+    entry: str, mode: Optional[str] = None, root: Optional[Path] = None
+) -> Iterator[Optional[Path]]:
+    """Profile the enclosed block when profiling is enabled.
+
+    Yields the output directory, or None when profiling is off. Stats are
+    written even if the block raises (including SystemExit).
+    """
+    mode = resolve_mode(mode)
+    if mode is None:
+        yield None
+        return
+    out_dir = run_dir(root)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{entry}-{os.getpid()}"
+    profile = None
+    if mode in ("cprofile", "all"):
+        import cProfile
+
+        profile = cProfile.Profile()
+    sampler = None
+    if mode in ("sample", "all"):
+        try:
+            interval_ms = float(os.environ.get(ENV_INTERVAL) or 1.0)
+        except ValueError:
+            interval_ms = 1.0
+        sampler = StackSampler(interval_ms / 1000.0).start()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield out_dir
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(str(out_dir / f"{stem}.prof"))
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(out_dir / f"{stem}.folded")
+
+
+def _collect(root: Path, runs: Optional[List[str]], suffix: str) -> List[Path]:
+    if not root.exists():
+        return []
+    if runs:
+        dirs = [root / r for r in runs]
+    else:
+        dirs = [d for d in root.iterdir() if d.is_dir()]
+    files: List[Path] = []
+    for d in sorted(dirs):
+        files.extend(sorted(d.glob(f"*{suffix}")))
+    return files
+
+
+def _func_label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-in
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def merge_stats(
+    root: Path,
+    runs: Optional[List[str]] = None,
+    top: int = 25,
+    sort: str = "cumulative",
+) -> Dict[str, Any]:
+    """Aggregate the .prof and .folded files under `root` into a top-N report."""
+    import io
+    import pstats
+
+    report: Dict[str, Any] = {
+        "profiles": 0,
+        "functions": [],
+        "samples": 0,
+        "hot_frames": [],
+    }
+    stats: Optional["pstats.Stats"] = None
+    for path in _collect(root, runs, ".prof"):
+        try:
+            if stats is None:
+                stats = pstats.Stats(str(path), stream=io.StringIO())
+            else:
+                stats.add(str(path))
+        except (OSError, TypeError, EOFError, ValueError):
+            continue  # truncated by a killed process
+        report["profiles"] += 1
+    if stats is not None:
+        key = "tottime" if sort == "tottime" else "cumtime"
+        rows = []
+        raw = stats.stats  # type: ignore[attr-defined]
+        for func, (cc, nc, tt, ct, _) in raw.items():
+            rows.append({
+                "function": _func_label(func),
+                "ncalls": nc,
+                "primitive_calls": cc,
+                "tottime_s": round(tt, 6),
+                "cumtime_s": round(ct, 6),
+            })
+        rows.sort(key=lambda r: r[f"{key}_s"], reverse=True)
+        report["functions"] = rows[:top]
+
+    # Self time from samples: the leaf frame of each collapsed stack.
+    leaves: Counter = Counter()
+    for path in _collect(root, runs, ".folded"):
+        with path.open("r", encoding="utf8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if not stack or not count.isdigit():
+                    continue
+                leaves[stack.rsplit(";", 1)[-1]] += int(count)
+    report["samples"] = sum(leaves.values())
+    report["hot_frames"] = [
+        {"frame": frame, "samples": n, "pct": round(100.0 * n / report["samples"], 2)}
+        for frame, n in leaves.most_common(top)
+    ]
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"Merged {report['profiles']} cProfile run(s)"]
+    if report["functions"]:
+        lines.append(f"{'ncalls':>10} {'tottime':>10} {'cumtime':>10}  function")
+        for r in report["functions"]:
+            lines.append(
+                f"{r['ncalls']:>10} {r['tottime_s']:>10.4f} {r['cumtime_s']:>10.4f}"
+                f"  {r['function']}"
+            )
+    if report["samples"]:
+        lines.append("")
+        lines.append(f"Wall-clock samples: {report['samples']}")
+        lines.append(f"{'samples':>10} {'pct':>7}  frame")
+        for r in report["hot_frames"]:
+            lines.append(f"{r['samples']:>10} {r['pct']:>6.2f}%  {r['frame']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Merge watcher profiles.")
+    sub = p.add_subparsers(dest="command", required=True)
+    rep = sub.add_parser("report", help="Top-N hot functions across runs")
+    rep.add_argument("--dir", type=Path, default=None)
+    rep.add_argument("--run", action="append", help="Run directory name (repeatable)")
+    rep.add_argument("--top", type=int, default=25)
+    rep.add_argument("--sort", choices=("cumulative", "tottime"), default="cumulative")
+    rep.add_argument("--json", action="store_true", help="Emit JSON instead of a table")
+    args = p.parse_args(argv)
+
+    root = args.dir or Path(os.environ.get(ENV_DIR) or DEFAULT_PROFILE_DIR)
+    started = time.perf_counter()
+    report = merge_stats(root, args.run, args.top, args.sort)
+    if not report["profiles"] and not report["samples"]:
+        print(f"No profiles found under {root}", file=sys.stderr)
+        return 1
+    if args.json:
+        report["merge_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
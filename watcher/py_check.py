@@ -4,16 +4,51 @@ py_check.py
 Simple Python syntax+smoke-check helper used by watcher/build.ps1.
 
 Usage:
-  python py_check.py --file path/to/file.py
+  python py_check.py --file path/to/file.py [--profile [cprofile|sample|all]]
 Outputs a single JSON object to stdout:
   { "file": "...", "status": "ok"|"error", "error": "..." }
 """
 import argparse
+from contextlib import nullcontext
 import json
+import os
 import py_compile
 from pathlib import Path
 import sys
 
+_HERE = str(Path(__file__).resolve().parent)
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
+
+class _NoTracer:
+    """Stands in for tracing.Tracer (and its spans) when tracing is off."""
+    def span(self, *args, **kwargs):
+        return self
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def set(self, **args):
+        pass
+    def flush(self):
+        pass
+
+def _tracer():
+    # build.ps1 spawns one py_check per file and exports its sampling decision,
+    # so unsampled batches never import tracing.
+    if not os.environ.get("WATCHER_TRACE_ID"):
+        return _NoTracer()
+    if os.environ.get("WATCHER_TRACE_SAMPLED") == "0":
+        return _NoTracer()
+    from tracing import get_tracer
+    return get_tracer()
+
+def _profiling_requested(argv):
+    # profiling (and cProfile with it) is only imported when it can be used.
+    if os.environ.get("WATCHER_PROFILE"):
+        return True
+    return any(arg.split("=", 1)[0] == "--profile" for arg in argv)
+
 def check_file(path: Path):
     try:
         py_compile.compile(str(path), doraise=True)
@@ -26,13 +61,23 @@ def check_file(path: Path):
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--file", required=True)
+    profiled = None
+    if _profiling_requested(sys.argv[1:]):
+        from profiling import add_profile_argument, profiled
+        add_profile_argument(p)
     args = p.parse_args()
     path = Path(args.file)
     if not path.exists():
         print(json.dumps({"file": str(path), "status": "error", "error": "not_found"}))
         sys.exit(2)
-    result = check_file(path)
-    print(json.dumps(result))
+    tracer = _tracer()
+    with profiled("py_check", args.profile) if profiled else nullcontext():
+        with tracer.span("py_check", cat="tool", file=str(path)) as span:
+            result = check_file(path)
+            span.set(status=result["status"])
+        with tracer.span("emit", cat="io"):
+            print(json.dumps(result))
+    tracer.flush()
     if result["status"] != "ok":
         sys.exit(1)
 
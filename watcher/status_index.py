@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+status_index.py
+Persistent latest-status index over the watcher run records.
+
+consumer.py folds every new .runs/watch/*.json batch into this index, so
+"what is the current status of every file" no longer means replaying the run
+history. For each file the index keeps:
+  - the latest checked status (cache hits, i.e. "skipped", keep the previous one),
+  - when it was last seen and how many runs it appeared in,
+  - its last 32 ok/error outcomes as a bit string, for flip frequency,
+  - an exponentially weighted rolling average of its total step time.
+
+The index is held column-wise in array.array / bytearray columns and stored as
+a small JSON header followed by the raw column bytes, so the snapshot at
+.runs/index/status.bin loads in a few milliseconds even for 100k files.
+Runs are folded in (mtime, name) order past a stored watermark; a missing or
+unreadable index is rebuilt from the full history. An unreadable run file stops
+the pass so it is retried next time, unless it was last written more than
+UNREADABLE_GRACE_S ago, in which case it is treated as corrupt and skipped.
+
+Usage:
+  python watcher/status_index.py update   # fold new runs (consumer.py does this)
+  python watcher/status_index.py failing
+  python watcher/status_index.py flaky --min-runs 4 --min-rate 0.25
+  python watcher/status_index.py slowest --top 20 --json
+  python watcher/status_index.py show src/app.py
+"""
+
+import argparse
+import heapq
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RUN_DIR = Path(".runs") / "watch"
+DEFAULT_INDEX_PATH = Path(".runs") / "index" / "status.bin"
+INDEX_MAGIC = b"WSIX"
+INDEX_VERSION = 1
+HISTORY_BITS = 32
+EWMA_ALPHA = 0.2
+UNREADABLE_GRACE_S = 300
+# One byte per file in the status column.
+OK, ERROR, UNKNOWN = ord("o"), ord("e"), ord("u")
+_CODES = {"ok": OK, "error": ERROR}
+_NAMES = {OK: "ok", ERROR: "error", UNKNOWN: "unknown"}
+_COLUMNS = {
+    "last_seen": "q",
+    "runs": "I",
+    "flips": "I",
+    "history": "I",
+    "history_len": "B",
+    "avg_ms": "f",
+    "samples": "I",
+}
+_PREFIX = struct.Struct("<4sI")  # magic, header length
+
+
+def _epoch(timestamp: Any, default: int) -> int:
+    try:
+        parsed = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+        return int(parsed.timestamp())
+    except ValueError:
+        return default
+
+
+def _step_ms(record: Dict[str, Any]) -> Optional[float]:
+    steps = record.get("steps")
+    if not isinstance(steps, list) or not steps:
+        return None
+    total = 0.0
+    for step in steps:
+        try:
+            total += float(step.get("elapsed_ms", 0))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return total
+
+
+class StatusIndex:
+    """Column-oriented per-file status table with a path -> row lookup."""
+
+    def __init__(self) -> None:
+        self.paths: List[str] = []
+        self.status = bytearray()
+        self.last_seen = array(_COLUMNS["last_seen"])
+        self.runs = array(_COLUMNS["runs"])
+        self.flips = array(_COLUMNS["flips"])
+        self.history = array(_COLUMNS["history"])
+        self.history_len = array(_COLUMNS["history_len"])
+        self.avg_ms = array(_COLUMNS["avg_ms"])
+        self.samples = array(_COLUMNS["samples"])
+        self._rows: Optional[Dict[str, int]] = {}
+        self.watermark: Tuple[int, str] = (0, "")
+        self.total_runs = 0
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        # Built on first use so read-only queries skip hashing every path.
+        if self._rows is None:
+            self._rows = dict(zip(self.paths, range(len(self.paths))))
+        return self._rows
+
+    # -- persistence ---------------------------------------------------------
+
+    @classmethod
+    def load(cls, path: Path) -> "StatusIndex":
+        """Load a snapshot; an unreadable or outdated one yields an empty index."""
+        index = cls()
+        try:
+            blob = path.read_bytes()
+            magic, header_len = _PREFIX.unpack_from(blob)
+            header = json.loads(blob[_PREFIX.size:_PREFIX.size + header_len])
+        except (OSError, ValueError, struct.error):
+            return index
+        if magic != INDEX_MAGIC or header.get("version") != INDEX_VERSION:
+            return index
+        count = int(header["count"])
+        pos = _PREFIX.size + header_len
+        paths_len = int(header["paths_bytes"])
+        paths = blob[pos:pos + paths_len].decode("utf8")
+        index.paths = paths.split("\n") if count else []
+        pos += paths_len
+        index.status = bytearray(blob[pos:pos + count])
+        pos += count
+        for name, code in _COLUMNS.items():
+            column = array(code)
+            nbytes = count * column.itemsize
+            column.frombytes(blob[pos:pos + nbytes])
+            if header.get("byteorder") != sys.byteorder:
+                column.byteswap()
+            setattr(index, name, column)
+            pos += nbytes
+        if len(index.paths) != count or pos != len(blob):
+            return cls()  # truncated or foreign file: rebuild
+        index._rows = None
+        index.watermark = (int(header["watermark"][0]), str(header["watermark"][1]))
+        index.total_runs = int(header.get("total_runs", 0))
+        return index
+
+    def save(self, path: Path) -> None:
+        paths = "\n".join(self.paths).encode("utf8")
+        header = json.dumps({
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "count": len(self.paths),
+            "paths_bytes": len(paths),
+            "watermark": list(self.watermark),
+            "total_runs": self.total_runs,
+        }).encode("utf8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            f.write(_PREFIX.pack(INDEX_MAGIC, len(header)))
+            f.write(header)
+            f.write(paths)
+            f.write(self.status)
+            for name in _COLUMNS:
+                getattr(self, name).tofile(f)
+        os.replace(tmp, path)
+
+    # -- updates -------------------------------------------------------------
+
+    def _row(self, path: str) -> int:
+        row = self.rows.get(path)
+        if row is None:
+            row = len(self.paths)
+            self.rows[path] = row
+            self.paths.append(path)
+            self.status.append(UNKNOWN)
+            for column in _COLUMNS:
+                getattr(self, column).append(0)
+        return row
+
+    def fold(self, records: Iterable[Dict[str, Any]], default_ts: int) -> int:
+        """Apply one batch of run records; returns how many were applied."""
+        applied = 0
+        for record in records:
+            path = record.get("file") if isinstance(record, dict) else None
+            if not path:
+                continue
+            row = self._row(str(path))
+            applied += 1
+            self.runs[row] += 1
+            self.last_seen[row] = _epoch(record.get("timestamp"), default_ts)
+            status = record.get("status")
+            if status not in ("ok", "error"):
+                continue  # cache hit or unhandled type: status unchanged
+            code = _CODES[status]
+            if self.status[row] != UNKNOWN and self.status[row] != code:
+                self.flips[row] += 1
+            self.status[row] = code
+            bit = 1 if code == ERROR else 0
+            history = (self.history[row] << 1) | bit
+            self.history[row] = history & ((1 << HISTORY_BITS) - 1)
+            self.history_len[row] = min(self.history_len[row] + 1, HISTORY_BITS)
+            elapsed = _step_ms(record)
+            if elapsed is not None:
+                if self.samples[row] == 0:
+                    self.avg_ms[row] = round(elapsed, 3)
+                else:
+                    avg = self.avg_ms[row] + EWMA_ALPHA * (elapsed - self.avg_ms[row])
+                    self.avg_ms[row] = round(avg, 3)
+                self.samples[row] += 1
+        return applied
+
+    def update_from_runs(self, run_dir: Path) -> int:
+        """Fold every run file past the watermark; returns the number of runs folded."""
+        if not run_dir.exists():
+            return 0
+        pending = []
+        for path in run_dir.glob("*.json"):
+            if path.name == "summary.json":
+                continue
+            try:
+                key = (path.stat().st_mtime_ns, path.name)
+            except OSError:
+                continue
+            if key > self.watermark:
+                pending.append((key, path))
+        folded = 0
+        for key, path in sorted(pending):
+            try:
+                with path.open("r", encoding="utf8") as f:
+                    obj = json.load(f)
+            except (OSError, ValueError):
+                if time.time_ns() - key[0] < UNREADABLE_GRACE_S * 1_000_000_000:
+                    break  # still being written: keep the watermark before it
+                continue  # unreadable long after its last write: skip it for good
+            records = obj if isinstance(obj, list) else [obj]
+            if self.fold(records, key[0] // 1_000_000_000):
+                folded += 1
+            self.watermark = key
+        self.total_runs += folded
+        return folded
+
+    # -- queries -------------------------------------------------------------
+
+    def flip_rate(self, row: int) -> float:
+        """Share of status changes between consecutive recent outcomes."""
+        n = self.history_len[row]
+        if n < 2:
+            return 0.0
+        h = self.history[row]
+        changes = bin((h ^ (h >> 1)) & ((1 << (n - 1)) - 1)).count("1")
+        return changes / (n - 1)
+
+    def entry(self, row: int) -> Dict[str, Any]:
+        return {
+            "file": self.paths[row],
+            "status": _NAMES[self.status[row]],
+            "last_seen": self.last_seen[row],
+            "runs": self.runs[row],
+            "flips": self.flips[row],
+            "flip_rate": round(self.flip_rate(row), 3),
+            "avg_ms": round(self.avg_ms[row], 3),
+        }
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        row = self.rows.get(path)
+        return None if row is None else self.entry(row)
+
+    def failing(self) -> List[Dict[str, Any]]:
+        rows = []
+        row = self.status.find(ERROR)
+        while row != -1:
+            rows.append(row)
+            row = self.status.find(ERROR, row + 1)
+        return [self.entry(r) for r in sorted(rows, key=self.paths.__getitem__)]
+
+    def flaky(
+        self, min_runs: int = 4, min_rate: float = 0.25, top: int = 25
+    ) -> List[Dict[str, Any]]:
+        scored = []
+        for row, n in enumerate(self.history_len):
+            if n >= min_runs and self.history[row]:
+                rate = self.flip_rate(row)
+                if rate >= min_rate:
+                    scored.append((rate, self.flips[row], row))
+        best = heapq.nlargest(top, scored, key=lambda s: (s[0], s[1], -s[2]))
+        return [self.entry(row) for _, _, row in best]
+
+    def slowest(self, top: int = 25) -> List[Dict[str, Any]]:
+        rows = heapq.nlargest(
+            top,
+            (r for r, n in enumerate(self.samples) if n),
+            key=self.avg_ms.__getitem__,
+        )
+        return [self.entry(r) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "files": len(self.paths),
+            "failing": self.status.count(ERROR),
+            "ok": self.status.count(OK),
+            "runs": self.total_runs,
+        }
+
+
+def update_index(
+    run_dir: Path = DEFAULT_RUN_DIR, index_path: Path = DEFAULT_INDEX_PATH
+) -> StatusIndex:
+    """Load the snapshot, fold in new runs and save it if anything changed."""
+    index = StatusIndex.load(index_path)
+    if index.update_from_runs(run_dir) or not index_path.exists():
+        index.save(index_path)
+    return index
+
+
+def _print_rows(rows: List[Dict[str, Any]], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    for r in rows:
+        print(
+            f"{r['status']:<7} {r['flip_rate']:>5.2f} {r['avg_ms']:>10.3f} ms"
+            f"  {r['runs']:>5} runs  {r['file']}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Query the per-file watcher status index.")
+    p.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH)
+    p.add_argument("--run-dir", type=Path, default=DEFAULT_RUN_DIR)
+    p.add_argument("--json", action="store_true")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("update", help="Fold new run records into the index")
+    sub.add_parser("failing", help="Files whose latest check failed")
+    flaky = sub.add_parser("flaky", help="Files whose status flips often")
+    flaky.add_argument("--min-runs", type=int, default=4)
+    flaky.add_argument("--min-rate", type=float, default=0.25)
+    flaky.add_argument("--top", type=int, default=25)
+    slowest = sub.add_parser("slowest", help="Highest rolling average step time")
+    slowest.add_argument("--top", type=int, default=25)
+    show = sub.add_parser("show", help="Status of one file")
+    show.add_argument("file")
+    args = p.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "update":
+        index = update_index(args.run_dir, args.index)
+        counts = dict(
+            index.counts(), elapsed_ms=round((time.perf_counter() - started) * 1000, 3)
+        )
+        print(json.dumps(counts))
+        return 0
+
+    index = StatusIndex.load(args.index)
+    if args.command == "show":
+        entry = index.get(args.file)
+        if entry is None:
+            print(f"{args.file} is not in the index", file=sys.stderr)
+            return 1
+        print(json.dumps(entry, indent=2))
+        return 0
+    if args.command == "failing":
+        rows = index.failing()
+    elif args.command == "flaky":
+        rows = index.flaky(args.min_runs, args.min_rate, args.top)
+    else:
+        rows = index.slowest(args.top)
+    _print_rows(rows, args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import json
+import runpy
+from pathlib import Path
+from typing import Any
+
+bench: Any = type(
+    "_Mod", (), runpy.run_path(str(Path(__file__).resolve().parents[1] / "bench.py"))
+)
+
+
+def test_suite_covers_every_tool(tmp_path):
+    results = bench.run_suite(tmp_path, sizes=[1, 3], bursts=[1, 2], repeats=1)
+
+    assert sorted(results["scenarios"]) == [
+        "changeplan_validator/changes=1",
+        "changeplan_validator/changes=3",
+        "consumer/history=1",
+        "consumer/history=3",
+        "save_burst/files=1/burst=1",
+        "save_burst/files=3/burst=1",
+        "save_burst/files=3/burst=2",
+    ]
+    burst = results["scenarios"]["save_burst/files=3/burst=2"]
+    assert burst["samples"] == 2
+    assert 0 < burst["p50_ms"] <= burst["summary_p50_ms"]
+    assert burst["throughput_per_s"] > 0
+    summary = json.loads((tmp_path / "repo-3/.runs/watch/summary.json").read_text())
+    assert summary["by_status"] == {"ok": 1}
+    run = next(p for p in (tmp_path / "repo-3/.runs/watch").glob("*.json")
+               if p.name != "summary.json")
+    record = json.loads(run.read_text())[0]
+    assert record["details"]["py_check"]["status"] == "ok"  # build.ps1 schema
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"scenarios": {"a": {"p95_ms": 100, "throughput_per_s": 10}}}
+    ok = {"scenarios": {"a": {"p95_ms": 120, "throughput_per_s": 9}, "new": {}}}
+    slow = {"scenarios": {"a": {"p95_ms": 130, "throughput_per_s": 7}}}
+
+    assert bench.compare(ok, baseline, 0.25) == []
+    messages = bench.compare(slow, baseline, 0.25)
+    assert [m.split(":")[0] for m in messages] == ["a p95_ms", "a throughput_per_s"]
+
+
+def test_main_fails_against_faster_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    out = tmp_path / "bench.json"
+    args = ["--sizes", "1", "--bursts", "1", "--repeats", "1", "--output", str(out)]
+
+    assert bench.main(args + ["--baseline", str(baseline), "--update-baseline"]) == 0
+    stored = json.loads(baseline.read_text())
+    for metrics in stored["scenarios"].values():
+        metrics["p95_ms"] = 0.001
+    baseline.write_text(json.dumps(stored))
+
+    assert bench.main(args + ["--baseline", str(baseline), "--tolerance", "0.5"]) == 1
+    assert json.loads(out.read_text())["failures"]
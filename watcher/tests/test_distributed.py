@@ -0,0 +1,146 @@
+import json
+import re
+import runpy
+import subprocess
+import sys
+import threading
+from argparse import Namespace
+from pathlib import Path
+from typing import Any
+
+WATCHER = Path(__file__).resolve().parents[1]
+dist: Any = type("_Mod", (), runpy.run_path(str(WATCHER / "distributed.py")))
+
+
+def _repo(root: Path, count: int = 24) -> Path:
+    for i in range(count):
+        path = root / f"pkg_{i % 3}" / f"mod_{i:03d}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        body = "def f(:\n" if i in (5, 17) else f"X = {i}\n" + "# pad\n" * i
+        path.write_text(body, encoding="utf8")
+    return root
+
+
+def _args(root: Path, tmp_path: Path, **overrides) -> Namespace:
+    values = dict(
+        files=[], root=root, tcp="127.0.0.1:0", spool=None, local_workers=3,
+        batch_bytes=64, batch_files=4, lease_s=5.0, max_attempts=3, timeout=60.0,
+        output_dir=str(tmp_path / "out"),
+    )
+    values.update(overrides)
+    return Namespace(**values)
+
+
+def test_shard_files_largest_first_with_limits():
+    files = [("a.py", 10), ("b.py", 500), ("c.py", 20), ("d.py", 30), ("e.py", 5)]
+
+    assert dist.shard_files(files, batch_bytes=100, batch_files=2) == [
+        ["b.py"], ["d.py", "c.py"], ["a.py", "e.py"]
+    ]
+
+
+def test_board_steals_half_and_requeues_lost_worker():
+    now = [0.0]
+    files = [f"f{i}" for i in range(8)]
+    board = dist.TaskBoard([files], lease_s=5, clock=lambda: now[0])
+
+    first = board.handle({"op": "claim", "worker": "a"})["task"]
+    assert board.handle({"op": "progress", "worker": "a", "task": first["id"],
+                         "done": 2}) == {"limit": 8}
+    stolen = board.handle({"op": "claim", "worker": "b"})["task"]
+    assert stolen["files"] == ["f5", "f6", "f7"]
+    # The owner's next progress report returns its shortened limit.
+    assert board.handle({"op": "progress", "worker": "a", "task": first["id"],
+                         "done": 3}) == {"limit": 5}
+
+    # "b" goes silent: its batch returns to the queue once the lease expires.
+    now[0] = 4.0
+    board.handle({"op": "heartbeat", "worker": "a"})
+    now[0] = 6.0
+    assert board.reap() == ["b"]
+    retry = board.handle({"op": "claim", "worker": "c"})["task"]
+    assert (retry["id"], retry["files"]) == (stolen["id"] + ".r", ["f5", "f6", "f7"])
+    assert board.stats["stolen"] == 1 and board.stats["retried"] == 1
+
+
+class _DroppingClient:
+    """Serves one batch, then fails the given op like a lost coordinator."""
+
+    def __init__(self, files, fail_op):
+        self.files, self.fail_op, self.ops, self.closed = files, fail_op, [], False
+
+    def request(self, msg):
+        self.ops.append(msg["op"])
+        if msg["op"] == self.fail_op:
+            raise ConnectionError("no reply from coordinator spool")
+        if msg["op"] == "claim":
+            return {"task": {"id": "t0", "files": self.files}}
+        return {"limit": len(self.files)}
+
+    def close(self):
+        self.closed = True
+
+
+def test_worker_stops_cleanly_when_progress_or_complete_fails(tmp_path):
+    root = _repo(tmp_path / "repo", count=6)
+    files = [p.relative_to(root).as_posix() for p in sorted(root.rglob("*.py"))]
+
+    for op in ("progress", "complete"):
+        client = _DroppingClient(files, op)
+        checked = dist.run_worker(client, "w", root, progress_s=0.0)
+        assert client.ops[-1] == op and client.closed
+        assert checked == (1 if op == "progress" else len(files))
+
+
+def _statuses(output: str):
+    return [(r["file"], r["status"]) for r in json.loads(Path(output).read_text())]
+
+
+def test_tcp_and_spool_runs_merge_identically(tmp_path):
+    root = _repo(tmp_path / "repo")
+
+    tcp = dist.run_coordinator(_args(root, tmp_path))
+    spool_args = _args(root, tmp_path, tcp=None, spool=tmp_path / "spool")
+    spool = dist.run_coordinator(spool_args)
+
+    for summary in (tcp, spool):
+        assert (summary["files"], summary["recorded"], summary["errors"]) == (24, 24, 2)
+        assert not summary["timedOut"]
+    assert _statuses(tcp["output"]) == _statuses(spool["output"])
+    statuses = _statuses(tcp["output"])
+    assert [f for f, _ in statuses] == sorted(f for f, _ in statuses)
+    errors = [f for f, s in statuses if s == "error"]
+    assert errors == ["pkg_2/mod_005.py", "pkg_2/mod_017.py"]
+    record = json.loads(Path(tcp["output"]).read_text())[0]
+    assert set(record) == {"file", "handler", "status", "details", "timestamp", "steps",
+                           "success"}
+    assert record["details"]["worker"].startswith("local-")
+    # Same layout as build.ps1: checker output under details.py_check, and a
+    # ToString("o") timestamp.
+    assert record["details"]["py_check"] == {"file": record["file"], "status": "ok"}
+    assert re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{7}[+-]\d\d:\d\d",
+                        record["timestamp"])
+
+
+def test_lost_worker_process_is_retried(tmp_path):
+    root = _repo(tmp_path / "repo", count=6)
+    args = _args(root, tmp_path, local_workers=0, batch_files=2)
+    result = {}
+    coordinator = threading.Thread(
+        target=lambda: result.update(dist.run_coordinator(args))
+    )
+    coordinator.start()
+    while not hasattr(args, "bound"):
+        coordinator.join(0.01)
+    addr = f"{args.bound[0]}:{args.bound[1]}"
+    worker = [sys.executable, str(WATCHER / "distributed.py"), "worker", "--tcp", addr,
+              "--root", str(root)]
+
+    crashed = subprocess.run(worker + ["--id", "flaky", "--exit-after", "1"])
+    assert crashed.returncode == 3
+    subprocess.run(worker + ["--id", "steady"], check=True, capture_output=True)
+    coordinator.join(30)
+
+    assert result["retried"] == 1
+    assert result["recorded"] == 6
+    assert result["workers"] == {"steady": 6}
@@ -0,0 +1,98 @@
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+WATCHER = Path(__file__).resolve().parents[1]
+REPO_ROOT = WATCHER.parent
+profiling: Any = type("_Mod", (), runpy.run_path(str(WATCHER / "profiling.py")))
+
+
+def _env(tmp_path, **extra):
+    env = dict(os.environ)
+    env.update({"WATCHER_PROFILE_DIR": str(tmp_path / "profiles")}, **extra)
+    return env
+
+
+def test_entry_points_write_profiles_into_shared_run(tmp_path):
+    source = tmp_path / "ok.py"
+    source.write_text("x = 1\n")
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    aiuokeep = REPO_ROOT / "AIUOKEEP_Implementation_Files"
+    fixture = aiuokeep / "tests/fixtures/changeplan_valid.json"
+    (workspace / "changeplan.json").write_text(fixture.read_text())
+    validator = aiuokeep / "scripts/validation/changeplan_validator.py"
+
+    for _ in range(3):
+        subprocess.run(
+            [sys.executable, str(WATCHER / "py_check.py"), "--file", str(source),
+             "--profile"],
+            env=_env(tmp_path, WATCHER_PROFILE_RUN="batch-1"),
+            check=True,
+            capture_output=True,
+        )
+    subprocess.run(
+        [sys.executable, str(validator), "--workspace", str(workspace)],
+        env=_env(tmp_path, WATCHER_PROFILE_RUN="batch-1", WATCHER_PROFILE="1"),
+        check=True,
+        capture_output=True,
+    )
+    subprocess.run(
+        [sys.executable, str(WATCHER / "consumer.py"), "--profile"],
+        cwd=tmp_path,
+        env=_env(tmp_path, WATCHER_PROFILE_RUN="batch-2"),
+        check=True,
+        capture_output=True,
+    )
+
+    run_dir = tmp_path / "profiles" / "batch-1"
+    batch = sorted(p.name.split("-")[0] for p in run_dir.iterdir())
+    assert batch == ["changeplan_validator", "py_check", "py_check", "py_check"]
+
+    report = profiling.merge_stats(tmp_path / "profiles", ["batch-1"], top=500)
+    assert report["profiles"] == 4
+    functions = report["functions"]
+    check = next(f for f in functions if f["function"].startswith("check_file"))
+    assert check["ncalls"] == 3
+
+    everything = profiling.merge_stats(tmp_path / "profiles", top=500)
+    assert everything["profiles"] == 5
+    assert any(f["function"].startswith("summarize") for f in everything["functions"])
+
+
+def test_profiling_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("WATCHER_PROFILE", raising=False)
+
+    with profiling.profiled("x", root=tmp_path) as out_dir:
+        pass
+
+    assert out_dir is None
+    assert not list(tmp_path.iterdir())
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_and_report_command(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("WATCHER_PROFILE_RUN", "sampled")
+
+    with profiling.profiled("spin", mode="sample", root=tmp_path):
+        _spin(0.2)
+
+    [folded] = (tmp_path / "sampled").glob("*.folded")
+    stacks = folded.read_text().splitlines()
+    assert stacks and all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+
+    assert profiling.main(["report", "--dir", str(tmp_path), "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["profiles"] == 0
+    assert report["hot_frames"][0]["frame"].startswith("_spin")
+    assert report["hot_frames"][0]["pct"] > 50
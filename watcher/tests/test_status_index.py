@@ -0,0 +1,119 @@
+import json
+import os
+import runpy
+import time
+from pathlib import Path
+from typing import Any
+
+WATCHER = Path(__file__).resolve().parents[1]
+status_index: Any = type("_Mod", (), runpy.run_path(str(WATCHER / "status_index.py")))
+consumer: Any = type("_Mod", (), runpy.run_path(str(WATCHER / "consumer.py")))
+
+
+def _record(path, status, elapsed_ms=1.0):
+    return {
+        "file": path,
+        "handler": "python-syntax-check",
+        "status": status,
+        "timestamp": "2025-01-01T00:00:00Z",
+        "steps": [{"name": "py_check", "elapsed_ms": elapsed_ms, "success": True}],
+        "success": status != "error",
+        "details": {},
+    }
+
+
+def _write_run(run_dir: Path, n: int, records) -> None:
+    path = run_dir / f"2025010{n}T000000.json"
+    path.write_text(json.dumps(records), encoding="utf8")
+    stamp = time.time() - 1000 + n
+    os.utime(path, (stamp, stamp))
+
+
+def test_index_tracks_latest_status_flips_and_speed(tmp_path):
+    run_dir = tmp_path / "watch"
+    run_dir.mkdir()
+    outcomes = {
+        "stable.py": ["ok", "ok", "ok", "ok", "skipped"],
+        "flaky.py": ["ok", "error", "ok", "error", "ok"],
+        "broken.py": ["ok", "ok", "error", "error", "skipped"],
+    }
+    for n in range(5):
+        _write_run(
+            run_dir, n,
+            [_record(p, s[n], elapsed_ms=10.0 * (n + 1) if p == "stable.py" else 1.0)
+             for p, s in outcomes.items()],
+        )
+    (run_dir / "summary.json").write_text(json.dumps({"total_records": 3}))
+    index_path = tmp_path / "status.bin"
+
+    index = status_index.update_index(run_dir, index_path)
+
+    assert [e["file"] for e in index.failing()] == ["broken.py"]
+    assert [e["file"] for e in index.flaky(min_runs=4, min_rate=0.5)] == ["flaky.py"]
+    assert index.get("flaky.py")["flip_rate"] == 1.0
+    assert index.get("stable.py")["status"] == "ok"  # cache hit keeps the last status
+    slowest = index.slowest(top=1)[0]
+    assert slowest["file"] == "stable.py" and slowest["avg_ms"] > 10.0
+    assert index.counts() == {"files": 3, "failing": 1, "ok": 2, "runs": 5}
+
+
+def test_only_new_runs_are_folded_and_snapshot_round_trips(tmp_path):
+    run_dir = tmp_path / "watch"
+    run_dir.mkdir()
+    index_path = tmp_path / "status.bin"
+    _write_run(run_dir, 1, [_record("a.py", "error")])
+    status_index.update_index(run_dir, index_path)
+
+    _write_run(run_dir, 2, [_record("a.py", "ok"), _record("b.py", "ok")])
+    index = status_index.update_index(run_dir, index_path)
+    again = status_index.update_index(run_dir, index_path)
+
+    expected = {"files": 2, "failing": 0, "ok": 2, "runs": 2}
+    assert again.counts() == index.counts() == expected
+    loaded = status_index.StatusIndex.load(index_path)
+    assert loaded.get("a.py") == index.get("a.py")
+    assert loaded.get("a.py")["flips"] == 1
+    assert index_path.read_bytes().startswith(b"WSIX")
+
+
+def test_unreadable_run_holds_the_watermark_until_it_is_complete(tmp_path):
+    run_dir = tmp_path / "watch"
+    run_dir.mkdir()
+    index_path = tmp_path / "status.bin"
+    partial = run_dir / "a.json"
+    partial.write_text('[{"file": "x.py", "sta', encoding="utf8")
+    (run_dir / "b.json").write_text(json.dumps([_record("y.py", "ok")]), encoding="utf8")
+    now = time.time()
+    os.utime(partial, (now - 2, now - 2))
+
+    index = status_index.update_index(run_dir, index_path)
+    assert index.counts()["files"] == 0  # b.json waits behind the partial a.json
+
+    partial.write_text(json.dumps([_record("x.py", "error")]), encoding="utf8")
+    os.utime(partial, (now - 2, now - 2))
+    index = status_index.update_index(run_dir, index_path)
+    assert index.counts() == {"files": 2, "failing": 1, "ok": 1, "runs": 2}
+
+    # A run file that stays unreadable past the grace period is skipped.
+    stale = run_dir / "0-corrupt.json"
+    stale.write_text("{", encoding="utf8")
+    old = now - status_index.UNREADABLE_GRACE_S - 60
+    os.utime(stale, (old, old))
+    rebuilt = status_index.update_index(run_dir, tmp_path / "rebuilt.bin")
+    assert rebuilt.counts() == index.counts()
+
+
+def test_consumer_updates_index_and_cli_queries_it(tmp_path, monkeypatch, capsys):
+    run_dir = tmp_path / ".runs" / "watch"
+    run_dir.mkdir(parents=True)
+    _write_run(run_dir, 1, [_record("x.py", "error"), _record("y.py", "ok")])
+    monkeypatch.chdir(tmp_path)
+
+    consumer.main([])
+    summary = json.loads((run_dir / "summary.json").read_text())
+    assert summary["current"] == {"files": 2, "failing": 1, "ok": 1, "runs": 1}
+    capsys.readouterr()
+
+    assert status_index.main(["--json", "failing"]) == 0
+    assert [e["file"] for e in json.loads(capsys.readouterr().out)] == ["x.py"]
+    assert status_index.main(["show", "missing.py"]) == 1
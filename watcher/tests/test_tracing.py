@@ -0,0 +1,81 @@
+import json
+import runpy
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+WATCHER = Path(__file__).resolve().parents[1]
+tracing: Any = type("_Mod", (), runpy.run_path(str(WATCHER / "tracing.py")))
+
+
+def test_sampling_is_deterministic_per_trace():
+    ids = [f"trace-{i}" for i in range(2000)]
+    sampled = [t for t in ids if tracing.is_sampled(t, 0.1)]
+
+    assert 120 < len(sampled) < 280
+    assert sampled == [t for t in ids if tracing.is_sampled(t, 0.1)]
+    assert all(tracing.is_sampled(t, 1.0) for t in ids[:10])
+    assert not any(tracing.is_sampled(t, 0.0) for t in ids[:10])
+
+
+def test_unsampled_tracer_records_nothing(tmp_path):
+    tracer = tracing.Tracer("abc", trace_dir=tmp_path, sample_rate=0.0)
+
+    with tracer.span("batch") as span:
+        span.set(files=1)
+    tracer.flush()
+
+    assert span.span_id is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_exported_sampling_decision_overrides_the_hash(tmp_path):
+    env = {
+        tracing.ENV_TRACE_ID: "abc",
+        tracing.ENV_DIR: str(tmp_path),
+        tracing.ENV_SAMPLE: "1.0",
+        tracing.ENV_SAMPLED: "0",
+    }
+
+    assert not tracing.Tracer.from_env(env).sampled
+    forced = {**env, tracing.ENV_SAMPLE: "0.0", tracing.ENV_SAMPLED: "1"}
+    assert tracing.Tracer.from_env(forced).sampled
+    child = tracing.Tracer("abc", trace_dir=tmp_path, sample_rate=0.0).child_env({})
+    assert child[tracing.ENV_SAMPLED] == "0"
+
+
+def test_nested_spans_and_child_process_share_one_trace(tmp_path):
+    source = tmp_path / "ok.py"
+    source.write_text("x = 1\n")
+    tracer = tracing.Tracer("t1", trace_dir=tmp_path / "trace", sample_rate=1.0)
+
+    with tracer.span("batch") as batch:
+        with tracer.span("check", file=str(source)) as check:
+            subprocess.run(
+                [sys.executable, str(WATCHER / "py_check.py"), "--file", str(source)],
+                env=tracer.child_env(),
+                check=True,
+                capture_output=True,
+            )
+    tracer.flush()
+
+    doc = tracing.export_chrome(tmp_path / "trace", "t1", tmp_path / "t1.json")
+    spans = {e["name"]: e for e in doc["traceEvents"] if e["ph"] == "X"}
+    assert set(spans) == {"batch", "check", "py_check", "emit"}
+    assert spans["check"]["args"]["parent_id"] == batch.span_id
+    assert spans["py_check"]["args"]["parent_id"] == check.span_id
+    assert spans["py_check"]["args"]["status"] == "ok"
+    assert spans["py_check"]["pid"] != spans["batch"]["pid"]
+    # Child spans fall inside the parent on the shared wall clock.
+    outer, inner = spans["check"], spans["py_check"]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    names = {e["args"]["name"] for e in doc["traceEvents"] if e["ph"] == "M"}
+    assert "py_check.py" in names
+    exported = json.loads((tmp_path / "t1.json").read_text())
+    assert exported["otherData"] == {"trace_id": "t1"}
+
+    [summary] = tracing.list_traces(tmp_path / "trace")
+    assert summary["trace_id"] == "t1"
+    assert summary["spans"] == 4 and summary["processes"] == 2
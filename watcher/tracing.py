@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+tracing.py
+Lightweight span tracing for the watcher pipeline, exported as Chrome trace-event
+JSON (open in chrome://tracing or https://ui.perfetto.dev).
+
+A trace is one watcher batch. build.ps1 assigns the trace ID and passes it to
+child processes through the environment:
+  WATCHER_TRACE_ID      trace (batch) ID; tracing is off when unset
+  WATCHER_TRACE_PARENT  span ID of the caller, so child spans can be linked
+  WATCHER_TRACE_DIR     fragment directory (default .runs/trace)
+  WATCHER_TRACE_SAMPLE  fraction of traces recorded (default 0.1)
+  WATCHER_TRACE_SAMPLED "1"/"0": the sampling decision already taken by the
+                        batch owner; py_check.py does not import this module
+                        at all when it is "0"
+
+Sampling is decided from a hash of the trace ID, so every process in a batch
+makes the same choice without coordination. Unsampled spans are no-ops.
+
+Each process appends complete ("X") events to
+<dir>/<trace_id>/<pid>.jsonl; `export` merges the fragments of one trace.
+
+Only cheap modules are imported at load time; uuid, hashlib and atexit are
+imported on first use, so py_check.py pays almost nothing when tracing is off.
+
+Usage:
+  python watcher/tracing.py list
+  python watcher/tracing.py export <trace_id> [--output trace.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+ENV_TRACE_ID = "WATCHER_TRACE_ID"
+ENV_PARENT = "WATCHER_TRACE_PARENT"
+ENV_DIR = "WATCHER_TRACE_DIR"
+ENV_SAMPLE = "WATCHER_TRACE_SAMPLE"
+ENV_SAMPLED = "WATCHER_TRACE_SAMPLED"
+DEFAULT_TRACE_DIR = Path(".runs") / "trace"
+DEFAULT_SAMPLE_RATE = 0.1
+
+
+def new_trace_id() -> str:
+    import uuid
+
+    return uuid.uuid4().hex
+
+
+def new_span_id() -> str:
+    import uuid
+
+    return uuid.uuid4().hex[:16]
+
+
+def is_sampled(trace_id: str, rate: float) -> bool:
+    """Deterministic sampling decision shared with build.ps1."""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    import hashlib
+
+    bucket = int(hashlib.sha256(trace_id.encode("utf8")).hexdigest()[:8], 16)
+    return bucket / 2**32 < rate
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+class Span:
+    """A recorded span; use `set` to attach result attributes."""
+
+    __slots__ = ("name", "cat", "span_id", "parent_id", "args", "start_us", "_t0")
+
+    def __init__(self, name: str, cat: str, parent_id: Optional[str], args: Dict):
+        self.name = name
+        self.cat = cat
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.args = args
+        self.start_us = _now_us()
+        self._t0 = time.perf_counter_ns()
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+class _NoopSpan:
+    __slots__ = ()
+    span_id = None
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Records spans for one trace into a per-process JSONL fragment."""
+
+    def __init__(
+        self,
+        trace_id: Optional[str],
+        *,
+        trace_dir: Optional[Path] = None,
+        sample_rate: float = DEFAULT_SAMPLE_RATE,
+        parent_id: Optional[str] = None,
+        process_name: Optional[str] = None,
+        sampled: Optional[bool] = None,
+    ):
+        self.trace_id = trace_id
+        self.trace_dir = Path(trace_dir) if trace_dir else DEFAULT_TRACE_DIR
+        self.sample_rate = sample_rate
+        if not trace_id:
+            self.sampled = False
+        elif sampled is not None:
+            self.sampled = sampled
+        else:
+            self.sampled = is_sampled(trace_id, sample_rate)
+        self.root_parent = parent_id
+        self.process_name = process_name or Path(sys.argv[0] or "python").name
+        self._events: List[Dict[str, Any]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._registered = False
+        self._wrote_metadata = False
+
+    @classmethod
+    def from_env(cls, env: Optional[Mapping[str, str]] = None) -> "Tracer":
+        source: Mapping[str, str] = os.environ if env is None else env
+        try:
+            rate = float(source.get(ENV_SAMPLE, DEFAULT_SAMPLE_RATE))
+        except ValueError:
+            rate = DEFAULT_SAMPLE_RATE
+        decided = source.get(ENV_SAMPLED)
+        return cls(
+            source.get(ENV_TRACE_ID) or None,
+            trace_dir=Path(source[ENV_DIR]) if source.get(ENV_DIR) else None,
+            sample_rate=rate,
+            parent_id=source.get(ENV_PARENT) or None,
+            sampled=None if decided not in ("0", "1") else decided == "1",
+        )
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span_id(self) -> Optional[str]:
+        stack = self._stack()
+        return stack[-1].span_id if stack else self.root_parent
+
+    @contextmanager
+    def span(self, name: str, cat: str = "watcher", **args: Any) -> Iterator[Any]:
+        """Time a block as a span nested under the current one."""
+        if not self.sampled:
+            yield NOOP_SPAN
+            return
+        stack = self._stack()
+        span = Span(name, cat, self.current_span_id(), args)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.args["error"] = type(exc).__name__
+            raise
+        finally:
+            stack.pop()
+            self._record(span, (time.perf_counter_ns() - span._t0) // 1000)
+
+    def _record(self, span: Span, dur_us: int) -> None:
+        args = {"trace_id": self.trace_id, "span_id": span.span_id}
+        if span.parent_id:
+            args["parent_id"] = span.parent_id
+        args.update(span.args)
+        event = {
+            "name": span.name,
+            "cat": span.cat,
+            "ph": "X",
+            "ts": span.start_us,
+            "dur": dur_us,
+            "pid": os.getpid(),
+            "tid": threading.get_ident() & 0xFFFFFFFF,
+            "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+            if not self._registered:
+                import atexit
+
+                atexit.register(self.flush)
+                self._registered = True
+
+    def child_env(self, env: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+        """Environment for a subprocess that should join this trace."""
+        child = dict(os.environ if env is None else env)
+        if self.trace_id:
+            child[ENV_TRACE_ID] = self.trace_id
+            child[ENV_DIR] = str(self.trace_dir)
+            child[ENV_SAMPLE] = str(self.sample_rate)
+            child[ENV_SAMPLED] = "1" if self.sampled else "0"
+            parent = self.current_span_id()
+            if parent:
+                child[ENV_PARENT] = parent
+        return child
+
+    def fragment_path(self) -> Path:
+        return self.trace_dir / str(self.trace_id) / f"{os.getpid()}.jsonl"
+
+    def flush(self) -> None:
+        """Append buffered events to this process's fragment file."""
+        with self._lock:
+            events, self._events = self._events, []
+            if not events:
+                return
+            if not self._wrote_metadata:
+                events.insert(0, {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "args": {"name": self.process_name},
+                })
+                self._wrote_metadata = True
+        path = self.fragment_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf8") as f:
+            for event in events:
+                f.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer configured from the environment."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer.from_env()
+    return _tracer
+
+
+def load_events(trace_dir: Path, trace_id: str) -> List[Dict[str, Any]]:
+    events: List[Dict[str, Any]] = []
+    for fragment in sorted((Path(trace_dir) / trace_id).glob("*.jsonl")):
+        with fragment.open("r", encoding="utf8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue  # torn write from a killed process
+    events.sort(key=lambda e: (e.get("ph") != "M", e.get("ts", 0)))
+    return events
+
+
+def export_chrome(
+    trace_dir: Path, trace_id: str, output: Optional[Path] = None
+) -> Dict[str, Any]:
+    """Merge a trace's fragments into one Chrome trace-event document."""
+    doc = {
+        "traceEvents": load_events(trace_dir, trace_id),
+        "displayTimeUnit": "ms",
+        "otherData": {"trace_id": trace_id},
+    }
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(doc), encoding="utf8")
+    return doc
+
+
+def list_traces(trace_dir: Path) -> List[Dict[str, Any]]:
+    """Summarise recorded traces, slowest first."""
+    traces: List[Dict[str, Any]] = []
+    root = Path(trace_dir)
+    if not root.exists():
+        return traces
+    for entry in root.iterdir():
+        if not entry.is_dir():
+            continue
+        spans = [e for e in load_events(root, entry.name) if e.get("ph") == "X"]
+        if not spans:
+            continue
+        start = min(e["ts"] for e in spans)
+        end = max(e["ts"] + e.get("dur", 0) for e in spans)
+        traces.append({
+            "trace_id": entry.name,
+            "spans": len(spans),
+            "processes": len({e["pid"] for e in spans}),
+            "duration_ms": round((end - start) / 1000, 3),
+        })
+    traces.sort(key=lambda t: t["duration_ms"], reverse=True)
+    return traces
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Inspect watcher traces.")
+    p.add_argument("--trace-dir", type=Path, default=None)
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List recorded traces, slowest first")
+    exp = sub.add_parser("export", help="Write a Chrome trace-event JSON file")
+    exp.add_argument("trace_id")
+    exp.add_argument("--output", type=Path)
+    args = p.parse_args(argv)
+
+    trace_dir = args.trace_dir or Path(os.environ.get(ENV_DIR) or DEFAULT_TRACE_DIR)
+    if args.command == "list":
+        for trace in list_traces(trace_dir):
+            print(json.dumps(trace, separators=(",", ":")))
+        return 0
+
+    output = args.output or trace_dir / f"{args.trace_id}.trace.json"
+    doc = export_chrome(trace_dir, args.trace_id, output)
+    if not doc["traceEvents"]:
+        print(f"No events recorded for trace {args.trace_id}", file=sys.stderr)
+        return 1
+    print(f"Wrote {len(doc['traceEvents'])} events to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -76,6 +76,8 @@ $script:lastChangedFiles = @()
 function Enqueue-File {
   param($fullPath)
   lock ($locker) {
+    # First change of a batch: build.ps1 reports the debounce/queue wait as a trace span.
+    if ($pending.Count -eq 0) { $env:WATCHER_TRACE_QUEUED_US = [string][long](([DateTime]::UtcNow.Ticks - 621355968000000000) / 10) }
     if (-not ($pending -contains $fullPath)) { $pending.Add($fullPath) | Out-Null }
   }
   # reset timer